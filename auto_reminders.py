@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from db import eventsdb
+from loaders import Loaders
 from mailing import trigger_mail
 from mailing_templates import (
     EVENT_BILL_REMINDER_BODY,
@@ -14,8 +15,8 @@ from models import Event
 from mtypes import Bills_State_Status, Event_State_Status
 from utils import (
     TIMEZONE,
+    datetime_condition,
     get_bot_cookie,
-    get_club_details,
     get_event_link,
     get_role_emails,
 )
@@ -39,10 +40,11 @@ async def check_for_bill_status():
 
     pending_bills = await eventsdb.find(
         {
-            "datetimeperiod.1": {
-                "$gte": week_ago.isoformat(),
-                "$lte": current_time.isoformat(),
-            },
+            "$and": [
+                datetime_condition(
+                    "datetimeperiod.1", gte=week_ago, lte=current_time
+                )
+            ],
             "status.state": Event_State_Status.approved.value,
             "budget": {"$exists": True, "$ne": []},
             "bills_status.state": Bills_State_Status.not_submitted.value,
@@ -55,11 +57,17 @@ async def check_for_bill_status():
 
     bot_cookie = await get_bot_cookie()
 
+    # fetch the details of every club involved in one request
+    loaders = Loaders()
+    await loaders.clubs.load_many(
+        list({event["clubid"] for event in pending_bills})
+    )
+
     for event in pending_bills:
         event_instance = Event.model_validate(event)
 
         try:
-            clubDetails = await get_club_details(event_instance.clubid, None)
+            clubDetails = await loaders.clubs.load(event_instance.clubid)
 
             if len(clubDetails.keys()) == 0:
                 print(f"Club does not exist for event {event_instance.code}")
@@ -119,10 +127,11 @@ async def check_for_ended_events():
     # find events that ended today
     ended_events = await eventsdb.find(
         {
-            "datetimeperiod.1": {
-                "$gte": one_day_ago.isoformat(),
-                "$lte": current_time.isoformat(),
-            },
+            "$and": [
+                datetime_condition(
+                    "datetimeperiod.1", gte=one_day_ago, lte=current_time
+                )
+            ],
             "status.state": Event_State_Status.approved.value,
             "event_report_submitted": {"$ne": True},
         }
@@ -134,11 +143,17 @@ async def check_for_ended_events():
 
     bot_cookie = await get_bot_cookie()
 
+    # fetch the details of every club involved in one request
+    loaders = Loaders()
+    await loaders.clubs.load_many(
+        list({event["clubid"] for event in ended_events})
+    )
+
     for event in ended_events:
         event_instance = Event.model_validate(event)
 
         try:
-            clubDetails = await get_club_details(event_instance.clubid, None)
+            clubDetails = await loaders.clubs.load(event_instance.clubid)
 
             if len(clubDetails.keys()) == 0:
                 print(f"Club does not exist for event {event_instance.code}")
@@ -0,0 +1,245 @@
+"""
+In-process caching helpers.
+
+This module holds the small caches used to avoid repeating inter-service
+round trips on hot paths.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from resilience import without_latency_budget
+
+
+class TTLCache:
+    """
+    Async key-value cache with a time to live, stale-while-revalidate and
+    single-flight loading.
+
+    A fresh entry is returned as is. An entry older than `ttl` but younger
+    than `ttl + stale_ttl` is returned immediately while a background task
+    refreshes it. Anything older (or missing) is loaded before returning.
+    Concurrent loads of the same key share one call to the loader.
+
+    Attributes:
+        ttl (float): seconds for which an entry is considered fresh.
+        stale_ttl (float): extra seconds for which a stale entry may be
+                           served while it is being refreshed.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: dict[Hashable, tuple[Any, float]] = {}
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+
+    async def get(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Returns the cached value for key, loading it if needed.
+
+        Args:
+            key (Hashable): cache key
+            loader (Callable[[], Awaitable[Any]]): coroutine function that
+                                                   fetches a fresh value.
+
+        Returns:
+            (Any): the cached or freshly loaded value.
+
+        Raises:
+            Exception: whatever the loader raised, when there is no
+                       servable entry.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._load(key, loader)
+                return value
+
+        return await asyncio.shield(self._load(key, loader))
+
+    def peek(self, key: Hashable) -> Any | None:
+        """
+        Returns the last loaded value for key, regardless of its age.
+
+        Args:
+            key (Hashable): cache key
+
+        Returns:
+            (Any | None): the last loaded value or None.
+        """
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """
+        Drops one entry, or every entry if no key is given. Loads already
+        in flight will not store their result.
+
+        Args:
+            key (Hashable | None): cache key. Defaults to None.
+        """
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def _load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            # the load is shared by every caller waiting on the key and may
+            # outlive the request that started it
+            task = asyncio.create_task(
+                self._run_loader(key, loader, self._generation),
+                context=without_latency_budget(),
+            )
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+        return task
+
+    async def _run_loader(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        generation: int,
+    ) -> Any:
+        try:
+            value = await loader()
+            if generation == self._generation:
+                self._entries[key] = (value, time.monotonic())
+            return value
+        finally:
+            if generation == self._generation:
+                self._inflight.pop(key, None)
+
+
+class LRUCache:
+    """
+    Async key-value cache holding at most `maxsize` entries, each for `ttl`
+    seconds, with single-flight loading.
+
+    When full, the least recently used entry is evicted to make room.
+    Concurrent loads of the same key share one call to the loader. Hits,
+    misses and evictions are counted for monitoring.
+
+    Attributes:
+        maxsize (int): maximum number of entries.
+        ttl (float): seconds for which an entry is served.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+
+    async def get(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Returns the cached value for key, loading it if needed.
+
+        Args:
+            key (Hashable): cache key
+            loader (Callable[[], Awaitable[Any]]): coroutine function that
+                                                   fetches a fresh value.
+
+        Returns:
+            (Any): the cached or freshly loaded value.
+
+        Raises:
+            Exception: whatever the loader raised.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, loaded_at = entry
+            if time.monotonic() - loaded_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            # the load is shared by every caller waiting on the key and may
+            # outlive the request that started it
+            task = asyncio.create_task(
+                self._run_loader(key, loader, self._generation),
+                context=without_latency_budget(),
+            )
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    def invalidate(self) -> None:
+        """
+        Drops every entry. Loads already in flight will not store their
+        result.
+        """
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict:
+        """
+        Returns the cache's counters for monitoring.
+
+        Returns:
+            (Dict): size, maximum size, hit, miss, eviction and
+                    invalidation counts and the hit ratio.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    async def _run_loader(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        generation: int,
+    ) -> Any:
+        try:
+            value = await loader()
+            if generation == self._generation and self.maxsize > 0:
+                self._entries[key] = (value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return value
+        finally:
+            if generation == self._generation:
+                self._inflight.pop(key, None)
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # background refreshes have no awaiter, so mark their errors as seen
+    if not task.cancelled():
+        task.exception()
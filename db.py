@@ -2,7 +2,7 @@
 MongoDB Initialization Module.
 
 This module sets up the connection to the MongoDB database.
-It ensures that the required indexes are created.
+It ensures that the indexes declared in INDEXES exist.
 
 Attributes:
     MONGO_USERNAME (str): An environment variable having MongoDB
@@ -21,11 +21,19 @@ Attributes:
                                                 collection for holidays.
     event_reportsdb (pymongo.asynchronous.collection.AsyncCollection): MongoDB
                                                 collection for event reports.
+    room_bookingsdb (pymongo.asynchronous.collection.AsyncCollection): MongoDB
+                                                collection for the rooms
+                                                booked by events.
+    INDEXES (Dict[str, List[pymongo.IndexModel]]): indexes of each
+                                                collection, matched to the
+                                                queries that use them.
 """
 
+import asyncio
 from os import getenv
+from typing import Dict, List
 
-from pymongo import AsyncMongoClient
+from pymongo import AsyncMongoClient, IndexModel
 
 # get mongodb URI and database name from environment variable
 MONGO_URI = "mongodb://{}:{}@mongo:{}/".format(
@@ -35,51 +43,202 @@ MONGO_URI = "mongodb://{}:{}@mongo:{}/".format(
 )
 MONGO_DATABASE = getenv("MONGO_DATABASE", default="default")
 
-# instantiate mongo client
-client = AsyncMongoClient(MONGO_URI)
+# instantiate mongo client, with stored datetimes returned as aware UTC
+client = AsyncMongoClient(MONGO_URI, tz_aware=True)
 
 # get database
 db = client[MONGO_DATABASE]
 eventsdb = db.events
 holidaysdb = db.holidays
 event_reportsdb = db.event_reports
+room_bookingsdb = db.room_bookings
+
+
+# declared indexes by collection, matched to the queries that use them
+INDEXES: Dict[str, List[IndexModel]] = {
+    "holidays": [
+        # only one holiday can exist per day
+        IndexModel([("date", 1)], unique=True, name="one_holiday_on_day"),
+    ],
+    "events": [
+        # event codes are unique, eventid(code) looks events up by code
+        IndexModel([("code", 1)], unique=True, name="unique_event_code"),
+        # keyset pagination of past events and time window scans
+        IndexModel(
+            [("datetimeperiod.1", -1), ("_id", -1)],
+            name="events_by_end_time",
+        ),
+        # events of a state in a time window: events, calendarEvents,
+        # availableRooms, clashingEvents, allEventsBills, report reminders
+        IndexModel(
+            [
+                ("status.state", 1),
+                ("datetimeperiod.1", -1),
+                ("datetimeperiod.0", 1),
+            ],
+            name="events_by_state_and_time",
+        ),
+        # events of a club: club filtered events, incompleteEvents,
+        # get_pending_reports_count and get_event_code
+        IndexModel(
+            [("clubid", 1), ("status.state", 1), ("datetimeperiod.1", -1)],
+            name="events_by_club",
+        ),
+        # the collabclubs branch of the club filters above
+        IndexModel(
+            [
+                ("collabclubs", 1),
+                ("status.state", 1),
+                ("datetimeperiod.1", -1),
+            ],
+            name="events_by_collab_club",
+        ),
+        # name search, prefix matches on the normalized name, word prefix
+        # matches on its word suffixes and substring matches on its trigrams
+        IndexModel([("name_normalized", 1)], name="events_by_name"),
+        IndexModel(
+            [("name_word_suffixes", 1)], name="events_by_name_word_suffixes"
+        ),
+        IndexModel([("name_trigrams", 1)], name="events_by_name_trigrams"),
+        # eventsChangedSince looks changed events up by update time
+        IndexModel([("updated_at", 1)], name="events_by_update_time"),
+        # bill reminders, events with bills in a state that ended in a time
+        # window. Every event has a bills status, so it is not partial.
+        IndexModel(
+            [("bills_status.state", 1), ("datetimeperiod.1", -1)],
+            name="events_by_bills_state",
+        ),
+    ],
+    "event_reports": [
+        # there is only one report per event
+        IndexModel([("event_id", 1)], unique=True, name="unique_event_id"),
+    ],
+    "room_bookings": [
+        # bookings of rooms in a time window, bounded below by the longest
+        # booking document: clash checks of room_bookings.find_clashes
+        IndexModel([("room", 1), ("start", 1)], name="bookings_by_room"),
+        # bookings of an event, upserted by room and start whenever the
+        # event is written
+        IndexModel(
+            [("eventid", 1), ("room", 1), ("start", 1)],
+            unique=True,
+            name="bookings_by_event",
+        ),
+    ],
+}
 
 
 async def create_index() -> None:
     """
-    Create MongoDB indexes for events-related collections
-    if they don't already exist.
+    Reconciles the indexes of every collection with the INDEXES registry.
 
-    This function creates the following indexes:
+    Missing indexes are created, all collections at once, and existing ones
+    are left alone, so it is safe to run on every startup. Indexes whose
+    definition differs from the registry, and indexes the registry does not
+    declare, are reported but never dropped.
 
-    - 'one_holiday_on_day': A unique index on the 'date' field in the holidays
-        collection to ensure only one holiday can exist per day.
+    Returns:
+        (None): This function does not return any value.
+    """
+    reports = await asyncio.gather(
+        *(
+            _reconcile_indexes(collection, indexes)
+            for collection, indexes in INDEXES.items()
+        ),
+        return_exceptions=True,
+    )
+    for collection, report in zip(INDEXES, reports):
+        if isinstance(report, BaseException):
+            print(f"Could not reconcile indexes of {collection}: {report}")
+            continue
+        for kind, names in report.items():
+            if names:
+                print(f"{kind.capitalize()} indexes on {collection}: {names}")
 
-    - 'unique_event_code': A unique index on the 'code' field in the events
-        collection to ensure event codes are unique.
 
-    - 'unique_event_id': A unique index on the 'event_id' field in the
-        event_reports collection to ensure there's only one report per event
+async def index_report() -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compares the indexes in the database with the INDEXES registry.
 
     Returns:
-        (None): This function does not return any value.
+        (Dict[str, Dict[str, List[str]]]): for each collection, the names of
+                                           declared indexes that are
+                                           `missing`, declared indexes that
+                                           differ (`conflicting`), indexes
+                                           not in the registry
+                                           (`undeclared`) and indexes that
+                                           have not been used since the
+                                           server started (`unused`).
     """
-    try:
-        # check if the holidays index exists
-        if "one_holiday_on_day" not in (await holidaysdb.index_information()):
-            # create the index
-            await holidaysdb.create_index(
-                [("date", 1)], unique=True, name="one_holiday_on_day"
-            )
-        if "unique_event_code" not in (await eventsdb.index_information()):
-            await eventsdb.create_index(
-                [("code", 1)], unique=True, name="unique_event_code"
-            )
-        if "unique_event_id" not in (
-            await event_reportsdb.index_information()
+    reports = await asyncio.gather(
+        *(
+            _index_report(collection, indexes)
+            for collection, indexes in INDEXES.items()
+        )
+    )
+    return dict(zip(INDEXES, reports))
+
+
+async def _reconcile_indexes(
+    collection: str, indexes: List[IndexModel]
+) -> Dict[str, List[str]]:
+    report = await _compare_indexes(collection, indexes)
+    missing = set(report.pop("missing"))
+    if missing:
+        await db[collection].create_indexes(
+            [index for index in indexes if index.document["name"] in missing]
+        )
+    report["created"] = sorted(missing)
+    return report
+
+
+async def _index_report(
+    collection: str, indexes: List[IndexModel]
+) -> Dict[str, List[str]]:
+    report = await _compare_indexes(collection, indexes)
+    stats = await (
+        await db[collection].aggregate([{"$indexStats": {}}])
+    ).to_list(length=None)
+    report["unused"] = sorted(
+        stat["name"]
+        for stat in stats
+        if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0
+    )
+    return report
+
+
+async def _compare_indexes(
+    collection: str, indexes: List[IndexModel]
+) -> Dict[str, List[str]]:
+    existing = await db[collection].index_information()
+    report: Dict[str, List[str]] = {
+        "missing": [],
+        "conflicting": [],
+        "undeclared": [],
+    }
+    for index in indexes:
+        spec = index.document
+        current = existing.get(spec["name"])
+        if current is None:
+            report["missing"].append(spec["name"])
+        elif (
+            _index_key(current["key"]) != _index_key(spec["key"].items())
+            or current.get("unique", False) != spec.get("unique", False)
+            or current.get("partialFilterExpression")
+            != spec.get("partialFilterExpression")
         ):
-            await event_reportsdb.create_index(
-                [("event_id", 1)], unique=True, name="unique_event_id"
-            )
-    except Exception:
-        pass
+            report["conflicting"].append(spec["name"])
+
+    declared = {index.document["name"] for index in indexes}
+    report["undeclared"] = sorted(
+        name for name in existing if name != "_id_" and name not in declared
+    )
+    return report
+
+
+def _index_key(key) -> List[tuple]:
+    # the server may return directions as floats
+    return [
+        (field, int(direction) if isinstance(direction, float) else direction)
+        for field, direction in key
+    ]
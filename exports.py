@@ -0,0 +1,301 @@
+"""
+CSV exports of events, shared by the downloadEventsData query and the
+streaming /export/events.csv route, so both apply the same access rules and
+write the same columns.
+
+Attributes:
+    HEADER_MAPPING (Dict[str, str]): column header of each exportable field.
+    EXPORT_FIELDS (Set[str]): fields that can be exported, those with a
+                              header and the other fields of an event.
+"""
+
+import csv
+import io
+from datetime import date, datetime, time, timezone
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from models import Event
+from mtypes import (
+    Event_Full_Location,
+    Event_Full_State_Status,
+    Event_State_Status,
+)
+from utils import (
+    EVENTS_BATCH_SIZE,
+    ClubIndex,
+    datetime_condition,
+    stream_events,
+    to_datetime,
+)
+
+HEADER_MAPPING = {
+    "code": "Event Code",
+    "name": "Event Name",
+    "clubid": "Club",
+    "datetimeperiod.0": "StartDate",
+    "datetimeperiod.1": "EndDate",
+    "description": "Description",
+    "audience": "Audience",
+    "population": "Audience Count",
+    "mode": "Mode",
+    "location": "Venue",
+    "budget": "Budget",
+    "poster": "Poster URL",
+    "status": "Status",
+    "equipment": "Equipment",
+    "additional": "Additional Requests",
+    "event_report_submitted": "Event Report Submitted",
+}
+
+EXPORT_FIELDS = set(HEADER_MAPPING) | set(Event.model_fields) - {"id"}
+
+
+def check_export_fields(fields: Sequence[str]) -> None:
+    """
+    Checks the fields of an export before any event is read, so an invalid
+    field fails the request instead of the cursor of a started export.
+    No fields at all is valid, and exports only the header.
+
+    Args:
+        fields (Sequence[str]): fields of the events to export
+
+    Raises:
+        Exception: Invalid field.
+    """
+    for field in fields:
+        if field not in EXPORT_FIELDS:
+            raise Exception(f"Invalid field: {field}")
+
+
+def export_searchspace(
+    user: dict,
+    clubid: str | None,
+    status: str,
+    dateperiod: Sequence[date] | None,
+    club_index: ClubIndex,
+) -> dict | None:
+    """
+    Builds the search space of the events a user can export.
+
+    CC and SLO cannot see deleted and incomplete events. Others can see
+    only approved events.
+
+    Args:
+        user (dict): the user exporting the events
+        clubid (str | None): club whose events and collaborations are
+                             exported, "allclubs" for all the clubs the user
+                             can see, nothing if None.
+        status (str): "pending", "approved" or "all"
+        dateperiod (Sequence[date] | None): first and last day the events
+                                            start on, any day if None.
+        club_index (utils.ClubIndex): the club directory
+
+    Returns:
+        (dict | None): the search space, None if no events are exported.
+
+    Raises:
+        Exception: Invalid status.
+    """
+    if status not in ["pending", "approved", "all"]:
+        raise Exception("Invalid status")
+
+    if not clubid:
+        return None
+
+    searchspace: dict[str, Any] = {}
+    if clubid == "allclubs":
+        if user["role"] in ["cc", "slo"]:
+            clubid = None
+        else:
+            clubid = user["uid"]
+    if clubid is not None:
+        searchspace["$or"] = [
+            {"clubid": clubid},
+            {"collabclubs": {"$in": [clubid]}},
+        ]
+    else:
+        searchspace["clubid"] = {"$in": list(club_index.cids)}
+
+    # filter by date
+    if dateperiod:
+        searchspace["$and"] = [
+            datetime_condition(
+                "datetimeperiod.0",
+                gte=datetime.combine(dateperiod[0], time.min, timezone.utc),
+                lte=datetime.combine(dateperiod[1], time.max, timezone.utc),
+            )
+        ]
+
+    if user["role"] not in ["cc", "slo"] or status == "approved":
+        searchspace["status.state"] = {
+            "$in": [
+                Event_State_Status.approved.value,
+            ]
+        }
+    else:
+        to_exclude = [
+            Event_State_Status.incomplete.value,
+        ]
+        if status == "pending":
+            to_exclude.append(Event_State_Status.approved.value)
+        if user["role"] == "slo":
+            to_exclude.append(Event_State_Status.pending_cc.value)
+        else:
+            to_exclude.append(Event_State_Status.deleted.value)
+
+        searchspace["status.state"] = {
+            "$nin": to_exclude,
+        }
+
+    return searchspace
+
+
+def export_fieldnames(fields: Sequence[str], status: str) -> List[str]:
+    """
+    Returns the column headers of an export.
+
+    Args:
+        fields (Sequence[str]): fields of the events to export
+        status (str): status of the exported events
+
+    Returns:
+        (List[str]): the headers, with a status column unless only approved
+                     events are exported.
+    """
+    fieldnames = [
+        HEADER_MAPPING.get(field.lower(), field)
+        for field in fields
+        if field != "status"
+    ]
+
+    if status != "approved":
+        fieldnames.append(HEADER_MAPPING["status"])
+    return fieldnames
+
+
+def export_row(
+    event: dict,
+    fields: Sequence[str],
+    fieldnames: Sequence[str],
+    club_names: Dict[str, str],
+) -> dict:
+    """
+    Formats an event as a row of an export.
+
+    Args:
+        event (dict): the event
+        fields (Sequence[str]): fields of the events to export
+        fieldnames (Sequence[str]): headers of the export, from
+                                    export_fieldnames
+        club_names (Dict[str, str]): club names by cid
+
+    Returns:
+        (dict): the row, by header.
+    """
+    event_data = {}
+    for field in fields:
+        mapped_field = HEADER_MAPPING.get(field, field)
+        if mapped_field not in fieldnames:
+            continue
+
+        value = event.get(field)
+
+        if field in ["datetimeperiod.0", "datetimeperiod.1"]:
+            value = event["datetimeperiod"]
+            value = (
+                to_datetime(value[0]).date().isoformat()
+                if field == "datetimeperiod.0"
+                else to_datetime(value[1]).date().isoformat()
+            )
+        elif field == "clubid":
+            value = club_names.get(value, None)
+
+            collab_clubs = event.get("collabclubs", [])
+            collab_club_names = [value] if value else []
+            for cid in collab_clubs:
+                club_name = club_names.get(cid, None)
+                if club_name:
+                    collab_club_names.append(club_name)
+            value = ", ".join(collab_club_names)
+        elif field == "location":
+            value = event.get(field, [])
+            if len(value) >= 1:
+                value = ", ".join(
+                    getattr(Event_Full_Location, loc)
+                    if loc != "other"
+                    else (event.get("otherLocation") or "other")
+                    for loc in value
+                )
+        elif field == "budget":
+            if isinstance(value, list):
+                budget_items = [
+                    f"{item['description']} {'(Advance)' if item['advance'] else ''}: {item['amount']}"  # noqa: E501
+                    for item in value
+                ]
+                value = ", ".join(budget_items)
+        elif field == "status":
+            status_value = event.get(field, {})
+            value = status_value.get("state", None)
+
+            if value:
+                value = getattr(Event_Full_State_Status, value)
+        elif field == "event_report_submitted":
+            if value is None:
+                value = "No Event Report Required"
+            else:
+                value = "Yes" if value else "No"
+
+        if value in [None, "", []]:
+            value = "No " + mapped_field
+
+        event_data[mapped_field] = value
+
+    return event_data
+
+
+async def export_csv(
+    searchspace: dict | None,
+    fields: Sequence[str],
+    status: str,
+    club_names: Dict[str, str],
+) -> AsyncIterator[str]:
+    """
+    Yields the CSV export of the events in the searchspace, latest first,
+    in chunks of EVENTS_BATCH_SIZE rows, so it is written in constant
+    memory however many events it has.
+
+    Args:
+        searchspace (dict | None): search space for events, from
+                                   export_searchspace
+        fields (Sequence[str]): fields of the events to export
+        status (str): status of the exported events
+        club_names (Dict[str, str]): club names by cid
+
+    Yields:
+        (str): the next chunk of the CSV, the header first.
+    """
+    fieldnames = export_fieldnames(fields, status)
+    buffer = io.StringIO()
+    csv_writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    csv_writer.writeheader()
+
+    if searchspace is not None:
+        # the fields the rows are formatted from
+        projection = {field.split(".")[0]: 1 for field in fields}
+        projection.update(collabclubs=1, otherLocation=1)
+
+        rows = 0
+        async for event in stream_events(
+            searchspace, projection, latest_first=True
+        ):
+            csv_writer.writerow(
+                export_row(event, fields, fieldnames, club_names)
+            )
+            rows += 1
+            if rows % EVENTS_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+    yield buffer.getvalue()
+    buffer.close()
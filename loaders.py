@@ -0,0 +1,36 @@
+"""
+Per-request DataLoaders for data owned by other services, and for the room
+clashes of events.
+
+Loads made while resolving one GraphQL operation are collected and sent to
+the gateway, or to MongoDB, as a single batched request, and repeated keys
+are served from the loader's cache.
+"""
+
+from strawberry.dataloader import DataLoader
+
+from room_bookings import find_clashes
+from utils import get_clubs_details, get_members, get_users
+
+
+class Loaders:
+    """
+    Group of DataLoaders sharing the cookies of one request.
+
+    Attributes:
+        users (DataLoader): uid -> (userProfile, userMeta) or None
+        members (DataLoader): (cid, uid) -> member or None
+        clubs (DataLoader): cid -> club details, empty if not found
+        clashes (DataLoader): (eventid, rooms, start, end) -> bookings of
+                              other events clashing with the slot
+    """
+
+    def __init__(self, cookies: dict | None = None) -> None:
+        self.users = DataLoader(load_fn=lambda uids: get_users(uids, cookies))
+        self.members = DataLoader(
+            load_fn=lambda keys: get_members(keys, cookies)
+        )
+        self.clubs = DataLoader(
+            load_fn=lambda cids: get_clubs_details(cids, cookies)
+        )
+        self.clashes = DataLoader(load_fn=find_clashes)
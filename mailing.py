@@ -1,12 +1,15 @@
+import asyncio
 import os
-from typing import List
+from typing import Coroutine, List
 
-from httpx import AsyncClient
-
-from utils import convert_to_html
+from resilience import without_latency_budget
+from utils import convert_to_html, inter_service_post
 
 inter_communication_secret = os.getenv("INTER_COMMUNICATION_SECRET")
 
+# mails being sent in the background, referenced until they finish
+_background_tasks: set[asyncio.Task] = set()
+
 
 # API call to send mail notification
 async def trigger_mail(
@@ -51,11 +54,11 @@ async def trigger_mail(
         # print("mailbody:", body)
 
         if cookies:
-            async with AsyncClient(cookies=cookies) as client:
-                await client.post(
-                    "http://gateway/graphql",
-                    json={"query": query, "variables": variables},
-                )
+            await inter_service_post(
+                "http://gateway/graphql",
+                json={"query": query, "variables": variables},
+                cookies=cookies,
+            )
         else:
             raise Exception(
                 "Couldn't find cookie, cannot send email without cookies!"
@@ -63,3 +66,31 @@ async def trigger_mail(
 
     except Exception:
         return None
+
+
+def send_in_background(coroutine: Coroutine) -> None:
+    """
+    Runs a mail-sending coroutine as a background task, so that the caller
+    does not wait for recipient lookups and delivery.
+
+    Args:
+        coroutine (Coroutine): the coroutine sending the mails.
+    """
+    task = asyncio.create_task(coroutine, context=without_latency_budget())
+    _background_tasks.add(task)
+    task.add_done_callback(_finish_background_task)
+
+
+def _finish_background_task(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error sending mail in background: {task.exception()}")
+
+
+async def drain_background_mails() -> None:
+    """
+    Waits for the mails still being sent in the background, used on
+    shutdown.
+    """
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
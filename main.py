@@ -11,7 +11,8 @@ Attributes:
     DEBUG (bool): Indicates whether the application is running in debug mode.
     gql_app (strawberry.fastapi.GraphQLRouter): The GraphQL router for
                                             handling GraphQL requests.
-    app (FastAPI): The FastAPI application instance.
+    app (FastAPI): The FastAPI application instance, also serving the plain
+                   HTTP routes from the routes package.
 """
 
 from contextlib import asynccontextmanager
@@ -24,12 +25,18 @@ from strawberry.tools import create_type
 
 from auto_reminders import init_event_reminder_system
 from db import create_index
+from mailing import drain_background_mails
 
 # import queries, mutations, PyObjectId and Context scalars
 from mtypes import PyObjectId
 from mutations import mutations
 from otypes import Context, PyObjectIdType
 from queries import queries
+from resilience import start_latency_budget
+from room_bookings import init_room_bookings
+from room_index import init_room_index
+from routes import router
+from utils import close_http_client, init_http_client
 
 # create query types
 Query = create_type("Query", queries)
@@ -59,10 +66,15 @@ gql_app = GraphQLRouter(schema, context_getter=get_context)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    init_http_client()
     await create_index()
+    await init_room_index()
+    init_room_bookings()
     init_event_reminder_system()
     yield
     # shutdown
+    await drain_background_mails()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -71,4 +83,14 @@ app = FastAPI(
     description="Handles Data of Events & Holidays",
     lifespan=lifespan,
 )
+
+
+@app.middleware("http")
+async def latency_budget(request, call_next):
+    # every request gets its own budget for upstream calls
+    start_latency_budget()
+    return await call_next(request)
+
+
 app.include_router(gql_app, prefix="/graphql")
+app.include_router(router)
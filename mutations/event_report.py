@@ -8,7 +8,7 @@ from db import event_reportsdb, eventsdb
 from models import EventReport
 from mtypes import Event_State_Status
 from otypes import EventReportType, Info, InputEventReport
-from utils import TIMEZONE, get_member
+from utils import TIMEZONE, datetime_condition, invalidate_events_cache
 
 
 @strawberry.mutation
@@ -45,9 +45,11 @@ async def addEventReport(
     event = await eventsdb.find_one(
         {
             "_id": eventid,
-            "datetimeperiod.1": {
-                "$lt": datetime.now(TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-            },
+            "$and": [
+                datetime_condition(
+                    "datetimeperiod.1", lt=datetime.now(TIMEZONE)
+                )
+            ],
             "status.state": Event_State_Status.approved.value,
         }
     )
@@ -68,7 +70,7 @@ async def addEventReport(
     # Check if submitted_by is valid
     cid = event["clubid"]
     uid = details.submitted_by
-    if not await get_member(cid, uid, info.context.cookies):
+    if not await info.context.loaders.members.load((cid, uid)):
         raise ValueError("Submitted by is not a valid member")
 
     report_dict = jsonable_encoder(details.to_pydantic())
@@ -81,8 +83,14 @@ async def addEventReport(
     # Update event report submitted status to True
     await eventsdb.update_one(
         {"_id": eventid},
-        {"$set": {"event_report_submitted": True}},
+        {
+            "$set": {
+                "event_report_submitted": True,
+                "updated_at": datetime.now(TIMEZONE),
+            }
+        },
     )
+    invalidate_events_cache()
 
     return EventReportType.from_pydantic(
         EventReport.model_validate(event_report)
@@ -128,9 +136,11 @@ async def editEventReport(
     event = await eventsdb.find_one(
         {
             "_id": eventid,
-            "datetimeperiod.1": {
-                "$lt": datetime.now(TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-            },
+            "$and": [
+                datetime_condition(
+                    "datetimeperiod.1", lt=datetime.now(TIMEZONE)
+                )
+            ],
             "status.state": Event_State_Status.approved.value,
         }
     )
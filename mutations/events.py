@@ -19,6 +19,7 @@ the event is `pending_room`, else skip to next.
 - Once the event is over, the club or CC can change the state to `completed`.
 """  # noqa: E501
 
+import asyncio
 import os
 from datetime import datetime, timedelta
 
@@ -26,8 +27,8 @@ import strawberry
 from fastapi.encoders import jsonable_encoder
 from prettytable import PrettyTable
 
-from db import eventsdb
-from mailing import trigger_mail
+from db import eventsdb, room_bookingsdb
+from mailing import send_in_background, trigger_mail
 from mailing_templates import (
     APPROVED_EVENT_BODY_FOR_CLUB,
     CLUB_EVENT_SUBJECT,
@@ -56,16 +57,18 @@ from mtypes import (
     Sponsor_Type,
 )
 from otypes import EventType, Info, InputEditEventDetails, InputEventDetails
+from room_bookings import refresh_bookings
+from room_index import room_index
 from utils import (
     TIMEZONE,
     delete_file,
-    get_club_details,
+    event_name_search_fields,
     get_event_code,
     get_event_link,
-    get_member,
     get_pending_reports_count,
     get_role_emails,
-    get_user,
+    invalidate_clubs_cache,
+    invalidate_events_cache,
 )
 
 inter_communication_secret_global = os.getenv("INTER_COMMUNICATION_SECRET")
@@ -110,7 +113,7 @@ async def createEvent(details: InputEventDetails, info: Info) -> EventType:
         raise Exception("Start time cannot be after end time.")
 
     # Check if the club exists
-    club_details = await get_club_details(details.clubid, info.context.cookies)
+    club_details = await info.context.loaders.clubs.load(details.clubid)
     if len(club_details.keys()) == 0:
         raise Exception("Club does not exist.")
 
@@ -193,8 +196,8 @@ async def createEvent(details: InputEventDetails, info: Info) -> EventType:
         event_instance.collabclubs = details.collabclubs
 
     # Check POC Details Exist or not
-    if not await get_member(
-        details.clubid, details.poc, cookies=info.context.cookies
+    if not await info.context.loaders.members.load(
+        (details.clubid, details.poc)
     ):
         raise Exception("Member Details for POC does not exist")
 
@@ -227,8 +230,19 @@ async def createEvent(details: InputEventDetails, info: Info) -> EventType:
         event_instance.club_category = Club_Body_Category_Type.club
 
     created_id = (
-        await eventsdb.insert_one(jsonable_encoder(event_instance))
+        await eventsdb.insert_one(
+            {
+                **jsonable_encoder(event_instance),
+                # stored as dates, not as the strings of jsonable_encoder
+                "datetimeperiod": list(event_instance.datetimeperiod),
+                **event_name_search_fields(event_instance.name),
+                "updated_at": datetime.now(TIMEZONE),
+            }
+        )
     ).inserted_id
+    invalidate_events_cache()
+    await room_index.refresh_event(created_id)
+    await refresh_bookings(created_id)
     created_event = Event.model_validate(
         await eventsdb.find_one({"_id": created_id})
     )
@@ -337,8 +351,8 @@ async def editEvent(details: InputEditEventDetails, info: Info) -> EventType:
     if details.poc is not None and event_ref.get("poc", None) != details.poc:
         updates["poc"] = details.poc
         # Check POC Details Exist or not
-        if not await get_member(
-            details.clubid, details.poc, cookies=info.context.cookies
+        if not await info.context.loaders.members.load(
+            (details.clubid, details.poc)
         ):
             raise Exception("Member Details for POC does not exist")
     if details.description is not None:
@@ -412,11 +426,23 @@ async def editEvent(details: InputEditEventDetails, info: Info) -> EventType:
     except Exception as e:
         raise Exception(f"Invalid update details: {e}")
 
-    updation = {"$set": jsonable_encoder(updates)}
+    updation = {
+        "$set": {
+            **jsonable_encoder(updates),
+            "updated_at": datetime.now(TIMEZONE),
+        }
+    }
+    if "name" in updates:
+        updation["$set"].update(event_name_search_fields(updates["name"]))
+    if "datetimeperiod" in updates:
+        updation["$set"]["datetimeperiod"] = list(updates["datetimeperiod"])
 
     upd_ref = await eventsdb.update_one(query, updation)
     if upd_ref.matched_count == 0:
         raise Exception("You do not have permission to access this resource.")
+    invalidate_events_cache()
+    await room_index.refresh_event(details.eventid)
+    await refresh_bookings(details.eventid)
 
     if old_poster_file:
         try:
@@ -468,9 +494,16 @@ async def progressEvent(
     event_instance = Event.model_validate(event_ref)
 
     mail_uid = user["uid"]
-    clubDetails = await get_club_details(
-        event_instance.clubid, info.context.cookies
-    )
+
+    # independent lookups run concurrently, the first failure propagates
+    lookups = [
+        info.context.loaders.clubs.load(event_instance.clubid),
+        info.context.loaders.users.load(event_instance.poc),
+    ]
+    if event_instance.status.state == Event_State_Status.incomplete:
+        lookups.append(get_pending_reports_count(event_instance.clubid))
+    clubDetails, poc, *pending_reports_lookup = await asyncio.gather(*lookups)
+
     if len(clubDetails.keys()) == 0:
         raise Exception("Club does not exist.")
     else:
@@ -489,9 +522,7 @@ async def progressEvent(
             raise noaccess_error
 
         # Check if the completed events report is submitted
-        pending_reports = await get_pending_reports_count(
-            event_instance.clubid
-        )
+        pending_reports = pending_reports_lookup[0]
         if pending_reports and "internal" not in event_instance.audience:
             raise Exception(
                 "Club must submit the report for your completed events "
@@ -627,15 +658,18 @@ async def progressEvent(
     updation["deleted_time"] = event_instance.status.deleted_time
     updation["deleted_by"] = event_instance.status.deleted_by
 
-    poc = await get_user(event_instance.poc, info.context.cookies)
     if not poc:
         raise Exception("POC does not exist.")
 
     upd_ref = await eventsdb.update_one(
-        {"_id": eventid}, {"$set": {"status": updation}}
+        {"_id": eventid},
+        {"$set": {"status": updation, "updated_at": datetime.now(TIMEZONE)}},
     )
     if upd_ref.matched_count == 0:
         raise noaccess_error
+    invalidate_events_cache()
+    await room_index.refresh_event(eventid)
+    await refresh_bookings(eventid)
 
     event_ref = await eventsdb.find_one({"_id": eventid})
     updated_event_instance = Event.model_validate(event_ref)
@@ -754,133 +788,150 @@ async def progressEvent(
     if not poc_roll:
         poc_roll = "Unknown"
 
-    # Default Mail Subject and Body
-    mail_subject = PROGRESS_EVENT_SUBJECT.safe_substitute(
-        event=mail_event_title,
-    )
-    mail_body = PROGRESS_EVENT_BODY.safe_substitute(
-        club=clubname,
-        event=mail_event_title,
-        eventlink=mail_eventlink,
-    )
-
-    mail_to = []
-    cc_to = []
-    if updated_event_instance.status.state == Event_State_Status.pending_cc:
-        mail_to = await get_role_emails("cc")
-
-        # Mail to club also for the successful submission of the event
-        mail_to_club = [
-            mail_club,
-        ]
-        mail_subject_club = CLUB_EVENT_SUBJECT.safe_substitute(
-            event_id=updated_event_instance.code,
-            event=mail_event_title,
-        )
-        mail_body_club = SUBMIT_EVENT_BODY_FOR_CLUB.safe_substitute(
-            event=mail_event_title,
-            eventlink=mail_eventlink,
-            event_id=updated_event_instance.code,
-            club=clubname,
-            description=mail_description,
-            start_time=event_start_time,
-            end_time=event_end_time,
-            location=mail_location,
-            locationAlternate=mail_locationAlternate,
-            budget=budget,
-            sponsor=sponsor,
-            poc_name=poc_name,
-            poc_roll=poc_roll,
-            poc_email=poc_email,
-            poc_phone=poc_phone,
-        )
-
-        await trigger_mail(
-            mail_uid,
-            mail_subject_club,
-            mail_body_club,
-            toRecipients=mail_to_club,
-            ccRecipients=[poc_email],
-            cookies=info.context.cookies,
-        )
-    elif (
-        updated_event_instance.status.state
-        == Event_State_Status.pending_budget
-    ):
-        cc_to = await get_role_emails("cc") + await get_role_emails("slo")
-        slc_emails = await get_role_emails("slc")
-
-        if slc_members_for_email is not None:
-            mail_to = []
-            for email in slc_emails:
-                if email.split("@")[0] in slc_members_for_email:
-                    mail_to.append(email)
-        else:
-            mail_to = slc_emails
-        mail_body = PROGRESS_EVENT_BODY_FOR_SLC.safe_substitute(
-            event_id=updated_event_instance.code,
-            club=clubname,
-            event=mail_event_title,
-            description=mail_description,
-            start_time=event_start_time,
-            end_time=event_end_time,
-            student_count=student_count,
-            location=mail_location,
-            locationAlternate=mail_locationAlternate,
-            budget=budget,
-            sponsor=sponsor,
-            additional=additional,
-            eventlink=mail_eventlink,
-        )
-    elif (
-        updated_event_instance.status.state == Event_State_Status.pending_room
-    ):
-        cc_to = await get_role_emails("cc") + ([mail_club] if is_body else [])
-        mail_to = await get_role_emails("slo")
-        mail_body = PROGRESS_EVENT_BODY_FOR_SLO.safe_substitute(
-            event_id=updated_event_instance.code,
-            club=clubname,
-            event=mail_event_title,
-            description=mail_description,
-            student_count=student_count,
-            start_time=event_start_time,
-            end_time=event_end_time,
-            location=mail_location,
-            locationAlternate=mail_locationAlternate,
-            equipment=equipment,
-            budget=budget,
-            sponsor=sponsor,
-            additional=additional,
-            poc_name=poc_name,
-            poc_roll=poc_roll,
-            poc_email=poc_email,
-            poc_phone=poc_phone,
-        )
-    elif updated_event_instance.status.state == Event_State_Status.approved:
-        # mail to the club email
-        mail_to = [
-            mail_club,
-        ]
-        cc_to = [poc_email]
-        mail_subject = CLUB_EVENT_SUBJECT.safe_substitute(
-            event_id=updated_event_instance.code,
+    # recipients are resolved and mails are sent after the mutation returns
+    async def notify() -> None:
+        # Default Mail Subject and Body
+        mail_subject = PROGRESS_EVENT_SUBJECT.safe_substitute(
             event=mail_event_title,
         )
-        mail_body = APPROVED_EVENT_BODY_FOR_CLUB.safe_substitute(
+        mail_body = PROGRESS_EVENT_BODY.safe_substitute(
             club=clubname,
             event=mail_event_title,
             eventlink=mail_eventlink,
         )
 
-    if len(mail_to):
-        await trigger_mail(
-            mail_uid,
-            mail_subject,
-            mail_body,
-            toRecipients=mail_to,
-            ccRecipients=cc_to,
-            cookies=info.context.cookies,
-        )
+        mail_to = []
+        cc_to = []
+        if (
+            updated_event_instance.status.state
+            == Event_State_Status.pending_cc
+        ):
+            mail_to = await get_role_emails("cc")
+
+            # Mail to club also for the successful submission of the event
+            mail_to_club = [
+                mail_club,
+            ]
+            mail_subject_club = CLUB_EVENT_SUBJECT.safe_substitute(
+                event_id=updated_event_instance.code,
+                event=mail_event_title,
+            )
+            mail_body_club = SUBMIT_EVENT_BODY_FOR_CLUB.safe_substitute(
+                event=mail_event_title,
+                eventlink=mail_eventlink,
+                event_id=updated_event_instance.code,
+                club=clubname,
+                description=mail_description,
+                start_time=event_start_time,
+                end_time=event_end_time,
+                location=mail_location,
+                locationAlternate=mail_locationAlternate,
+                budget=budget,
+                sponsor=sponsor,
+                poc_name=poc_name,
+                poc_roll=poc_roll,
+                poc_email=poc_email,
+                poc_phone=poc_phone,
+            )
+
+            await trigger_mail(
+                mail_uid,
+                mail_subject_club,
+                mail_body_club,
+                toRecipients=mail_to_club,
+                ccRecipients=[poc_email],
+                cookies=info.context.cookies,
+            )
+        elif (
+            updated_event_instance.status.state
+            == Event_State_Status.pending_budget
+        ):
+            cc_emails, slo_emails, slc_emails = await asyncio.gather(
+                get_role_emails("cc"),
+                get_role_emails("slo"),
+                get_role_emails("slc"),
+            )
+            cc_to = cc_emails + slo_emails
+
+            if slc_members_for_email is not None:
+                mail_to = []
+                for email in slc_emails:
+                    if email.split("@")[0] in slc_members_for_email:
+                        mail_to.append(email)
+            else:
+                mail_to = slc_emails
+            mail_body = PROGRESS_EVENT_BODY_FOR_SLC.safe_substitute(
+                event_id=updated_event_instance.code,
+                club=clubname,
+                event=mail_event_title,
+                description=mail_description,
+                start_time=event_start_time,
+                end_time=event_end_time,
+                student_count=student_count,
+                location=mail_location,
+                locationAlternate=mail_locationAlternate,
+                budget=budget,
+                sponsor=sponsor,
+                additional=additional,
+                eventlink=mail_eventlink,
+            )
+        elif (
+            updated_event_instance.status.state
+            == Event_State_Status.pending_room
+        ):
+            cc_emails, mail_to = await asyncio.gather(
+                get_role_emails("cc"), get_role_emails("slo")
+            )
+            cc_to = cc_emails + ([mail_club] if is_body else [])
+            mail_body = PROGRESS_EVENT_BODY_FOR_SLO.safe_substitute(
+                event_id=updated_event_instance.code,
+                club=clubname,
+                event=mail_event_title,
+                description=mail_description,
+                student_count=student_count,
+                start_time=event_start_time,
+                end_time=event_end_time,
+                location=mail_location,
+                locationAlternate=mail_locationAlternate,
+                equipment=equipment,
+                budget=budget,
+                sponsor=sponsor,
+                additional=additional,
+                poc_name=poc_name,
+                poc_roll=poc_roll,
+                poc_email=poc_email,
+                poc_phone=poc_phone,
+            )
+        elif (
+            updated_event_instance.status.state == Event_State_Status.approved
+        ):
+            # mail to the club email
+            mail_to = [
+                mail_club,
+            ]
+            cc_to = [poc_email]
+            mail_subject = CLUB_EVENT_SUBJECT.safe_substitute(
+                event_id=updated_event_instance.code,
+                event=mail_event_title,
+            )
+            mail_body = APPROVED_EVENT_BODY_FOR_CLUB.safe_substitute(
+                club=clubname,
+                event=mail_event_title,
+                eventlink=mail_eventlink,
+            )
+
+        if len(mail_to):
+            await trigger_mail(
+                mail_uid,
+                mail_subject,
+                mail_body,
+                toRecipients=mail_to,
+                ccRecipients=cc_to,
+                cookies=info.context.cookies,
+            )
+
+    send_in_background(notify())
+
     return EventType.from_pydantic(updated_event_instance)
 
 
@@ -926,9 +977,7 @@ async def deleteEvent(eventid: str, info: Info) -> EventType:
         "%d-%m-%Y %I:%M %p"
     )
 
-    clubDetails = await get_club_details(
-        event_instance.clubid, info.context.cookies
-    )
+    clubDetails = await info.context.loaders.clubs.load(event_instance.clubid)
     if len(clubDetails.keys()) == 0:
         raise Exception("Club does not exist.")
     else:
@@ -936,10 +985,14 @@ async def deleteEvent(eventid: str, info: Info) -> EventType:
         clubname = clubDetails["name"]
 
     event_ref = await eventsdb.update_one(
-        query, {"$set": {"status": updation}}
+        query,
+        {"$set": {"status": updation, "updated_at": datetime.now(TIMEZONE)}},
     )
     if event_ref.matched_count == 0:
         raise noaccess_error
+    invalidate_events_cache()
+    await room_index.refresh_event(eventid)
+    await refresh_bookings(eventid)
 
     # Send the event deleted email.
     if event_instance.status.state not in [
@@ -1045,9 +1098,7 @@ async def rejectEvent(
 
     event_instance = Event.model_validate(event_ref)
 
-    clubDetails = await get_club_details(
-        event_instance.clubid, info.context.cookies
-    )
+    clubDetails = await info.context.loaders.clubs.load(event_instance.clubid)
     if len(clubDetails.keys()) == 0:
         raise Exception("Club does not exist.")
     else:
@@ -1064,10 +1115,14 @@ async def rejectEvent(
     status["submission_time"] = None
 
     upd_ref = await eventsdb.update_one(
-        {"_id": eventid}, {"$set": {"status": status}}
+        {"_id": eventid},
+        {"$set": {"status": status, "updated_at": datetime.now(TIMEZONE)}},
     )
     if upd_ref.matched_count == 0:
         raise noaccess_error
+    invalidate_events_cache()
+    await room_index.refresh_event(eventid)
+    await refresh_bookings(eventid)
 
     # Send email to Club for allowing edits
     mail_to = [mail_club]
@@ -1130,10 +1185,19 @@ async def updateEventsCid(
     updation = {
         "$set": {
             "clubid": new_cid,
+            "updated_at": datetime.now(TIMEZONE),
         }
     }
 
     upd_ref = await eventsdb.update_many({"clubid": old_cid}, updation)
+    await room_bookingsdb.update_many(
+        {"clubid": old_cid}, {"$set": {"clubid": new_cid}}
+    )
+
+    # the club directory still lists the old cid
+    invalidate_clubs_cache()
+    invalidate_events_cache()
+
     return upd_ref.modified_count
 
 
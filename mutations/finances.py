@@ -20,11 +20,12 @@ from mtypes import (
 from otypes import Info, InputBillsStatus, InputBillsUpload
 from utils import (
     TIMEZONE,
+    datetime_condition,
     delete_file,
-    get_club_details,
     get_event_finances_link,
     get_event_link,
     get_role_emails,
+    invalidate_events_cache,
 )
 
 
@@ -62,7 +63,7 @@ async def updateBillsStatus(
         {
             "_id": details.eventid,
             "status.state": Event_State_Status.approved.value,  # type: ignore
-            "datetimeperiod.1": {"$lt": time_str},
+            "$and": [datetime_condition("datetimeperiod.1", lt=current_time)],
             "budget": {
                 "$exists": True,
                 "$ne": [],
@@ -72,9 +73,9 @@ async def updateBillsStatus(
     if event is None:
         raise ValueError("Event not found.")
 
-    mail_to = (
-        await get_club_details(event["clubid"], info.context.cookies)
-    ).get("email", None)
+    mail_to = (await info.context.loaders.clubs.load(event["clubid"])).get(
+        "email", None
+    )
     if not mail_to:
         raise ValueError("Club email not found")
 
@@ -85,11 +86,13 @@ async def updateBillsStatus(
                 "bills_status.state": details.state,
                 "bills_status.updated_time": time_str,
                 "bills_status.slo_comment": details.slo_comment,
+                "updated_at": datetime.now(TIMEZONE),
             }
         },
     )
     if upd_ref.modified_count == 0:
         raise ValueError("Bills status not updated")
+    invalidate_events_cache()
 
     event = await eventsdb.find_one({"_id": details.eventid})
     if not event:
@@ -148,7 +151,7 @@ async def addBill(details: InputBillsUpload, info: Info) -> bool:
         {
             "_id": details.eventid,
             "status.state": Event_State_Status.approved.value,  # type: ignore
-            "datetimeperiod.1": {"$lt": time_str},
+            "$and": [datetime_condition("datetimeperiod.1", lt=current_time)],
             "budget": {
                 "$exists": True,
                 "$ne": [],
@@ -205,11 +208,13 @@ async def addBill(details: InputBillsUpload, info: Info) -> bool:
                     "filename": details.filename,
                 },
                 "budget": new_budget,
+                "updated_at": datetime.now(TIMEZONE),
             }
         },
     )
     if upd_ref.modified_count == 0:
         raise ValueError("Bills status not updated")
+    invalidate_events_cache()
 
     # if already a bills_status file exists, then delete it
     if bill.get("filename"):
@@ -228,9 +233,9 @@ async def addBill(details: InputBillsUpload, info: Info) -> bool:
         item.amount_used for item in event_instance.budget if item.amount_used
     )
 
-    clubname = (
-        await get_club_details(event["clubid"], info.context.cookies)
-    ).get("name", None)
+    clubname = (await info.context.loaders.clubs.load(event["clubid"])).get(
+        "name", None
+    )
     cc_to = await get_role_emails("cc")
     slo_emails = await get_role_emails("slo")
 
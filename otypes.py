@@ -1,5 +1,5 @@
 import json
-from datetime import date, datetime
+from datetime import date, datetime, time
 from functools import cached_property
 from typing import Dict, List, Optional, Tuple, TypeAlias
 
@@ -10,6 +10,7 @@ from strawberry.fastapi import BaseContext
 from strawberry.types import Info as _Info
 from strawberry.types.info import RootValueType
 
+from loaders import Loaders
 from models import Event, EventReport, Holiday
 from mtypes import (
     Audience,
@@ -18,6 +19,7 @@ from mtypes import (
     Budget_Type,
     Event_Location,
     Event_Mode,
+    Event_State_Status,
     PyObjectId,
     Sponsor_Type,
     event_popu_type,
@@ -31,7 +33,7 @@ from mtypes import (
 class Context(BaseContext):
     """
     Class provides user metadata and cookies from request headers, has
-    methods for doing this.
+    methods for doing this, along with the request's DataLoaders.
     """
 
     @cached_property
@@ -49,6 +51,10 @@ class Context(BaseContext):
         cookies = json.loads(self.request.headers.get("cookies", "{}"))
         return cookies
 
+    @cached_property
+    def loaders(self) -> Loaders:
+        return Loaders(self.cookies)
+
 
 Info: TypeAlias = _Info[Context, RootValueType]
 """custom info Type for user metadata"""
@@ -69,13 +75,133 @@ class EventReportType:
     pass
 
 
+@strawberry.type
+class RoomClashType:
+    """
+    Type for returning another event booking one of an event's rooms at an
+    overlapping time.
+
+    Attributes:
+        eventid (str): The id of the other event.
+        name (str): The name of the other event.
+        clubid (str): The club hosting the other event.
+        state (mtypes.Event_State_Status): The state of the other event.
+        location (mtypes.Event_Location): The room both events book.
+        start (datetime): Start of the other event.
+        end (datetime): End of the other event.
+    """
+
+    eventid: str
+    name: str
+    clubid: str
+    state: Event_State_Status
+    location: Event_Location
+    start: datetime
+    end: datetime
+
+
+@strawberry.type
+class ClashSetType:
+    """
+    Type for returning a set of events clashing with one another in a room.
+
+    Attributes:
+        location (mtypes.Event_Location): The room the events book.
+        start (datetime): Start of the earliest event of the set.
+        end (datetime): End of the latest ending event of the set.
+        events (List[otypes.RoomClashType]): The events, by start time.
+    """
+
+    location: Event_Location
+    start: datetime
+    end: datetime
+    events: List[RoomClashType]
+
+
 @strawberry.experimental.pydantic.type(model=Event, all_fields=True)
 class EventType:
     """
     Type for returning all the details regarding an event.
     """
 
-    pass
+    @strawberry.field
+    async def clashes(self, info: Info) -> List[RoomClashType]:
+        """
+        Returns the pending and approved events booking any of the event's
+        rooms at an overlapping time, from the room booking ledger, so the
+        event mutations can warn about clashes as they are made. The
+        clashes of all the events of a response are found in one query.
+
+        Clubs do not see the other clubs' events that are still pending.
+        Other viewers, signed out or not, see no clashes.
+
+        Args:
+            info (otypes.Info): The context information of user for the
+                                request.
+
+        Returns:
+            (List[otypes.RoomClashType]): the clashes, by start time.
+        """
+        user = info.context.user
+        if user is None or user.get("role") not in ["club", "cc", "slo"]:
+            return []
+
+        bookings = await info.context.loaders.clashes.load(
+            (
+                str(self.id),
+                tuple(str(room) for room in self.location),
+                *self.datetimeperiod,
+            )
+        )
+        return [
+            RoomClashType(
+                eventid=booking["eventid"],
+                name=booking["name"],
+                clubid=booking["clubid"],
+                state=Event_State_Status(booking["state"]),
+                location=Event_Location(booking["room"]),
+                start=booking["event_start"],
+                end=booking["event_end"],
+            )
+            for booking in bookings
+            if user["role"] != "club"
+            or booking["clubid"] == user["uid"]
+            or booking["state"] == Event_State_Status.approved.value
+        ]
+
+
+@strawberry.type
+class EventsPageType:
+    """
+    Type for returning one page of events.
+
+    Attributes:
+        events (List[otypes.EventType]): The events of the page.
+        nextCursor (str | None): Cursor of the next page, None if this is
+                                 the last page.
+    """
+
+    events: List[EventType]
+    nextCursor: str | None
+
+
+@strawberry.type
+class EventsChangesType:
+    """
+    Type for returning the changes to events since a sync token.
+
+    Attributes:
+        events (List[otypes.EventType]): The events created or changed
+                                         since the token, that the user can
+                                         see.
+        removed (List[str]): Ids of the events changed since the token that
+                             the user can no longer see.
+        token (str): Sync token to ask for the next changes with.
+    """
+
+    events: List[EventType]
+    removed: List[str]
+    token: str
 
 
 @strawberry.type
@@ -104,6 +230,63 @@ class RoomListType:
     locations: List[RoomInfo]
 
 
+@strawberry.type
+class RoomSlotsType:
+    """
+    Class for returning the availability of a room in every time slot of a
+    grid.
+
+    Attributes:
+        location (mtypes.Event_Location): The location of the room.
+        available (List[bool]): Whether the room is available in each slot,
+                                in the order of the grid's slots.
+    """
+
+    location: Event_Location
+    available: List[bool]
+
+
+@strawberry.type
+class RoomGridType:
+    """
+    Type for returning the availability of every room over a window,
+    divided into time slots.
+
+    Attributes:
+        start (datetime): Start of the window.
+        end (datetime): End of the window.
+        granularity (int): Length of each slot, in minutes.
+        slots (List[datetime]): Start of each slot. The last slot ends at
+                                the end of the window.
+        holidays (List[str | None]): Name of the holiday each slot starts
+                                     on, None if it is not a holiday.
+        rooms (List[otypes.RoomSlotsType]): Availability of every room.
+    """
+
+    start: datetime
+    end: datetime
+    granularity: int
+    slots: List[datetime]
+    holidays: List[str | None]
+    rooms: List[RoomSlotsType]
+
+
+@strawberry.type
+class SuggestedSlotType:
+    """
+    Class for returning a time slot in which a room is available.
+
+    Attributes:
+        location (mtypes.Event_Location): The location of the room.
+        start (datetime): Start of the slot.
+        end (datetime): End of the slot.
+    """
+
+    location: Event_Location
+    start: datetime
+    end: datetime
+
+
 @strawberry.type
 class BillsStatusType:
     """
@@ -406,6 +589,10 @@ class InputBillsUpload:
 timelot_type = Tuple[datetime, datetime]
 """A custom data type for start and end of event"""
 
+# custom data type for the start and end of the working day
+working_hours_type = Tuple[time, time]
+"""A custom data type for the start and end of the working day, in IST"""
+
 # Holidays Types
 
 
@@ -1,30 +1,71 @@
-import csv
-import io
-from datetime import datetime
-from typing import Any, List
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List
 
 import strawberry
 
-from db import eventsdb
+from db import eventsdb, holidaysdb
+from exports import check_export_fields, export_csv, export_searchspace
 
 # import all models and types
 from models import Event
 from mtypes import (
-    Event_Full_Location,
-    Event_Full_State_Status,
     Event_Location,
     Event_State_Status,
 )
 from otypes import (
+    ClashSetType,
     CSVResponse,
+    EventsChangesType,
+    EventsPageType,
     EventType,
     Info,
     InputDataReportDetails,
+    RoomClashType,
+    RoomGridType,
     RoomInfo,
     RoomListType,
+    RoomSlotsType,
+    SuggestedSlotType,
     timelot_type,
+    working_hours_type,
 )
-from utils import TIMEZONE, events_with_sorting, get_clubs, trim_public_events
+from room_index import room_index
+from utils import (
+    ROOM_GRID_MAX_SLOTS,
+    ROOM_GRID_MIN_GRANULARITY,
+    SUGGEST_SLOTS_MAX_COUNT,
+    SUGGEST_SLOTS_MAX_DAYS,
+    SUGGEST_SLOTS_STEP,
+    TIMEZONE,
+    calendar_searchspace,
+    datetime_condition,
+    decode_sync_token,
+    encode_sync_token,
+    events_cache,
+    events_changed_since,
+    events_with_sorting,
+    get_club_index,
+    past_events_page,
+    response_cache_role,
+    selected_subfields,
+    selection_projection,
+    to_datetime,
+    trim_public_events,
+)
+
+EVENT_REQUIRED_FIELDS = [
+    "_id",
+    "status",
+    "clubid",
+    "collabclubs",
+    "datetimeperiod",
+    "name",
+    "audience",
+    # rooms checked for clashes
+    "location",
+]
 
 
 @strawberry.field
@@ -50,10 +91,7 @@ async def event(eventid: str, info: Info) -> EventType:
     user = info.context.user
     event = await eventsdb.find_one({"_id": eventid})
 
-    allclubs = await get_clubs(info.context.cookies)
-    list_allclubs = list()
-    for club in allclubs:
-        list_allclubs.append(club["cid"])
+    club_index = await get_club_index(info.context.cookies)
 
     if (
         event is None
@@ -79,7 +117,7 @@ async def event(eventid: str, info: Info) -> EventType:
                 )
             )
         )
-        or event["clubid"] not in list_allclubs
+        or event["clubid"] not in club_index.cids
     ):
         raise Exception(
             "Can not access event. Either it does not exist or user does not have perms."  # noqa: E501
@@ -102,6 +140,155 @@ async def event(eventid: str, info: Info) -> EventType:
     return EventType.from_pydantic(Event.model_validate(event))
 
 
+def _clash_locations(locations: List[str]) -> List[str]:
+    # rooms that events can clash in, "other" is not one place
+    return [location for location in locations if location != "other"]
+
+
+@strawberry.field
+async def clashReport(
+    info: Info,
+    states: List[Event_State_Status] | None = None,
+    window: timelot_type | None = None,
+) -> List[ClashSetType]:
+    """
+    Returns every room clash of the events in the given states, with each
+    other and with approved events, in one pass, for the approval queue.
+
+    The events are read once, and the bookings of each room are swept by
+    start time, pairing every booking with those still going on when it
+    starts. Bookings that only touch do not clash, as in clashingEvents.
+    Clashing bookings of a room are grouped into sets, so events that
+    clash through one another are reported together.
+
+    Args:
+        info (otypes.Info): The context information of user for the request.
+        states (List[mtypes.Event_State_Status] | None): states of the
+                                                         events to check,
+                                                         the pending states
+                                                         if None. Defaults
+                                                         to None.
+        window (otypes.timelot_type | None): only events overlapping this
+                                             time, those not over yet if
+                                             None. Defaults to None.
+
+    Returns:
+        (List[otypes.ClashSetType]): the clash sets, by start time.
+
+    Raises:
+        Exception: You do not have permission to access this resource.
+        ValueError: Invalid window.
+    """
+    user = info.context.user
+    if user is None or user["role"] not in ["cc", "slo"]:
+        raise Exception("You do not have permission to access this resource.")
+
+    if states is None:
+        states = [
+            Event_State_Status.pending_cc,
+            Event_State_Status.pending_budget,
+            Event_State_Status.pending_room,
+        ]
+    checked = {state.value for state in states}
+
+    if window is None:
+        bounds = [
+            datetime_condition("datetimeperiod.1", gt=datetime.now(TIMEZONE))
+        ]
+    else:
+        start, end = to_datetime(window[0]), to_datetime(window[1])
+        if start >= end:
+            raise ValueError("Start time must be before end time.")
+        bounds = [
+            datetime_condition("datetimeperiod.0", lt=end),
+            datetime_condition("datetimeperiod.1", gt=start),
+        ]
+
+    events = await eventsdb.find(
+        {
+            "status.state": {
+                "$in": list(checked | {Event_State_Status.approved.value})
+            },
+            "$and": bounds,
+        },
+        {
+            "name": 1,
+            "clubid": 1,
+            "status.state": 1,
+            "location": 1,
+            "datetimeperiod": 1,
+        },
+    ).to_list(length=None)
+
+    bookings = defaultdict(list)
+    for event in events:
+        event_start, event_end = (
+            to_datetime(value) for value in event["datetimeperiod"]
+        )
+        for location in _clash_locations(event.get("location") or []):
+            bookings[location].append((event_start, event_end, event))
+
+    clash_sets = []
+    for location, intervals in bookings.items():
+        for group in _clash_groups(intervals, checked):
+            clash_sets.append(
+                ClashSetType(
+                    location=Event_Location(location),
+                    start=min(start for start, _, _ in group),
+                    end=max(end for _, end, _ in group),
+                    events=[
+                        RoomClashType(
+                            eventid=event["_id"],
+                            name=event.get("name"),
+                            clubid=event.get("clubid"),
+                            state=Event_State_Status(event["status"]["state"]),
+                            location=Event_Location(location),
+                            start=start,
+                            end=end,
+                        )
+                        for start, end, event in group
+                    ],
+                )
+            )
+    clash_sets.sort(
+        key=lambda clash_set: (clash_set.start, clash_set.location)
+    )
+    return clash_sets
+
+
+def _clash_groups(
+    intervals: List[tuple[datetime, datetime, dict]], checked: set
+) -> List[List[tuple[datetime, datetime, dict]]]:
+    # sweeps the bookings of one room by start time, joining every booking
+    # with the ones still going on when it starts, if either is in a
+    # checked state, and returns the joined groups by start time
+    intervals.sort(key=lambda interval: (interval[0], interval[2]["_id"]))
+    parent = list(range(len(intervals)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    active: List[tuple[datetime, int]] = []
+    for i, (start, end, event) in enumerate(intervals):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, j in active:
+            if (
+                event["status"]["state"] in checked
+                or intervals[j][2]["status"]["state"] in checked
+            ):
+                parent[root(i)] = root(j)
+        heapq.heappush(active, (end, i))
+
+    groups = defaultdict(list)
+    for i, interval in enumerate(intervals):
+        groups[root(i)].append(interval)
+    return [group for group in groups.values() if len(group) > 1]
+
+
 @strawberry.field
 async def eventid(code: str, info: Info) -> str:
     """
@@ -162,6 +349,9 @@ async def events(
     pastEventsLimit is set to 4 months for public users and users with no
     special roles.
 
+    Responses to public viewers and to the cc, slc and slo roles are served
+    from events_cache, shared by every user of the same class.
+
     Args:
         info (otypes.Info): The context information of user for the request.
         clubid (str | None): The id of the club whose events are to be
@@ -197,6 +387,179 @@ async def events(
         Exception: Pagination limit is required.
     """
 
+    if not limit and paginationOn:
+        raise Exception("Pagination limit is required.")
+    if limit is not None and limit > 25:
+        raise Exception("Limit can not be greater than 25.")
+    if pastEventsLimit is not None and pastEventsLimit <= 0:
+        raise Exception("pastEventsLimit must be greater than 0.")
+    if pastEventsLimit is not None and pastEventsLimit > 6:
+        raise Exception("pastEventsLimit can not be greater than 6.")
+
+    searchspace, restrictAccess = await _events_searchspace(
+        info, clubid, public, location, hideDeleted
+    )
+
+    if restrictAccess and (
+        not paginationOn and pastEventsLimit is None and limit is None
+    ):
+        pastEventsLimit = 4
+
+    if excludeCompleted:
+        searchspace = {
+            "$and": [
+                searchspace,
+                datetime_condition(
+                    "datetimeperiod.1", gte=datetime.now(TIMEZONE)
+                ),
+            ]
+        }
+
+    projection = _event_projection(info.selected_fields[0].selections)
+
+    async def load() -> List[EventType]:
+        events = await events_with_sorting(
+            searchspace,
+            date_filter=False,
+            pagination=paginationOn,
+            name=name,
+            skip=skip,
+            limit=limit,
+            timings=timings,
+            pastEventsLimit=pastEventsLimit,
+            projection=projection,
+        )
+
+        # hides few fields from public viewers
+        if restrictAccess or public:
+            for event in events:
+                trim_public_events(event)
+
+        return [
+            EventType.from_pydantic(Event.model_validate(event))
+            for event in events
+        ]
+
+    role = response_cache_role(info.context.user, restrictAccess)
+    if role is None:
+        return await load()
+
+    key = (
+        "events",
+        role,
+        clubid,
+        name if paginationOn else None,
+        paginationOn,
+        skip if paginationOn else 0,
+        limit,
+        tuple(timings) if timings is not None else None,
+        pastEventsLimit,
+        tuple(sorted(location)) if location is not None else None,
+        excludeCompleted,
+        hideDeleted,
+        tuple(sorted(projection)),
+    )
+    return list(await events_cache.get(key, load))
+
+
+@strawberry.field
+async def eventsPage(
+    info: Info,
+    limit: int,
+    after: str | None = None,
+    clubid: str | None = None,
+    name: str | None = None,
+    public: bool | None = None,
+    timings: timelot_type | None = None,
+    pastEventsLimit: int | None = None,
+    location: List[Event_Location] | None = None,
+    hideDeleted: bool = False,
+) -> EventsPageType:
+    """
+    Returns one page of past events, latest first, with the same visibility
+    and filters as the events query.
+
+    Pages are linked by an opaque cursor instead of a skip count, so every
+    page costs the same however deep it is and pages do not shift when new
+    events are added. Pass the nextCursor of a page as after to get the
+    next one.
+
+    Args:
+        info (otypes.Info): The context information of user for the request.
+        limit (int): The number of events in the page, at most 25.
+        after (str | None): The nextCursor of the previous page, None for
+                            the first page. Defaults to None.
+        clubid (str | None): The id of the club whose events are to be
+                             fetched. Defaults to None.
+        name (str | None): The name of the event to be searched according to.
+                           Defaults to None.
+        public (bool | None): Whether to return only public events. Defaults
+                              to None.
+        timings (otypes.timelot_type | None): The time period for which the
+                                              events are to be fetched.
+                                              Defaults to None.
+        pastEventsLimit (int | None): Time Limit for the past events to
+                                      be fetched in months. Defaults to None.
+        location (List[mtypes.Event_Location] | None): The locations of the
+                                                       events to be fetched.
+                                                       Defaults to None.
+        hideDeleted (bool): Whether to hide deleted events. Defaults
+                            to False.
+
+    Returns:
+        (otypes.EventsPageType): The events of the page and the cursor of
+                                 the next page.
+
+    Raises:
+        Exception: Limit must be between 1 and 25.
+        Exception: Invalid cursor.
+    """
+    if limit <= 0 or limit > 25:
+        raise Exception("Limit must be between 1 and 25.")
+    if pastEventsLimit is not None and pastEventsLimit <= 0:
+        raise Exception("pastEventsLimit must be greater than 0.")
+    if pastEventsLimit is not None and pastEventsLimit > 6:
+        raise Exception("pastEventsLimit can not be greater than 6.")
+
+    searchspace, restrictAccess = await _events_searchspace(
+        info, clubid, public, location, hideDeleted
+    )
+
+    events, next_cursor = await past_events_page(
+        searchspace,
+        limit,
+        after=after,
+        name=name,
+        timings=timings,
+        pastEventsLimit=pastEventsLimit,
+        projection=_event_projection(
+            selected_subfields(info.selected_fields[0].selections, "events")
+        ),
+    )
+
+    # hides few fields from public viewers
+    if restrictAccess or public:
+        for event in events:
+            trim_public_events(event)
+
+    return EventsPageType(
+        events=[
+            EventType.from_pydantic(Event.model_validate(event))
+            for event in events
+        ],
+        nextCursor=next_cursor,
+    )
+
+
+async def _events_searchspace(
+    info: Info,
+    clubid: str | None,
+    public: bool | None,
+    location: List[Event_Location] | None,
+    hideDeleted: bool,
+) -> tuple[dict[str, Any], bool]:
+    # search space of the events the user may see, and whether the user has
+    # only public access
     user = info.context.user
 
     restrictAccess = True
@@ -220,19 +583,6 @@ async def events(
         "restrictAccess and not restrictFullAccess can not be True at the same time."  # noqa: E501
     )
 
-    if not limit and paginationOn:
-        raise Exception("Pagination limit is required.")
-    if limit is not None and limit > 25:
-        raise Exception("Limit can not be greater than 25.")
-    if restrictAccess and (
-        not paginationOn and pastEventsLimit is None and limit is None
-    ):
-        pastEventsLimit = 4
-    if pastEventsLimit is not None and pastEventsLimit <= 0:
-        raise Exception("pastEventsLimit must be greater than 0.")
-    if pastEventsLimit is not None and pastEventsLimit > 6:
-        raise Exception("pastEventsLimit can not be greater than 6.")
-
     searchspace: dict[str, Any] = {}
     if clubid is not None:
         searchspace["$or"] = [
@@ -240,11 +590,8 @@ async def events(
             {"collabclubs": {"$in": [clubid]}},
         ]
     else:
-        allclubs = await get_clubs(info.context.cookies)
-        list_allclubs = list()
-        for club in allclubs:
-            list_allclubs.append(club["cid"])
-        searchspace["clubid"] = {"$in": list_allclubs}
+        club_index = await get_club_index(info.context.cookies)
+        searchspace["clubid"] = {"$in": list(club_index.cids)}
 
     if restrictAccess:
         searchspace["status.state"] = {
@@ -274,37 +621,13 @@ async def events(
     if location is not None:
         searchspace["location"] = {"$in": location}
 
-    timings_str: List[str] | None = None
-    if timings is not None:
-        timings_str = [
-            timings[0].strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-            timings[1].strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-        ]
+    return searchspace, restrictAccess
 
-    if excludeCompleted:
-        now = (datetime.now(TIMEZONE)).strftime("%Y-%m-%dT%H:%M:%S+00:00")
-        searchspace["datetimeperiod.1"] = {"$gte": now}
 
-    events = await events_with_sorting(
-        searchspace,
-        date_filter=False,
-        pagination=paginationOn,
-        name=name,
-        skip=skip,
-        limit=limit,
-        timings=timings_str,
-        pastEventsLimit=pastEventsLimit,
-    )
-
-    # hides few fields from public viewers
-    if restrictAccess or public:
-        for event in events:
-            trim_public_events(event)
-
-    return [
-        EventType.from_pydantic(Event.model_validate(event))
-        for event in events
-    ]
+def _event_projection(selections) -> dict:
+    # fetches the selected fields, and those that access checks, trimming,
+    # sorting and validation always need
+    return selection_projection(selections, Event, EVENT_REQUIRED_FIELDS)
 
 
 @strawberry.field
@@ -327,6 +650,9 @@ async def calendarEvents(
     When pastEventsLimit is specified, the results are restricted to events
                             that occurred within that many months in the past.
 
+    Responses to public viewers and to the cc, slc and slo roles are served
+                from events_cache, shared by every user of the same class.
+
     Access control is role-based:
         public users can view only approved, non-internal events
         SLC and SLO, CC roles have full visibility into all events
@@ -349,70 +675,98 @@ async def calendarEvents(
                                                                         zero.
     """
     user = info.context.user
+    searchspace, restrictAccess = await calendar_searchspace(
+        user, clubid, info.context.cookies
+    )
 
-    restrictAccess = True
-    restrictFullAccess = True
-    clubAccess = False
+    if pastEventsLimit is not None and pastEventsLimit <= 0:
+        raise ValueError("pastEventsLimit must be greater than 0.")
 
-    if user is not None:
-        if user["role"] in ["cc", "slc", "slo"]:
-            restrictAccess = False
-            if user["role"] in ["cc"]:
-                restrictFullAccess = False
-        elif user["role"] == "club":
-            clubAccess = True
-            restrictAccess = False
-            if user["uid"] == clubid:
-                restrictFullAccess = False
+    projection = _event_projection(info.selected_fields[0].selections)
 
-    assert not (restrictAccess and not restrictFullAccess), (
-        "restrictAccess and not restrictFullAccess can not be True at the same time."  # noqa: E501
-    )
+    async def load() -> List[EventType]:
+        events = await events_with_sorting(
+            searchspace=searchspace,
+            pastEventsLimit=pastEventsLimit,
+            projection=projection,
+        )
 
-    searchspace: dict[str, Any] = {}
-    if clubid is not None:
-        searchspace["$or"] = [
-            {"clubid": clubid},
-            {"collabclubs": {"$in": [clubid]}},
-        ]
-    else:
-        allclubs = await get_clubs(info.context.cookies)
-        list_allclubs = list()
-        for club in allclubs:
-            list_allclubs.append(club["cid"])
-        searchspace["clubid"] = {"$in": list_allclubs}
+        for event in events:
+            trim_public_events(event)
 
-    if restrictAccess:
-        searchspace["status.state"] = {
-            "$in": [Event_State_Status.approved.value]
-        }
-        searchspace["audience"] = {"$nin": ["internal"]}
-    elif restrictFullAccess:
-        statuses = [
-            Event_State_Status.approved.value,
-            Event_State_Status.pending_budget.value,
-            Event_State_Status.pending_room.value,
+        return [
+            EventType.from_pydantic(Event.model_validate(event))
+            for event in events
         ]
-        if clubAccess:
-            searchspace["audience"] = {"$nin": ["internal"]}
-            statuses.append(Event_State_Status.pending_cc.value)
-            statuses.append(Event_State_Status.incomplete.value)
-        searchspace["status.state"] = {"$in": statuses}
 
-    if pastEventsLimit is not None and pastEventsLimit <= 0:
-        raise ValueError("pastEventsLimit must be greater than 0.")
+    role = response_cache_role(user, restrictAccess)
+    if role is None:
+        return await load()
 
-    events = await events_with_sorting(
-        searchspace=searchspace, pastEventsLimit=pastEventsLimit
+    key = (
+        "calendarEvents",
+        role,
+        clubid,
+        pastEventsLimit,
+        tuple(sorted(projection)),
+    )
+    return list(await events_cache.get(key, load))
+
+
+@strawberry.field
+async def eventsChangedSince(
+    info: Info,
+    token: str | None = None,
+    clubid: str | None = None,
+) -> EventsChangesType:
+    """
+    Returns the changes to the calendar events since a sync token, for
+    calendar clients to stay in sync without refetching every event.
+
+    Without a token, every event the user can see is returned, as in
+    calendarEvents. With the token returned by the previous call, only the
+    events created, edited, progressed or deleted since then are, split
+    into those the user can see and the ids of those the user can no
+    longer see. The same change may be returned twice, so clients should
+    apply them by id.
+
+    Args:
+        info (otypes.Info): User context
+        token (str | None): token returned by the previous call, None for a
+                            full sync. Defaults to None.
+        clubid (str | None): Optional club filter
+
+    Returns:
+        (otypes.EventsChangesType): The changed events, the ids of the
+                                    removed ones and the next token.
+
+    Raises:
+        Exception: Invalid sync token.
+    """
+    since = decode_sync_token(token) if token is not None else None
+    searchspace, _ = await calendar_searchspace(
+        info.context.user, clubid, info.context.cookies
+    )
+
+    events, removed, synced_at = await events_changed_since(
+        searchspace,
+        since,
+        projection=_event_projection(
+            selected_subfields(info.selected_fields[0].selections, "events")
+        ),
     )
 
     for event in events:
         trim_public_events(event)
 
-    return [
-        EventType.from_pydantic(Event.model_validate(event))
-        for event in events
-    ]
+    return EventsChangesType(
+        events=[
+            EventType.from_pydantic(Event.model_validate(event))
+            for event in events
+        ],
+        removed=removed,
+        token=encode_sync_token(synced_at),
+    )
 
 
 @strawberry.field
@@ -454,15 +808,28 @@ async def clashingEvents(
         raise Exception("Event with given id does not exist.")
 
     if filterByLocation:
-        event["location"] = [
-            loc for loc in event["location"] if loc != "other"
-        ]
+        event["location"] = _clash_locations(event["location"])
         searchspace["location"] = {"$in": event["location"]}
 
+    timings = [to_datetime(value) for value in event["datetimeperiod"]]
+    if filterByLocation:
+        await room_index.sync()
+    if filterByLocation and room_index.ready:
+        # only the events found in the room index are fetched
+        searchspace["_id"] = {
+            "$in": list(
+                room_index.overlapping(
+                    event["location"], timings[0], timings[1], strict=True
+                )
+            )
+        }
+        timings = None
+
     events = await events_with_sorting(
         searchspace,
         date_filter=False,
-        timings=event["datetimeperiod"],
+        timings=timings,
+        projection=_event_projection(info.selected_fields[0].selections),
     )
 
     return [
@@ -502,7 +869,8 @@ async def incompleteEvents(clubid: str, info: Info) -> List[EventType]:
                     {"collabclubs": {"$in": [clubid]}},
                 ],
                 "status.state": Event_State_Status.incomplete.value,
-            }
+            },
+            _event_projection(info.selected_fields[0].selections),
         )
         .sort("datetimeperiod.0", 1)
         .to_list(length=None)
@@ -631,7 +999,10 @@ async def pendingEvents(clubid: str | None, info: Info) -> List[EventType]:
             ]
 
     events = (
-        await eventsdb.find(searchspace)
+        await eventsdb.find(
+            searchspace,
+            _event_projection(info.selected_fields[0].selections),
+        )
         .sort("datetimeperiod.0", 1)
         .to_list(length=None)
     )
@@ -669,25 +1040,27 @@ async def availableRooms(
         raise Exception("You do not have permission to access this resource.")
 
     assert timeslot[0] < timeslot[1], "Invalid timeslot"
-    timeslot_str = [
-        timeslot[0].strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-        timeslot[1].strftime("%Y-%m-%dT%H:%M:%S+00:00"),
-    ]
 
-    approved_events = await eventsdb.find(
-        {
-            "status.state": Event_State_Status.approved.value,
-            "datetimeperiod.0": {"$lte": timeslot_str[1]},
-            "datetimeperiod.1": {"$gte": timeslot_str[0]},
-        },
-        {
-            "location": 1,
-        },
-    ).to_list(length=None)
+    await room_index.sync()
+    if room_index.ready:
+        occupied_rooms = room_index.occupied_rooms(timeslot[0], timeslot[1])
+    else:
+        approved_events = await eventsdb.find(
+            {
+                "status.state": Event_State_Status.approved.value,
+                "$and": [
+                    datetime_condition("datetimeperiod.0", lte=timeslot[1]),
+                    datetime_condition("datetimeperiod.1", gte=timeslot[0]),
+                ],
+            },
+            {
+                "location": 1,
+            },
+        ).to_list(length=None)
 
-    occupied_rooms = set()
-    for approved_event in approved_events:
-        occupied_rooms.update(approved_event["location"])
+        occupied_rooms = set()
+        for approved_event in approved_events:
+            occupied_rooms.update(approved_event["location"])
 
     if eventid is not None:
         event = await eventsdb.find_one({"_id": eventid}, {"location": 1})
@@ -707,6 +1080,321 @@ async def availableRooms(
     )
 
 
+@strawberry.field
+async def roomAvailabilityGrid(
+    start: datetime, end: datetime, info: Info, granularity: int = 60
+) -> RoomGridType:
+    """
+    Returns the availability of every room over a window, such as a day or
+    a week, divided into time slots, in one call.
+
+    A room is unavailable in a slot if an approved event held in it overlaps
+    the slot, including events that only touch it, ending at its start or
+    starting at its end, so every slot gets the same answer as
+    availableRooms.
+
+    Args:
+        start (datetime): start of the window
+        end (datetime): end of the window
+        info (otypes.Info): The context information of user for the request.
+        granularity (int): length of each slot, in minutes. Defaults to 60.
+
+    Returns:
+        (otypes.RoomGridType): the slots, the holidays they fall on and the
+                               availability of every room in them.
+
+    Raises:
+        Exception: You do not have permission to access this resource.
+        ValueError: Invalid window or granularity.
+    """
+    user = info.context.user
+
+    if user is None or user["role"] not in ["club", "cc", "slo"]:
+        raise Exception("You do not have permission to access this resource.")
+
+    start, end = to_datetime(start), to_datetime(end)
+    if start >= end:
+        raise ValueError("Start time must be before end time.")
+    if granularity < ROOM_GRID_MIN_GRANULARITY or granularity > 24 * 60:
+        raise ValueError(
+            f"Granularity must be between {ROOM_GRID_MIN_GRANULARITY} and"
+            f" {24 * 60} minutes."
+        )
+    step = timedelta(minutes=granularity)
+    slot_count = -((start - end) // step)
+    if slot_count > ROOM_GRID_MAX_SLOTS:
+        raise ValueError(
+            f"The window cannot have more than {ROOM_GRID_MAX_SLOTS} slots."
+        )
+
+    bookings = await _approved_bookings(start, end, strict=False)
+    holiday_names = await _holiday_names(start, end)
+    slots = [start + i * step for i in range(slot_count)]
+
+    return RoomGridType(
+        start=start,
+        end=end,
+        granularity=granularity,
+        slots=slots,
+        holidays=[
+            holiday_names.get(str(slot.astimezone(TIMEZONE).date()))
+            for slot in slots
+        ],
+        rooms=[
+            RoomSlotsType(
+                location=room,
+                available=[
+                    not occupied
+                    for occupied in _occupied_slots(
+                        bookings.get(room.value, []), start, step, slot_count
+                    )
+                ],
+            )
+            for room in Event_Location.__members__.values()
+        ],
+    )
+
+
+@strawberry.field
+async def suggestSlots(
+    rooms: List[Event_Location],
+    duration: int,
+    window: timelot_type,
+    info: Info,
+    count: int = 5,
+    workingHours: working_hours_type | None = None,
+) -> List[SuggestedSlotType]:
+    """
+    Returns the earliest time slots in the window in which any of the given
+    rooms is free for the given duration.
+
+    A room is free in a slot if no approved event held in it overlaps the
+    slot, including events that only touch it, as in availableRooms. Slots
+    start on multiples of SUGGEST_SLOTS_STEP minutes, never on holidays,
+    and each suggestion is the earliest slot of a different free period of
+    its room.
+
+    Args:
+        rooms (List[mtypes.Event_Location]): rooms to look in
+        duration (int): length of the slots, in minutes
+        window (otypes.timelot_type): start and end of the time to look in
+        info (otypes.Info): The context information of user for the request.
+        count (int): number of slots to return. Defaults to 5.
+        workingHours (otypes.working_hours_type | None): start and end of
+                                                        the day in IST that
+                                                        slots must fall in,
+                                                        any time if None.
+                                                        Defaults to None.
+
+    Returns:
+        (List[otypes.SuggestedSlotType]): the slots, by start time.
+
+    Raises:
+        Exception: You do not have permission to access this resource.
+        ValueError: Invalid rooms, duration, window, count or working hours.
+    """
+    user = info.context.user
+
+    if user is None or user["role"] not in ["club", "cc", "slo"]:
+        raise Exception("You do not have permission to access this resource.")
+
+    start, end = to_datetime(window[0]), to_datetime(window[1])
+    if not rooms:
+        raise ValueError("At least one room is required.")
+    if duration <= 0:
+        raise ValueError("Duration must be positive.")
+    if start >= end:
+        raise ValueError("Start time must be before end time.")
+    if end - start > timedelta(days=SUGGEST_SLOTS_MAX_DAYS):
+        raise ValueError(
+            f"The window cannot be longer than {SUGGEST_SLOTS_MAX_DAYS} days."
+        )
+    if count < 1 or count > SUGGEST_SLOTS_MAX_COUNT:
+        raise ValueError(
+            f"Count must be between 1 and {SUGGEST_SLOTS_MAX_COUNT}."
+        )
+    if workingHours is not None and workingHours[0] >= workingHours[1]:
+        raise ValueError("Working hours must start before they end.")
+
+    bookings = await _approved_bookings(start, end, strict=False)
+    periods = _open_periods(
+        start, end, await _holiday_names(start, end), workingHours
+    )
+    length = timedelta(minutes=duration)
+    step = timedelta(minutes=SUGGEST_SLOTS_STEP)
+
+    # the free slots of every room come by start time, so merging them
+    # gives the earliest ones of all the rooms, rooms in the order given
+    # for slots starting together
+    free_slots = heapq.merge(
+        *(
+            _free_slots(
+                room, bookings.get(room.value, []), periods, length, step
+            )
+            for room in dict.fromkeys(rooms)
+        ),
+        key=lambda slot: slot[1],
+    )
+    suggestions = []
+    for room, slot_start, slot_end in free_slots:
+        suggestions.append(
+            SuggestedSlotType(location=room, start=slot_start, end=slot_end)
+        )
+        if len(suggestions) == count:
+            break
+    return suggestions
+
+
+def _open_periods(
+    start: datetime,
+    end: datetime,
+    holiday_names: Dict[str, str],
+    working_hours: working_hours_type | None,
+) -> List[tuple[datetime, datetime]]:
+    # parts of the window that are not on a holiday and, if given, are in
+    # the working hours of their IST day
+    periods = []
+    day = start.astimezone(TIMEZONE).date()
+    while day <= end.astimezone(TIMEZONE).date():
+        if str(day) not in holiday_names:
+            if working_hours is None:
+                day_start = datetime.combine(day, time.min, TIMEZONE)
+                day_end = day_start + timedelta(days=1)
+            else:
+                day_start = datetime.combine(day, working_hours[0], TIMEZONE)
+                day_end = datetime.combine(day, working_hours[1], TIMEZONE)
+            day_start, day_end = max(day_start, start), min(day_end, end)
+            if day_start < day_end:
+                if periods and periods[-1][1] == day_start:
+                    periods[-1] = (periods[-1][0], day_end)
+                else:
+                    periods.append((day_start, day_end))
+        day += timedelta(days=1)
+    return periods
+
+
+def _free_slots(
+    room: Event_Location,
+    bookings: List[tuple[datetime, datetime]],
+    periods: List[tuple[datetime, datetime]],
+    length: timedelta,
+    step: timedelta,
+) -> Iterator[tuple[Event_Location, datetime, datetime]]:
+    # scans the gaps between the bookings of a room, by start time, for the
+    # earliest slot of each one that fits in an open period
+    first = 0
+    for period_start, period_end in periods:
+        slot_start = _step_start(period_start, step, after=False)
+        while slot_start + length <= period_end:
+            slot_end = slot_start + length
+            while first < len(bookings) and bookings[first][1] < slot_start:
+                first += 1
+
+            # bookings are by start time, so only those starting by the
+            # end of the slot can overlap it
+            blocked_until = None
+            i = first
+            while i < len(bookings) and bookings[i][0] <= slot_end:
+                if bookings[i][1] >= slot_start:
+                    blocked_until = max(
+                        blocked_until or bookings[i][1], bookings[i][1]
+                    )
+                i += 1
+
+            if blocked_until is None:
+                yield room, slot_start, slot_end
+                if i == len(bookings):
+                    break
+                # the next slot of the room is after the next booking
+                blocked_until = bookings[i][1]
+            slot_start = _step_start(blocked_until, step, after=True)
+
+
+def _step_start(value: datetime, step: timedelta, after: bool) -> datetime:
+    # first multiple of step from the epoch at or, if after, past value
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    start = epoch - (epoch - value) // step * step
+    if after and start == value:
+        start += step
+    return start
+
+
+async def _approved_bookings(
+    start: datetime, end: datetime, strict: bool
+) -> Dict[str, List[tuple[datetime, datetime]]]:
+    # (start, end) of the approved events in each room overlapping the
+    # window, by start time
+    await room_index.sync()
+    if room_index.ready:
+        return room_index.bookings(start, end, strict)
+
+    if strict:
+        bounds = [
+            datetime_condition("datetimeperiod.0", lt=end),
+            datetime_condition("datetimeperiod.1", gt=start),
+        ]
+    else:
+        bounds = [
+            datetime_condition("datetimeperiod.0", lte=end),
+            datetime_condition("datetimeperiod.1", gte=start),
+        ]
+    events = await eventsdb.find(
+        {"status.state": Event_State_Status.approved.value, "$and": bounds},
+        {"location": 1, "datetimeperiod": 1},
+    ).to_list(length=None)
+
+    bookings = {}
+    for event in events:
+        event_start, event_end = (
+            to_datetime(value) for value in event["datetimeperiod"]
+        )
+        for location in event.get("location") or []:
+            bookings.setdefault(location, []).append((event_start, event_end))
+    for intervals in bookings.values():
+        intervals.sort()
+    return bookings
+
+
+async def _holiday_names(start: datetime, end: datetime) -> Dict[str, str]:
+    # names of the holidays between the IST dates of start and end, by date
+    holidays = await holidaysdb.find(
+        {
+            "date": {
+                "$gte": str(start.astimezone(TIMEZONE).date()),
+                "$lte": str(end.astimezone(TIMEZONE).date()),
+            }
+        },
+        {"date": 1, "name": 1},
+    ).to_list(length=None)
+    return {holiday["date"]: holiday["name"] for holiday in holidays}
+
+
+def _occupied_slots(
+    intervals: List[tuple[datetime, datetime]],
+    start: datetime,
+    step: timedelta,
+    slot_count: int,
+) -> List[bool]:
+    # sweeps the boundaries of the intervals across the slots, counting the
+    # intervals overlapping or touching each one
+    changes: Dict[int, int] = {}
+    for interval_start, interval_end in intervals:
+        # first slot ending at or after the start of the interval
+        first = max(-((start - interval_start) // step) - 1, 0)
+        # first slot starting after the end of the interval
+        last = min((interval_end - start) // step + 1, slot_count)
+        if first < last:
+            changes[first] = changes.get(first, 0) + 1
+            changes[last] = changes.get(last, 0) - 1
+
+    occupied = []
+    active = 0
+    for i in range(slot_count):
+        active += changes.get(i, 0)
+        occupied.append(active > 0)
+    return occupied
+
+
 @strawberry.field
 async def downloadEventsData(
     details: InputDataReportDetails, info: Info
@@ -735,176 +1423,26 @@ async def downloadEventsData(
     Raises:
         Exception: You do not have permission to access this resource.
         Exception: Invalid status.
+        Exception: Invalid field.
     """
     user = info.context.user
     if user is None:
         raise Exception("You do not have permission to access this resource.")
 
-    if details.status not in ["pending", "approved", "all"]:
-        raise Exception("Invalid status")
-
-    all_events = list()
-    allclubs = await get_clubs(info.context.cookies)
-    searchspace: dict[str, Any] = {}
-
-    if details.clubid:
-        clubid = details.clubid
-        if details.clubid == "allclubs":
-            if user["role"] in ["cc", "slo"]:
-                clubid = None
-            else:
-                clubid = user["uid"]
-        if user is not None:
-            if clubid is not None:
-                searchspace["$or"] = [
-                    {"clubid": clubid},
-                    {"collabclubs": {"$in": [clubid]}},
-                ]
-            else:
-                list_allclubs = [club["cid"] for club in allclubs]
-                searchspace["clubid"] = {"$in": list_allclubs}
-
-            # filter by date
-            if details.dateperiod:
-                datetime_start = details.dateperiod[0].strftime(
-                    "%Y-%m-%dT00:00:00+00:00"
-                )
-                datetime_end = details.dateperiod[1].strftime(
-                    "%Y-%m-%dT23:59:59+00:00"
-                )
-                searchspace["datetimeperiod.0"] = {
-                    "$gte": datetime_start,
-                    "$lte": datetime_end,
-                }
-
-            if (
-                user["role"] not in ["cc", "slo"]
-                or details.status == "approved"
-            ):
-                searchspace["status.state"] = {
-                    "$in": [
-                        Event_State_Status.approved.value,
-                    ]
-                }
-            else:
-                to_exclude = [
-                    Event_State_Status.incomplete.value,
-                ]
-                if details.status == "pending":
-                    to_exclude.append(Event_State_Status.approved.value)
-                if user["role"] == "slo":
-                    to_exclude.append(Event_State_Status.pending_cc.value)
-                else:
-                    to_exclude.append(Event_State_Status.deleted.value)
-
-                searchspace["status.state"] = {
-                    "$nin": to_exclude,
-                }
+    check_export_fields(details.fields)
+    club_index = await get_club_index(info.context.cookies)
+    searchspace = export_searchspace(
+        user, details.clubid, details.status, details.dateperiod, club_index
+    )
 
-            all_events = await events_with_sorting(
-                searchspace, date_filter=True
+    csv_content = "".join(
+        [
+            chunk
+            async for chunk in export_csv(
+                searchspace, details.fields, details.status, club_index.names
             )
-
-    header_mapping = {
-        "code": "Event Code",
-        "name": "Event Name",
-        "clubid": "Club",
-        "datetimeperiod.0": "StartDate",
-        "datetimeperiod.1": "EndDate",
-        "description": "Description",
-        "audience": "Audience",
-        "population": "Audience Count",
-        "mode": "Mode",
-        "location": "Venue",
-        "budget": "Budget",
-        "poster": "Poster URL",
-        "status": "Status",
-        "equipment": "Equipment",
-        "additional": "Additional Requests",
-        "event_report_submitted": "Event Report Submitted",
-    }
-
-    # Prepare CSV content
-    csv_output = io.StringIO()
-    fieldnames = [
-        header_mapping.get(field.lower(), field)
-        for field in details.fields
-        if field != "status"
-    ]
-
-    if details.status != "approved":
-        fieldnames.append(header_mapping["status"])
-
-    club_names = dict()
-    for club in allclubs:
-        club_names[club["cid"]] = club["name"]
-
-    csv_writer = csv.DictWriter(csv_output, fieldnames=fieldnames)
-    csv_writer.writeheader()
-
-    for event in all_events:
-        event_data = {}
-        for field in details.fields:
-            mapped_field = header_mapping.get(field, field)
-            if mapped_field not in fieldnames:
-                continue
-
-            value = event.get(field)
-
-            if field in ["datetimeperiod.0", "datetimeperiod.1"]:
-                value = event["datetimeperiod"]
-                value = (
-                    value[0].split("T")[0]
-                    if field == "datetimeperiod.0"
-                    else value[1].split("T")[0]
-                )
-            elif field == "clubid":
-                value = club_names.get(value, None)
-
-                collab_clubs = event.get("collabclubs", [])
-                collab_club_names = [value] if value else []
-                for cid in collab_clubs:
-                    club_name = club_names.get(cid, None)
-                    if club_name:
-                        collab_club_names.append(club_name)
-                value = ", ".join(collab_club_names)
-            elif field == "location":
-                value = event.get(field, [])
-                if len(value) >= 1:
-                    value = ", ".join(
-                        getattr(Event_Full_Location, loc)
-                        if loc != "other"
-                        else (event.get("otherLocation") or "other")
-                        for loc in value
-                    )
-            elif field == "budget":
-                if isinstance(value, list):
-                    budget_items = [
-                        f"{item['description']} {'(Advance)' if item['advance'] else ''}: {item['amount']}"  # noqa: E501
-                        for item in value
-                    ]
-                    value = ", ".join(budget_items)
-            elif field == "status":
-                status_value = event.get(field, {})
-                value = status_value.get("state", None)
-
-                if value:
-                    value = getattr(Event_Full_State_Status, value)
-            elif field == "event_report_submitted":
-                if value is None:
-                    value = "No Event Report Required"
-                else:
-                    value = "Yes" if value else "No"
-
-            if value in [None, "", []]:
-                value = "No " + mapped_field
-
-            event_data[mapped_field] = value
-
-        csv_writer.writerow(event_data)
-
-    csv_content = csv_output.getvalue()
-    csv_output.close()
+        ]
+    )
 
     return CSVResponse(
         csvFile=csv_content,
@@ -917,12 +1455,17 @@ async def downloadEventsData(
 queries = [
     event,
     events,
+    eventsPage,
     calendarEvents,
+    eventsChangedSince,
     clashingEvents,
+    clashReport,
     eventid,
     incompleteEvents,
     # approvedEvents,
     pendingEvents,
     availableRooms,
+    roomAvailabilityGrid,
+    suggestSlots,
     downloadEventsData,
 ]
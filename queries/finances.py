@@ -6,7 +6,7 @@ import strawberry
 from db import eventsdb
 from mtypes import Bills_Status, Event_State_Status
 from otypes import BillsStatusType, Info
-from utils import TIMEZONE
+from utils import TIMEZONE, datetime_condition, to_datetime
 
 
 @strawberry.field
@@ -56,9 +56,7 @@ async def eventBills(eventid: str, info: Info) -> Bills_Status:
                   have access to it or it is not approved."
         )
 
-    if event["datetimeperiod"][1] > datetime.now(TIMEZONE).strftime(
-        "%Y-%m-%dT%H:%M:%S.%fZ"
-    ):
+    if to_datetime(event["datetimeperiod"][1]) > datetime.now(TIMEZONE):
         raise ValueError(f"{event['name']} has not ended yet.")
 
     if (
@@ -105,9 +103,9 @@ async def allEventsBills(info: Info) -> List[BillsStatusType]:
 
     searchspace = {
         "status.state": Event_State_Status.approved.value,
-        "datetimeperiod.1": {
-            "$lt": datetime.now(TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        },
+        "$and": [
+            datetime_condition("datetimeperiod.1", lt=datetime.now(TIMEZONE))
+        ],
         "bills_status": {"$exists": True},
         "budget": {
             "$exists": True,
@@ -0,0 +1,196 @@
+"""
+Circuit breakers and latency budgets for inter-service calls.
+
+Every upstream host (gateway, auth, files) gets its own circuit breaker, so
+that one degraded service fails fast instead of tying up every request
+waiting on its timeout. A per-request latency budget caps the total time a
+request may spend waiting on upstreams.
+
+Attributes:
+    BREAKER_FAILURE_THRESHOLD (int): consecutive failures that open a
+                                     breaker. Defaults to 5.
+    BREAKER_RESET_TIMEOUT (float): seconds a breaker stays open before a
+                                   trial call is let through. Defaults
+                                   to 30.
+    REQUEST_LATENCY_BUDGET (float): seconds a request may spend on upstream
+                                    calls, 0 disables it. Defaults to 15.
+"""
+
+import os
+import time
+from contextvars import Context, ContextVar, copy_context
+from typing import Dict
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+REQUEST_LATENCY_BUDGET = float(os.getenv("REQUEST_LATENCY_BUDGET", "15"))
+
+# monotonic deadline of the request being served, if any
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+
+
+class LatencyBudgetExceeded(Exception):
+    """
+    Raised instead of calling an upstream once the request has used up its
+    latency budget.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream service.
+
+    The breaker is `closed` while calls succeed. After failure_threshold
+    consecutive failures it trips to `open` and rejects calls. Once
+    reset_timeout seconds have passed it goes `half_open` and lets a
+    single trial call through, which closes or re-opens it.
+
+    Attributes:
+        name (str): name of the upstream.
+        failure_threshold (int): consecutive failures that open the breaker.
+        reset_timeout (float): seconds to stay open before a trial call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """
+        Checks whether a call may be made now.
+
+        Returns:
+            (bool): True if the call may go ahead.
+        """
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                self.rejected += 1
+                return False
+            self._trial_in_flight = True
+
+        return True
+
+    def release(self) -> None:
+        """
+        Releases a call that ended without an outcome (e.g. cancelled).
+        """
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """
+        Records a successful call, closing the breaker.
+        """
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """
+        Records a failed call, opening the breaker if needed.
+        """
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or (
+            self.state == "closed" and self.failures >= self.failure_threshold
+        ):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+    def snapshot(self) -> Dict:
+        """
+        Returns the breaker's state for monitoring.
+
+        Returns:
+            (Dict): state, consecutive failures, trip and rejection counts.
+        """
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+"""circuit breakers by upstream name"""
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker of an upstream, creating it on first use.
+
+    Args:
+        name (str): name of the upstream
+
+    Returns:
+        (CircuitBreaker): the upstream's breaker.
+    """
+    breaker = breakers.get(name)
+    if breaker is None:
+        breaker = breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def start_latency_budget(budget: float = REQUEST_LATENCY_BUDGET) -> None:
+    """
+    Starts the latency budget of the request being served.
+
+    Args:
+        budget (float): seconds available for upstream calls, 0 disables
+                        the budget. Defaults to REQUEST_LATENCY_BUDGET.
+    """
+    _deadline.set(time.monotonic() + budget if budget > 0 else None)
+
+
+def remaining_budget() -> float | None:
+    """
+    Returns the seconds left in the current request's latency budget.
+
+    Returns:
+        (float | None): seconds left, None outside of a budgeted request.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def without_latency_budget() -> Context:
+    """
+    Returns a copy of the current context without a latency budget, to run
+    background tasks in. Tasks copy the context of the request that creates
+    them, and would otherwise fail once its budget is used up even though
+    nobody is waiting on them.
+
+    Returns:
+        (contextvars.Context): the context, for asyncio.create_task.
+    """
+    context = copy_context()
+    context.run(_deadline.set, None)
+    return context
@@ -0,0 +1,270 @@
+"""
+Ledger of the rooms booked by events, for clash checks at write time.
+
+Every event that holds or requests rooms has one document per room and
+interval in the room_bookings collection. Long events are split into
+intervals of at most ROOM_BOOKING_CHUNK_HOURS, so a clash check only reads
+the bookings of each room starting in a bounded range before the checked
+slot. The event mutations keep the ledger current through refresh_bookings,
+and reconcile_bookings rewrites it from the events every
+ROOM_BOOKING_RECONCILE_INTERVAL seconds, for writes whose refresh failed.
+
+Attributes:
+    ROOM_BOOKING_CHUNK_HOURS (int): longest interval of one booking
+                                    document, in hours. Defaults to 24.
+    ROOM_BOOKING_RECONCILE_INTERVAL (int): seconds between reconciliations
+                                           of the ledger with the events.
+                                           Defaults to 3600.
+    BOOKING_STATES (List[str]): states of the events that hold or request
+                                their rooms.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Sequence
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from pymongo import DeleteMany, ReplaceOne
+
+from db import eventsdb, room_bookingsdb
+from mtypes import Event_State_Status
+from utils import TIMEZONE, to_datetime
+
+ROOM_BOOKING_CHUNK_HOURS = int(os.getenv("ROOM_BOOKING_CHUNK_HOURS", "24"))
+ROOM_BOOKING_RECONCILE_INTERVAL = int(
+    os.getenv("ROOM_BOOKING_RECONCILE_INTERVAL", "3600")
+)
+
+BOOKING_STATES = [
+    Event_State_Status.pending_cc.value,
+    Event_State_Status.pending_budget.value,
+    Event_State_Status.pending_room.value,
+    Event_State_Status.approved.value,
+]
+
+BOOKING_FIELDS = {
+    "name": 1,
+    "clubid": 1,
+    "status.state": 1,
+    "location": 1,
+    "datetimeperiod": 1,
+}
+
+CHUNK = timedelta(hours=ROOM_BOOKING_CHUNK_HOURS)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+async def refresh_bookings(eventid: str) -> None:
+    """
+    Replaces the bookings of an event after it has been written.
+
+    The current bookings are upserted by event, room and start before the
+    others of the event are deleted, in one ordered bulk write, so readers
+    never see a booked event without bookings and concurrent refreshes do
+    not duplicate them.
+
+    Args:
+        eventid (str): id of the event
+    """
+    event = await eventsdb.find_one({"_id": eventid}, BOOKING_FIELDS)
+    documents = booking_documents(event) if event is not None else []
+    await room_bookingsdb.bulk_write(
+        _booking_writes(eventid, documents, datetime.now(timezone.utc))
+    )
+
+
+def booking_documents(event: dict) -> List[dict]:
+    """
+    Builds the booking documents of an event.
+
+    Args:
+        event (dict): the event, with at least the fields in BOOKING_FIELDS
+
+    Returns:
+        (List[dict]): one document per room and interval, none if the event
+                      does not hold or request rooms.
+    """
+    state = event.get("status", {}).get("state")
+    rooms = [room for room in event.get("location") or [] if room != "other"]
+    if state not in BOOKING_STATES or not rooms:
+        return []
+
+    start, end = (to_datetime(value) for value in event["datetimeperiod"])
+    return [
+        {
+            "eventid": event["_id"],
+            "room": room,
+            "start": chunk_start,
+            "end": chunk_end,
+            "event_start": start,
+            "event_end": end,
+            "state": state,
+            "name": event.get("name"),
+            "clubid": event.get("clubid"),
+        }
+        for room in rooms
+        for chunk_start, chunk_end in _chunks(start, end)
+    ]
+
+
+async def find_clashes(
+    slots: Sequence[tuple[str | None, Sequence[str], datetime, datetime]],
+) -> List[List[dict]]:
+    """
+    Finds the bookings of other events that overlap each of many time
+    slots in any of their rooms, in one query. Bookings that only touch a
+    slot do not clash, as in clashingEvents.
+
+    Args:
+        slots (Sequence[tuple[str | None, Sequence[str], datetime,
+               datetime]]): the event whose own bookings are left out, the
+                            rooms to check and the start and end of each
+                            slot.
+
+    Returns:
+        (List[List[dict]]): for each slot, one booking per clashing event
+                            and room, with the start and end of the whole
+                            event, by start time.
+    """
+    checks = [
+        (
+            eventid,
+            {room for room in rooms if room != "other"},
+            to_datetime(start),
+            to_datetime(end),
+        )
+        for eventid, rooms, start, end in slots
+    ]
+    conditions = []
+    for eventid, rooms, start, end in checks:
+        if not rooms:
+            continue
+        condition = {
+            "room": {"$in": sorted(rooms)},
+            # no booking document is longer than CHUNK
+            "start": {"$gte": start - CHUNK, "$lt": end},
+            "end": {"$gt": start},
+        }
+        if eventid is not None:
+            condition["eventid"] = {"$ne": eventid}
+        conditions.append(condition)
+    if not conditions:
+        return [[] for _ in checks]
+
+    bookings = await room_bookingsdb.find(
+        {"$or": conditions}, {"_id": 0}
+    ).to_list(length=None)
+
+    results = []
+    for eventid, rooms, start, end in checks:
+        clashes = {}
+        for booking in bookings:
+            if (
+                booking["eventid"] != eventid
+                and booking["room"] in rooms
+                and booking["start"] < end
+                and booking["end"] > start
+            ):
+                clashes.setdefault(
+                    (booking["eventid"], booking["room"]), booking
+                )
+        results.append(
+            sorted(
+                clashes.values(),
+                key=lambda booking: (
+                    booking["event_start"],
+                    booking["eventid"],
+                ),
+            )
+        )
+    return results
+
+
+async def reconcile_bookings(batch_size: int = 500) -> int:
+    """
+    Rewrites the whole ledger from the events, in place, and then deletes
+    the bookings that were not written since it started.
+
+    Args:
+        batch_size (int): number of events written per round trip.
+                          Defaults to 500.
+
+    Returns:
+        (int): the number of booking documents written.
+    """
+    started = datetime.now(timezone.utc)
+    written = 0
+    writes = []
+    cursor = eventsdb.find(
+        {"status.state": {"$in": BOOKING_STATES}}, BOOKING_FIELDS
+    ).batch_size(batch_size)
+    async for event in cursor:
+        documents = booking_documents(event)
+        writes.extend(
+            _booking_writes(
+                event["_id"], documents, datetime.now(timezone.utc)
+            )
+        )
+        written += len(documents)
+        if len(writes) >= batch_size:
+            await room_bookingsdb.bulk_write(writes)
+            writes = []
+    if writes:
+        await room_bookingsdb.bulk_write(writes)
+
+    # bookings of events that no longer hold rooms, or left behind by a
+    # refresh that failed
+    await room_bookingsdb.delete_many(
+        {"written_at": {"$not": {"$gte": started}}}
+    )
+    return written
+
+
+def init_room_bookings() -> None:
+    """
+    Schedules the reconciliations of the ledger, the first one right away.
+    """
+    scheduler = AsyncIOScheduler(timezone=TIMEZONE)
+    scheduler.add_job(
+        reconcile_bookings,
+        "interval",
+        seconds=ROOM_BOOKING_RECONCILE_INTERVAL,
+        next_run_time=datetime.now(TIMEZONE),
+    )
+    scheduler.start()
+
+
+def _booking_writes(
+    eventid: str, documents: List[dict], written_at: datetime
+) -> list:
+    # upserts the current bookings, then deletes the older ones of the event
+    writes: list = [
+        ReplaceOne(
+            {
+                "eventid": document["eventid"],
+                "room": document["room"],
+                "start": document["start"],
+            },
+            {**document, "written_at": written_at},
+            upsert=True,
+        )
+        for document in documents
+    ]
+    writes.append(
+        DeleteMany(
+            {"eventid": eventid, "written_at": {"$not": {"$gte": written_at}}}
+        )
+    )
+    return writes
+
+
+def _chunks(
+    start: datetime, end: datetime
+) -> Iterable[tuple[datetime, datetime]]:
+    # splits the interval at multiples of CHUNK from the epoch
+    chunk_start = start
+    while chunk_start < end:
+        boundary = EPOCH + ((chunk_start - EPOCH) // CHUNK + 1) * CHUNK
+        chunk_end = min(boundary, end)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end
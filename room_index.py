@@ -0,0 +1,426 @@
+"""
+In-memory index of the rooms booked by approved events.
+
+Every room keeps the approved events held in it as a list of intervals
+sorted by start time, so the events overlapping a time slot are found with
+a binary search instead of a database scan. The index is built at startup
+and kept current by the event mutations through refresh_event.
+
+Writes made by other instances of the service are picked up by sync, which
+the resolvers call before answering from the index: it reads the events
+whose updated_at changed since the last sync through the
+events_by_update_time index, so answers include every write committed
+before the resolver ran. The index is also rebuilt from MongoDB every
+ROOM_INDEX_REBUILD_INTERVAL seconds, for changes made without updated_at,
+e.g. by scripts.
+
+Attributes:
+    ROOM_INDEX_REBUILD_INTERVAL (int): seconds between full rebuilds of the
+                                       index. Defaults to 300.
+    ROOM_INDEX_LONG_INTERVAL_HOURS (int): events longer than this many
+                                          hours are kept apart from the
+                                          sorted intervals. Defaults to 24.
+    room_index (RoomIndex): the index used by the resolvers.
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from db import eventsdb
+from mtypes import Event_State_Status
+from utils import (
+    EVENTS_SYNC_OVERLAP,
+    TIMEZONE,
+    datetime_condition,
+    to_datetime,
+)
+
+ROOM_INDEX_REBUILD_INTERVAL = int(
+    os.getenv("ROOM_INDEX_REBUILD_INTERVAL", "300")
+)
+ROOM_INDEX_LONG_INTERVAL_HOURS = int(
+    os.getenv("ROOM_INDEX_LONG_INTERVAL_HOURS", "24")
+)
+
+BOOKING_FIELDS = {"status.state": 1, "location": 1, "datetimeperiod": 1}
+
+LONG_INTERVAL = timedelta(hours=ROOM_INDEX_LONG_INTERVAL_HOURS)
+
+
+class RoomIntervals:
+    """
+    Intervals of the events held in one room, sorted by start time.
+
+    An event overlapping a slot starts at most max_duration before it, so a
+    lookup only scans the intervals starting from then on. Events longer
+    than LONG_INTERVAL, which would widen that scan for every slot, are
+    kept in a separate list that every lookup checks whole, so a lookup
+    takes O(log n + k) time plus the few long events of the room.
+
+    Attributes:
+        intervals (List[tuple[datetime, str, datetime]]): (start, event id,
+                                                          end) of every
+                                                          event up to
+                                                          LONG_INTERVAL
+                                                          long.
+        starts (List[datetime]): start times, for binary search.
+        max_duration (timedelta): longest of those intervals, bounding how
+                                  far before a slot an overlapping event
+                                  can start.
+        long_intervals (List[tuple[datetime, str, datetime]]): (start, event
+                                                               id, end) of
+                                                               the longer
+                                                               events.
+    """
+
+    def __init__(self) -> None:
+        self.intervals: List[tuple[datetime, str, datetime]] = []
+        self.starts: List[datetime] = []
+        self.max_duration = timedelta(0)
+        self.long_intervals: List[tuple[datetime, str, datetime]] = []
+
+    def add(self, start: datetime, end: datetime, eventid: str) -> None:
+        if end - start > LONG_INTERVAL:
+            self.long_intervals.append((start, eventid, end))
+            return
+        i = bisect_left(self.intervals, (start, eventid, end))
+        self.intervals.insert(i, (start, eventid, end))
+        self.starts.insert(i, start)
+        self.max_duration = max(self.max_duration, end - start)
+
+    def remove(self, start: datetime, end: datetime, eventid: str) -> None:
+        if end - start > LONG_INTERVAL:
+            if (start, eventid, end) in self.long_intervals:
+                self.long_intervals.remove((start, eventid, end))
+            return
+        i = bisect_left(self.intervals, (start, eventid, end))
+        if i < len(self.intervals) and self.intervals[i][1] == eventid:
+            del self.intervals[i]
+            del self.starts[i]
+            if end - start == self.max_duration:
+                self.max_duration = max(
+                    (e - s for s, _, e in self.intervals),
+                    default=timedelta(0),
+                )
+
+    def overlapping(
+        self, start: datetime, end: datetime, strict: bool
+    ) -> Iterable[str]:
+        for _, eventid, _ in self._overlapping(start, end, strict):
+            yield eventid
+
+    def between(
+        self, start: datetime, end: datetime, strict: bool
+    ) -> Iterable[tuple[datetime, datetime]]:
+        # (start, end) of the events overlapping the slot, by start time
+        intervals = sorted(self._overlapping(start, end, strict))
+        for interval_start, _, interval_end in intervals:
+            yield interval_start, interval_end
+
+    def _overlapping(
+        self, start: datetime, end: datetime, strict: bool
+    ) -> Iterable[tuple[datetime, str, datetime]]:
+        # events starting after start - max_duration are the only short ones
+        # that can still be going on at start
+        lo = bisect_left(self.starts, start - self.max_duration)
+        if strict:
+            hi = bisect_left(self.starts, end)
+        else:
+            hi = bisect_right(self.starts, end)
+        for interval in self.intervals[lo:hi]:
+            if _overlaps(interval, start, end, strict):
+                yield interval
+        for interval in self.long_intervals:
+            if _overlaps(interval, start, end, strict):
+                yield interval
+
+
+def _overlaps(
+    interval: tuple[datetime, str, datetime],
+    start: datetime,
+    end: datetime,
+    strict: bool,
+) -> bool:
+    # whether the interval overlaps the slot, or only touches it if not
+    # strict
+    interval_start, _, interval_end = interval
+    if strict:
+        return interval_start < end and interval_end > start
+    return interval_start <= end and interval_end >= start
+
+
+class RoomIndex:
+    """
+    Rooms booked by approved events, by room.
+
+    Attributes:
+        ready (bool): whether the index has been built.
+        built_at (datetime | None): time of the last full build.
+        synced_at (datetime | None): time up to which writes of other
+                                     instances have been applied.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.built_at: datetime | None = None
+        self.synced_at: datetime | None = None
+        self._rooms: Dict[str, RoomIntervals] = {}
+        self._bookings: Dict[str, tuple[datetime, datetime, List[str]]] = {}
+        self._building = False
+        self._changed: Set[str] = set()
+
+    async def build(self) -> None:
+        """
+        Rebuilds the index from the approved events in MongoDB.
+        """
+        self._building = True
+        self._changed = set()
+        started = datetime.now(TIMEZONE)
+        try:
+            rooms: Dict[str, RoomIntervals] = {}
+            bookings = {}
+            cursor = eventsdb.find(
+                {"status.state": Event_State_Status.approved.value},
+                BOOKING_FIELDS,
+            )
+            async for event in cursor:
+                booking = _booking(event)
+                if booking is None:
+                    continue
+                start, end, locations = booking
+                bookings[event["_id"]] = booking
+                for location in locations:
+                    rooms.setdefault(location, RoomIntervals()).add(
+                        start, end, event["_id"]
+                    )
+        finally:
+            self._building = False
+
+        self._rooms = rooms
+        self._bookings = bookings
+        self.ready = True
+        self.built_at = datetime.now(TIMEZONE)
+        self.synced_at = started
+
+        # events changed while the build was reading
+        changed, self._changed = self._changed, set()
+        for eventid in changed:
+            await self.refresh_event(eventid)
+
+    async def refresh_event(self, eventid: str) -> None:
+        """
+        Updates the rooms booked by an event after it has been written.
+
+        Args:
+            eventid (str): id of the event
+        """
+        if self._building:
+            self._changed.add(eventid)
+
+        event = await eventsdb.find_one({"_id": eventid}, BOOKING_FIELDS)
+        self._apply(eventid, event)
+
+    async def sync(self) -> None:
+        """
+        Applies the events written since the last sync, by this or any
+        other instance, so that the index answers for every committed
+        write. Writes still in flight may be missed, as with a query.
+        """
+        if not self.ready:
+            return
+
+        synced_at = datetime.now(TIMEZONE)
+        # looks back a little, for writes that set updated_at before the
+        # last sync but committed after it
+        since = self.synced_at - timedelta(seconds=EVENTS_SYNC_OVERLAP)
+        events = await eventsdb.find(
+            {"updated_at": {"$gte": since}}, BOOKING_FIELDS
+        ).to_list(length=None)
+        for event in events:
+            self._apply(event["_id"], event)
+        self.synced_at = max(self.synced_at, synced_at)
+
+    def _apply(self, eventid: str, event: dict | None) -> None:
+        # replaces the bookings of an event with those of its stored
+        # version
+        old = self._bookings.pop(eventid, None)
+        if old is not None:
+            start, end, locations = old
+            for location in locations:
+                self._rooms[location].remove(start, end, eventid)
+
+        booking = _booking(event) if event is not None else None
+        if booking is None:
+            return
+        start, end, locations = booking
+        self._bookings[eventid] = booking
+        for location in locations:
+            self._rooms.setdefault(location, RoomIntervals()).add(
+                start, end, eventid
+            )
+
+    def overlapping(
+        self,
+        rooms: Iterable[str],
+        start: datetime,
+        end: datetime,
+        strict: bool = False,
+    ) -> Set[str]:
+        """
+        Returns the approved events held in any of the rooms that overlap a
+        time slot.
+
+        Args:
+            rooms (Iterable[str]): rooms to look in
+            start (datetime): start of the slot
+            end (datetime): end of the slot
+            strict (bool): if True, events that only touch the slot, ending
+                           at its start or starting at its end, do not
+                           overlap it. Defaults to False.
+
+        Returns:
+            (Set[str]): ids of the overlapping events.
+        """
+        start, end = to_datetime(start), to_datetime(end)
+        eventids = set()
+        for room in rooms:
+            intervals = self._rooms.get(room)
+            if intervals is not None:
+                eventids.update(intervals.overlapping(start, end, strict))
+        return eventids
+
+    def occupied_rooms(self, start: datetime, end: datetime) -> Set[str]:
+        """
+        Returns the rooms held by an approved event at any time in a slot,
+        including events that only touch it.
+
+        Args:
+            start (datetime): start of the slot
+            end (datetime): end of the slot
+
+        Returns:
+            (Set[str]): the occupied rooms.
+        """
+        start, end = to_datetime(start), to_datetime(end)
+        return {
+            room
+            for room, intervals in self._rooms.items()
+            if next(intervals.overlapping(start, end, False), None) is not None
+        }
+
+    def bookings(
+        self, start: datetime, end: datetime, strict: bool = False
+    ) -> Dict[str, List[tuple[datetime, datetime]]]:
+        """
+        Returns the times every room is held by an approved event in a
+        window.
+
+        Args:
+            start (datetime): start of the window
+            end (datetime): end of the window
+            strict (bool): if True, events that only touch the window,
+                           ending at its start or starting at its end, are
+                           left out. Defaults to False.
+
+        Returns:
+            (Dict[str, List[tuple[datetime, datetime]]]): (start, end) of the
+                                                         events in each
+                                                         room, by start time.
+        """
+        start, end = to_datetime(start), to_datetime(end)
+        return {
+            room: list(intervals.between(start, end, strict))
+            for room, intervals in self._rooms.items()
+        }
+
+    async def check_consistency(
+        self, slots: Iterable[tuple[datetime, datetime]]
+    ) -> List[str]:
+        """
+        Compares the occupied rooms the index gives for each slot with
+        those MongoDB gives, to check that the index is current.
+
+        Args:
+            slots (Iterable[tuple[datetime, datetime]]): slots to compare
+
+        Returns:
+            (List[str]): a description of every mismatch, empty if there
+                         are none.
+        """
+        mismatches = []
+        for start, end in slots:
+            events = await eventsdb.find(
+                {
+                    "status.state": Event_State_Status.approved.value,
+                    "$and": [
+                        datetime_condition("datetimeperiod.0", lte=end),
+                        datetime_condition("datetimeperiod.1", gte=start),
+                    ],
+                },
+                {"location": 1},
+            ).to_list(length=None)
+            expected = {
+                location
+                for event in events
+                for location in event.get("location") or []
+            }
+            found = self.occupied_rooms(start, end)
+            if found != expected:
+                mismatches.append(
+                    f"{start.isoformat()} - {end.isoformat()}: missing"
+                    f" {sorted(expected - found)}, extra"
+                    f" {sorted(found - expected)}"
+                )
+        return mismatches
+
+    def snapshot(self) -> Dict:
+        """
+        Returns the index's size for monitoring.
+
+        Returns:
+            (Dict): whether it is built, when it was built and synced, and
+                    the number of events and rooms in it.
+        """
+        return {
+            "ready": self.ready,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "synced_at": (
+                self.synced_at.isoformat() if self.synced_at else None
+            ),
+            "events": len(self._bookings),
+            "rooms": len(self._rooms),
+        }
+
+
+def _booking(event: dict) -> tuple[datetime, datetime, List[str]] | None:
+    # the rooms an event holds, if it is approved
+    if event.get("status", {}).get("state") != (
+        Event_State_Status.approved.value
+    ):
+        return None
+    start, end = (to_datetime(value) for value in event["datetimeperiod"])
+    return start, end, list(event.get("location") or [])
+
+
+room_index = RoomIndex()
+
+
+async def init_room_index() -> None:
+    """
+    Builds the room index and schedules its periodic rebuilds.
+    """
+    try:
+        await room_index.build()
+    except Exception as e:
+        # resolvers query MongoDB until a rebuild succeeds
+        print(f"Could not build the room index: {e}")
+
+    scheduler = AsyncIOScheduler(timezone=TIMEZONE)
+    scheduler.add_job(
+        room_index.build, "interval", seconds=ROOM_INDEX_REBUILD_INTERVAL
+    )
+    scheduler.start()
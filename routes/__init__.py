@@ -0,0 +1,16 @@
+"""
+Gathers all the plain HTTP routes served next to /graphql from all the files within this folder and collects them for importing into main.py.
+"""  # noqa: E501
+
+from fastapi import APIRouter
+
+from routes.calendar import router as calendar_router
+from routes.export import router as export_router
+from routes.ics import router as ics_router
+from routes.metrics import router as metrics_router
+
+router = APIRouter()
+router.include_router(calendar_router)
+router.include_router(export_router)
+router.include_router(ics_router)
+router.include_router(metrics_router)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from models import Event
+from utils import (
+    TIMEZONE,
+    calendar_searchspace,
+    events_cache,
+    events_in_window,
+    response_cache_role,
+    trim_public_events,
+)
+
+router = APIRouter(prefix="/calendar")
+
+
+@router.get("")
+async def calendar(
+    request: Request,
+    month: str | None = None,
+    week: str | None = None,
+    clubid: str | None = None,
+) -> Response:
+    """
+    Returns the events of one month or week of the calendar, as seen by the
+    user, without the whole history that calendarEvents returns.
+
+    Every response carries an ETag, a hash of its content. A repeat request
+    sending it back in If-None-Match gets an empty 304 Not Modified response
+    if the events have not changed.
+
+    Args:
+        request (Request): the request, with the user and cookies headers
+                           set by the gateway.
+        month (str | None): month to return, as YYYY-MM.
+        week (str | None): ISO week to return, as YYYY-Www.
+        clubid (str | None): only events of this club and its
+                             collaborations if given.
+
+    Returns:
+        (Response): the window and its events as JSON, or a 304 response.
+
+    Raises:
+        HTTPException: 400 if not exactly one of month and week is a valid
+                       window.
+    """
+    start, end = _calendar_window(month, week)
+    user = json.loads(request.headers.get("user", "null")) or None
+    cookies = json.loads(request.headers.get("cookies", "null")) or None
+
+    searchspace, restrictAccess = await calendar_searchspace(
+        user, clubid, cookies
+    )
+
+    async def load() -> tuple[bytes, str]:
+        events = await events_in_window(searchspace, start, end)
+        for event in events:
+            trim_public_events(event)
+
+        body = json.dumps(
+            {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "events": [
+                    jsonable_encoder(Event.model_validate(event))
+                    for event in events
+                ],
+            }
+        ).encode()
+        return body, f'"{hashlib.sha256(body).hexdigest()}"'
+
+    role = response_cache_role(user, restrictAccess)
+    if role is None:
+        body, etag = await load()
+    else:
+        body, etag = await events_cache.get(
+            ("calendar", role, clubid, start, end), load
+        )
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "user"}
+    tags = _if_none_match(request)
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _calendar_window(
+    month: str | None, week: str | None
+) -> tuple[datetime, datetime]:
+    # start and end of the requested month or week, in IST
+    if (month is None) == (week is None):
+        raise HTTPException(400, "Exactly one of month and week is required.")
+
+    try:
+        if month is not None:
+            start = datetime.strptime(month, "%Y-%m").replace(tzinfo=TIMEZONE)
+            end = (start + timedelta(days=32)).replace(day=1)
+        else:
+            year, number = week.split("-W")
+            start = datetime.fromisocalendar(
+                int(year), int(number), 1
+            ).replace(tzinfo=TIMEZONE)
+            end = start + timedelta(weeks=1)
+    except ValueError:
+        raise HTTPException(400, "Invalid month or week.")
+    return start, end
+
+
+def _if_none_match(request: Request) -> set[str]:
+    # entity tags in If-None-Match, weak ones compared as strong ones
+    header = request.headers.get("if-none-match", "")
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
@@ -0,0 +1,73 @@
+import json
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from exports import check_export_fields, export_csv, export_searchspace
+from utils import get_club_index
+
+router = APIRouter(prefix="/export")
+
+
+@router.get("/events.csv")
+async def events_csv(
+    request: Request,
+    status: str,
+    fields: List[str] = Query(),
+    clubid: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> StreamingResponse:
+    """
+    Streams the same CSV export of events as downloadEventsData, written
+    row by row from a MongoDB cursor instead of built whole in memory, so
+    exports of all the clubs over all time are served in constant memory.
+
+    Args:
+        request (Request): the request, with the user and cookies headers
+                           set by the gateway.
+        status (str): "pending", "approved" or "all"
+        fields (List[str]): fields of the events to export, repeated.
+        clubid (str | None): club whose events and collaborations are
+                             exported, "allclubs" for all the clubs the user
+                             can see, only the header if None.
+        start (date | None): first day the events start on, with end.
+        end (date | None): last day the events start on, with start.
+
+    Returns:
+        (StreamingResponse): the CSV file.
+
+    Raises:
+        HTTPException: 403 if there is no user, 400 if the status or a
+                       field is invalid or only one of start and end is
+                       given.
+    """
+    user = json.loads(request.headers.get("user", "null")) or None
+    cookies = json.loads(request.headers.get("cookies", "null")) or None
+    if user is None:
+        raise HTTPException(
+            403, "You do not have permission to access this resource."
+        )
+    if (start is None) != (end is None):
+        raise HTTPException(400, "Both start and end are required.")
+
+    club_index = await get_club_index(cookies)
+    try:
+        check_export_fields(fields)
+        searchspace = export_searchspace(
+            user,
+            clubid,
+            status,
+            [start, end] if start is not None else None,
+            club_index,
+        )
+    except Exception as e:
+        raise HTTPException(400, str(e))
+
+    return StreamingResponse(
+        export_csv(searchspace, fields, status, club_index.names),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="events.csv"'},
+    )
@@ -0,0 +1,204 @@
+"""
+iCalendar feeds of the public events, for calendar apps to subscribe to.
+
+Attributes:
+    ICS_FEED_PAST_MONTHS (int): months of past events kept in the feeds.
+                                Defaults to 6.
+    ICS_FEED_MAX_AGE (int): seconds calendar apps may reuse a feed for
+                            before checking it again. Defaults to 900.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from mtypes import Event_Full_Location
+from utils import (
+    TIMEZONE,
+    calendar_searchspace,
+    datetime_condition,
+    events_fingerprint,
+    get_club_index,
+    get_event_link,
+    stream_events,
+    subtract_months,
+    to_datetime,
+    trim_public_events,
+)
+
+ICS_FEED_PAST_MONTHS = int(os.getenv("ICS_FEED_PAST_MONTHS", "6"))
+ICS_FEED_MAX_AGE = int(os.getenv("ICS_FEED_MAX_AGE", "900"))
+
+ICS_FIELDS = [
+    "_id",
+    "code",
+    "name",
+    "description",
+    "datetimeperiod",
+    "location",
+    "otherLocation",
+    "status",
+    "updated_at",
+]
+
+router = APIRouter(prefix="/ics")
+
+
+@router.get("/events.ics")
+async def events_feed(request: Request) -> Response:
+    """
+    Returns the feed of all public events.
+
+    Args:
+        request (Request): the request
+
+    Returns:
+        (Response): the feed, or a 304 response if it has not changed.
+    """
+    return await _feed(request, None, "Clubs Council Events")
+
+
+@router.get("/clubs/{clubid}.ics")
+async def club_feed(request: Request, clubid: str) -> Response:
+    """
+    Returns the feed of the public events of a club and its
+    collaborations.
+
+    Args:
+        request (Request): the request
+        clubid (str): club id
+
+    Returns:
+        (Response): the feed, or a 304 response if it has not changed.
+
+    Raises:
+        HTTPException: 404 if the club does not exist.
+    """
+    club_index = await get_club_index()
+    if clubid not in club_index.cids:
+        raise HTTPException(404, "Club not found.")
+    return await _feed(request, clubid, f"{club_index.names[clubid]} Events")
+
+
+async def _feed(
+    request: Request, clubid: str | None, calendar_name: str
+) -> Response:
+    # public events of the calendar, from ICS_FEED_PAST_MONTHS months ago
+    searchspace, _ = await calendar_searchspace(None, clubid)
+    searchspace = {
+        "$and": [
+            searchspace,
+            datetime_condition(
+                "datetimeperiod.1",
+                gte=subtract_months(
+                    datetime.now(TIMEZONE), ICS_FEED_PAST_MONTHS
+                ),
+            ),
+        ]
+    }
+
+    # the feed changes whenever its events do, so it is only built after
+    # the cheap check of whether the client already has it
+    count, updated_at = await events_fingerprint(searchspace)
+    fingerprint = f"{clubid}:{calendar_name}:{count}:{updated_at}"
+    etag = f'"{hashlib.sha256(fingerprint.encode()).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={ICS_FEED_MAX_AGE}",
+    }
+    tags = {
+        tag.strip().removeprefix("W/")
+        for tag in request.headers.get("if-none-match", "").split(",")
+    }
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(
+        _ics_lines(searchspace, calendar_name),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
+
+
+async def _ics_lines(searchspace: dict, calendar_name: str) -> AsyncIterator:
+    yield _ics_line("BEGIN", "VCALENDAR")
+    yield _ics_line("VERSION", "2.0")
+    yield _ics_line("PRODID", "-//Clubs Council IIITH//Events//EN")
+    yield _ics_line("CALSCALE", "GREGORIAN")
+    yield _ics_line("X-WR-CALNAME", _ics_text(calendar_name))
+    yield _ics_line("X-WR-TIMEZONE", "Asia/Kolkata")
+
+    now = datetime.now(timezone.utc)
+    async for event in stream_events(
+        searchspace, {field: 1 for field in ICS_FIELDS}
+    ):
+        yield "".join(_vevent(trim_public_events(event), now))
+
+    yield _ics_line("END", "VCALENDAR")
+
+
+def _vevent(event: dict, now: datetime) -> list:
+    start, end = (to_datetime(value) for value in event["datetimeperiod"])
+    locations = [
+        getattr(Event_Full_Location, location)
+        if location != "other"
+        else (event.get("otherLocation") or "other")
+        for location in event.get("location") or []
+    ]
+
+    lines = [
+        _ics_line("BEGIN", "VEVENT"),
+        _ics_line("UID", f"{event['_id']}@events"),
+        _ics_line("DTSTAMP", _ics_datetime(event.get("updated_at") or now)),
+        _ics_line("DTSTART", _ics_datetime(start)),
+        _ics_line("DTEND", _ics_datetime(end)),
+        _ics_line("SUMMARY", _ics_text(event["name"])),
+    ]
+    if event.get("description"):
+        lines.append(_ics_line("DESCRIPTION", _ics_text(event["description"])))
+    if locations:
+        lines.append(_ics_line("LOCATION", _ics_text(", ".join(locations))))
+    if event.get("code"):
+        lines.append(_ics_line("URL", get_event_link(event["code"])))
+    lines.append(_ics_line("STATUS", "CONFIRMED"))
+    lines.append(_ics_line("END", "VEVENT"))
+    return lines
+
+
+def _ics_datetime(value: datetime) -> str:
+    return (
+        to_datetime(value).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    )
+
+
+def _ics_text(value: str) -> str:
+    # escapes a TEXT value (RFC 5545, 3.3.11)
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_line(name: str, value: str) -> str:
+    # folds the content line into lines of at most 75 octets (RFC 5545,
+    # 3.1), without splitting UTF-8 characters
+    line = f"{name}:{value}".encode()
+    parts = []
+    limit = 75
+    while len(line) > limit:
+        cut = limit
+        while line[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+        # continuation lines start with a space
+        limit = 74
+    parts.append(line)
+    return b"\r\n ".join(parts).decode() + "\r\n"
@@ -0,0 +1,60 @@
+from typing import Dict
+
+from fastapi import APIRouter
+
+from db import index_report
+from resilience import breakers
+from room_index import room_index
+from utils import events_cache
+
+router = APIRouter(prefix="/metrics")
+
+
+@router.get("/upstreams")
+async def upstreams() -> Dict[str, Dict]:
+    """
+    Returns the circuit breaker state of every upstream service, for
+    monitoring.
+
+    Returns:
+        (Dict[str, Dict]): breaker state, consecutive failures, trip and
+                           rejection counts by upstream name.
+    """
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+@router.get("/indexes")
+async def indexes() -> Dict[str, Dict]:
+    """
+    Compares the database's indexes with the declared ones, for monitoring.
+
+    Returns:
+        (Dict[str, Dict]): missing, conflicting, undeclared and unused
+                           index names by collection.
+    """
+    return await index_report()
+
+
+@router.get("/cache")
+async def cache() -> Dict[str, Dict]:
+    """
+    Returns the counters of the event listing response cache, for
+    monitoring.
+
+    Returns:
+        (Dict[str, Dict]): size, hit, miss, eviction and invalidation counts
+                           and hit ratio by cache name.
+    """
+    return {"events": events_cache.stats()}
+
+
+@router.get("/room-index")
+async def room_index_size() -> Dict:
+    """
+    Returns the state of the room index, for monitoring.
+
+    Returns:
+        (Dict): whether it is built, when, and its number of events and
+                rooms.
+    """
+    return room_index.snapshot()
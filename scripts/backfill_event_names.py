@@ -0,0 +1,54 @@
+"""
+script to store the normalized name, word suffixes and name trigrams used
+by the event name search on events created before they existed. It only
+touches events that do not have them yet, so it can be stopped and run
+again.
+to run:
+    docker-compose exec -it events /bin/bash
+    export PYTHONPATH=`pwd`
+    python3 scripts/backfill_event_names.py
+"""
+
+import asyncio
+
+from pymongo import UpdateOne
+
+from db import eventsdb
+from utils import event_name_search_fields
+
+BATCH_SIZE = 500
+
+
+async def backfill() -> None:
+    updated = 0
+    while True:
+        events = (
+            await eventsdb.find(
+                {"name_word_suffixes": {"$exists": False}}, {"name": 1}
+            )
+            .limit(BATCH_SIZE)
+            .to_list(length=None)
+        )
+        if not events:
+            break
+
+        result = await eventsdb.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": event["_id"]},
+                    {
+                        "$set": event_name_search_fields(
+                            event.get("name") or ""
+                        )
+                    },
+                )
+                for event in events
+            ],
+            ordered=False,
+        )
+        updated += result.modified_count
+        print(f"Backfilled {updated} events")
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,331 @@
+"""
+script to benchmark resolver latency and throughput against the stand-in
+upstream services from scripts/fake_upstream.py
+
+The fake gateway, auth and files services are mounted in-process, with the
+given latency and failure rate, and the GraphQL app is driven through its
+ASGI interface. The events, createEvent and progressEvent benchmarks need
+the MongoDB configured in db.py; they create events for the fake clubs
+(club0, club1, ...) and delete them afterwards, so point MONGO_DATABASE
+at a scratch database. Use --skip-db to only benchmark upstream calls.
+
+to run:
+    docker-compose exec -it events /bin/bash
+    export PYTHONPATH=`pwd`
+    MONGO_DATABASE=benchmark python3 scripts/benchmark.py --latency 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List
+
+from httpx import ASGITransport, AsyncClient
+
+from db import eventsdb
+from mailing import drain_background_mails
+from main import app
+from scripts.fake_upstream import create_app
+from utils import (
+    close_http_client,
+    get_role_emails,
+    init_http_client,
+    role_emails_cache,
+)
+
+CREATE_EVENT = """
+    mutation CreateEvent($details: InputEventDetails!) {
+        createEvent(details: $details) {
+            _id
+        }
+    }
+"""
+
+PROGRESS_EVENT = """
+    mutation ProgressEvent($eventid: String!) {
+        progressEvent(eventid: $eventid) {
+            status {
+                state
+            }
+        }
+    }
+"""
+
+EVENTS = """
+    query Events($public: Boolean, $limit: Int) {
+        events(public: $public, limit: $limit, paginationOn: true) {
+            name
+            clubid
+            datetimeperiod
+            status {
+                state
+            }
+        }
+    }
+"""
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def measure(
+    name: str,
+    call: Callable[[int], Awaitable],
+    iterations: int,
+    concurrency: int,
+    upstream,
+) -> list:
+    """
+    Runs call(i) for every iteration, at most concurrency at a time, and
+    prints its latency percentiles, throughput and upstream requests made
+    per call.
+
+    Args:
+        name (str): name of the benchmark
+        call (Callable[[int], Awaitable]): coroutine function to measure
+        iterations (int): number of calls
+        concurrency (int): maximum number of calls in flight
+        upstream (FastAPI): the fake upstream app serving the calls
+
+    Returns:
+        (list): results of the successful calls.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    results = []
+    errors = 0
+
+    async def timed(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                results.append(await call(i))
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"  first {name} error: {e}")
+            latencies.append(time.perf_counter() - started)
+
+    requests_before = sum(upstream.state.requests.values())
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - started
+    upstream_requests = sum(upstream.state.requests.values()) - requests_before
+
+    print(
+        f"{name:<32} {iterations:>6} {errors:>6}"
+        f" {percentile(latencies, 0.50) * 1000:>9.1f}"
+        f" {percentile(latencies, 0.95) * 1000:>9.1f}"
+        f" {percentile(latencies, 0.99) * 1000:>9.1f}"
+        f" {iterations / elapsed:>9.1f}"
+        f" {upstream_requests / iterations:>9.2f}"
+    )
+    return results
+
+
+def print_header() -> None:
+    print(
+        f"{'benchmark':<32} {'calls':>6} {'errors':>6} {'p50 ms':>9}"
+        f" {'p95 ms':>9} {'p99 ms':>9} {'calls/s':>9} {'upstream':>9}"
+    )
+
+
+async def graphql(
+    client: AsyncClient, query: str, variables: dict, user: dict | None
+) -> dict:
+    headers = {"cookies": json.dumps({"Authorization": "fake-bot-token"})}
+    if user is not None:
+        headers["user"] = json.dumps(user)
+    response = await client.post(
+        "/graphql",
+        json={"query": query, "variables": variables},
+        headers=headers,
+    )
+    result = response.json()
+    if result.get("errors"):
+        raise Exception(result["errors"][0]["message"])
+    return result["data"]
+
+
+async def benchmark_role_emails(args) -> None:
+    # cold lookups, so every call resolves the role from the upstream
+    for size in args.role_sizes:
+        upstream = create_app(
+            args.latency,
+            args.jitter,
+            args.failure_rate,
+            users=max(size, 1),
+            role_sizes={"cc": size},
+        )
+        init_http_client(transport=ASGITransport(app=upstream))
+
+        async def call(i: int) -> List[str]:
+            role_emails_cache.invalidate()
+            return await get_role_emails("cc")
+
+        await measure(
+            f"get_role_emails ({size} users)",
+            call,
+            args.iterations,
+            1,
+            upstream,
+        )
+        await close_http_client()
+
+
+async def benchmark_resolvers(args) -> None:
+    upstream = create_app(
+        args.latency,
+        args.jitter,
+        args.failure_rate,
+        clubs=args.clubs,
+        users=args.users,
+    )
+    init_http_client(transport=ASGITransport(app=upstream))
+    club_ids = [f"club{i}" for i in range(args.clubs)]
+    start = datetime.now(timezone.utc).replace(microsecond=0)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://events"
+    ) as client:
+
+        async def create_event(i: int) -> dict:
+            clubid = club_ids[i % len(club_ids)]
+            starttime = start + timedelta(days=1 + i % 30, hours=i % 8)
+            details = {
+                "name": f"Benchmark event {i}",
+                "clubid": clubid,
+                "poc": f"user{i % args.users}",
+                "datetimeperiod": [
+                    starttime.isoformat(),
+                    (starttime + timedelta(hours=2)).isoformat(),
+                ],
+            }
+            data = await graphql(
+                client,
+                CREATE_EVENT,
+                {"details": details},
+                {"uid": clubid, "role": "club"},
+            )
+            return {"_id": data["createEvent"]["_id"], "clubid": clubid}
+
+        async def progress_event(i: int) -> dict:
+            event = created[i]
+            return await graphql(
+                client,
+                PROGRESS_EVENT,
+                {"eventid": event["_id"]},
+                {"uid": event["clubid"], "role": "club"},
+            )
+
+        async def cc_events(i: int) -> dict:
+            return await graphql(
+                client, EVENTS, {"limit": 20}, {"uid": "cc", "role": "cc"}
+            )
+
+        async def public_events(i: int) -> dict:
+            return await graphql(
+                client, EVENTS, {"public": True, "limit": 20}, None
+            )
+
+        try:
+            created = await measure(
+                "createEvent",
+                create_event,
+                args.iterations,
+                args.concurrency,
+                upstream,
+            )
+            await measure(
+                "progressEvent",
+                progress_event,
+                len(created),
+                args.concurrency,
+                upstream,
+            )
+            await measure(
+                "events (cc)",
+                cc_events,
+                args.iterations,
+                args.concurrency,
+                upstream,
+            )
+            await measure(
+                "events (public)",
+                public_events,
+                args.iterations,
+                args.concurrency,
+                upstream,
+            )
+        finally:
+            if not args.keep:
+                await eventsdb.delete_many(
+                    {
+                        "clubid": {"$in": club_ids},
+                        "name": {"$regex": "^Benchmark event "},
+                    }
+                )
+            await drain_background_mails()
+            await close_http_client()
+
+
+async def main(args) -> None:
+    print(
+        f"upstream latency {args.latency * 1000:.0f} ms"
+        f" (+ up to {args.jitter * 1000:.0f} ms),"
+        f" failure rate {args.failure_rate:.0%},"
+        f" concurrency {args.concurrency}"
+    )
+    print_header()
+    await benchmark_role_emails(args)
+    if not args.skip_db:
+        await benchmark_resolvers(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.01,
+        help="seconds added to every upstream request",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="up to this many random seconds added on top of the latency",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="fraction of upstream requests that fail",
+    )
+    parser.add_argument("--clubs", type=int, default=20)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument(
+        "--role-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="role sizes to benchmark get_role_emails with",
+    )
+    parser.add_argument(
+        "--skip-db",
+        action="store_true",
+        help="only run the benchmarks that do not need MongoDB",
+    )
+    parser.add_argument(
+        "--keep",
+        action="store_true",
+        help="keep the created events instead of deleting them",
+    )
+    asyncio.run(main(parser.parse_args()))
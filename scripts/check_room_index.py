@@ -0,0 +1,47 @@
+"""
+script to check that the room index used by availableRooms and
+clashingEvents agrees with MongoDB. It builds the index, then compares the
+occupied rooms it gives with those found by querying the events, for
+every day and every hour from DAYS days ago to DAYS days ahead. It exits
+with status 1 if they differ.
+to run:
+    docker-compose exec -it events /bin/bash
+    export PYTHONPATH=`pwd`
+    python3 scripts/check_room_index.py
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from room_index import room_index
+from utils import TIMEZONE
+
+DAYS = 90
+
+
+async def check() -> int:
+    await room_index.build()
+    print(f"Built the room index: {room_index.snapshot()}")
+
+    today = datetime.now(TIMEZONE).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    slots = []
+    for day in range(-DAYS, DAYS):
+        start = today + timedelta(days=day)
+        slots.append((start, start + timedelta(days=1)))
+        slots += [
+            (start + timedelta(hours=hour), start + timedelta(hours=hour + 1))
+            for hour in range(24)
+        ]
+
+    mismatches = await room_index.check_consistency(slots)
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"Checked {len(slots)} slots, {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(check()))
@@ -0,0 +1,301 @@
+"""
+stand-in for the gateway, auth and files services, for local runs and
+benchmarks
+
+It serves the parts of the other services that this one calls: allClubs,
+club, member, userProfile, userMeta, usersByRole and sendMail on /graphql,
+/bot-cookie and /delete-file, over generated clubs and users. Every
+request can be delayed and failed on purpose.
+
+to mount it in-process:
+    from scripts.fake_upstream import create_app
+    init_http_client(transport=httpx.ASGITransport(app=create_app()))
+
+to run it on localhost (with gateway, auth and files pointing to 127.0.0.1
+in /etc/hosts):
+    export PYTHONPATH=`pwd`
+    FAKE_UPSTREAM_LATENCY=0.02 python3 scripts/fake_upstream.py
+
+Attributes:
+    FAKE_UPSTREAM_LATENCY (float): seconds added to every request.
+                                   Defaults to 0.
+    FAKE_UPSTREAM_JITTER (float): up to this many random seconds added on
+                                  top of the latency. Defaults to 0.
+    FAKE_UPSTREAM_FAILURE_RATE (float): fraction of requests answered with
+                                        a 503. Defaults to 0.
+    FAKE_UPSTREAM_PORT (int): port to listen on. Defaults to 80.
+"""
+
+import asyncio
+import os
+import random
+from collections import Counter
+from typing import Dict, List
+
+import strawberry
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
+from strawberry.fastapi import GraphQLRouter
+
+FAKE_UPSTREAM_LATENCY = float(os.getenv("FAKE_UPSTREAM_LATENCY", "0"))
+FAKE_UPSTREAM_JITTER = float(os.getenv("FAKE_UPSTREAM_JITTER", "0"))
+FAKE_UPSTREAM_FAILURE_RATE = float(
+    os.getenv("FAKE_UPSTREAM_FAILURE_RATE", "0")
+)
+FAKE_UPSTREAM_PORT = int(os.getenv("FAKE_UPSTREAM_PORT", "80"))
+
+CLUB_CATEGORIES = ["cultural", "technical", "affinity", "other"]
+DEFAULT_ROLE_SIZES = {"cc": 5, "slo": 3, "slc": 5}
+BOT_COOKIE_MAX_AGE = 3600
+
+
+@strawberry.type
+class Club:
+    cid: str
+    name: str
+    code: str
+    email: str
+    category: str
+
+
+@strawberry.type
+class Member:
+    id: str = strawberry.field(name="_id")
+    cid: str
+    uid: str
+    poc: bool
+
+
+@strawberry.type
+class UserProfile:
+    uid: str
+    firstName: str
+    lastName: str
+    email: str
+    rollno: str | None
+
+
+@strawberry.type
+class UserMeta:
+    uid: str
+    phone: str | None
+
+
+@strawberry.input
+class SimpleClubInput:
+    cid: str
+
+
+@strawberry.input
+class SimpleMemberInput:
+    cid: str
+    uid: str
+    rid: str | None = None
+
+
+@strawberry.input
+class UserInput:
+    uid: str
+
+
+@strawberry.input
+class MailInput:
+    subject: str
+    body: str
+    uid: str | None = None
+    toRecipients: List[str] | None = None
+    ccRecipients: List[str] | None = None
+    htmlBody: bool | None = False
+
+
+class FakeDirectory:
+    """
+    Generated clubs and users served by the fake services.
+
+    Clubs are `club0`, `club1`, ... and users `user0`, `user1`, ...; every
+    user is a member of every club. The first users hold the roles.
+
+    Attributes:
+        clubs (Dict[str, Club]): cid -> club.
+        users (Dict[str, UserProfile]): uid -> profile.
+        roles (Dict[str, List[str]]): role -> uids.
+        mails (List[dict]): mails received by sendMail.
+    """
+
+    def __init__(
+        self,
+        clubs: int = 20,
+        users: int = 200,
+        role_sizes: Dict[str, int] | None = None,
+    ) -> None:
+        self.clubs = {
+            f"club{i}": Club(
+                cid=f"club{i}",
+                name=f"Club {i}",
+                code=f"C{i:02d}",
+                email=f"club{i}@clubs.fake",
+                category=CLUB_CATEGORIES[i % len(CLUB_CATEGORIES)],
+            )
+            for i in range(clubs)
+        }
+        self.users = {
+            f"user{i}": UserProfile(
+                uid=f"user{i}",
+                firstName="User",
+                lastName=str(i),
+                email=f"user{i}@users.fake",
+                rollno=str(2020000000 + i),
+            )
+            for i in range(users)
+        }
+        uids = list(self.users)
+        self.roles = {
+            role: uids[:size]
+            for role, size in (role_sizes or DEFAULT_ROLE_SIZES).items()
+        }
+        self.mails: List[dict] = []
+
+
+def _directory(info: strawberry.Info) -> FakeDirectory:
+    return info.context["request"].app.state.directory
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def allClubs(self, info: strawberry.Info) -> List[Club]:
+        return list(_directory(info).clubs.values())
+
+    @strawberry.field
+    def club(
+        self, clubInput: SimpleClubInput, info: strawberry.Info
+    ) -> Club | None:
+        return _directory(info).clubs.get(clubInput.cid)
+
+    @strawberry.field
+    def member(
+        self, memberInput: SimpleMemberInput, info: strawberry.Info
+    ) -> Member | None:
+        directory = _directory(info)
+        if (
+            memberInput.cid not in directory.clubs
+            or memberInput.uid not in directory.users
+        ):
+            return None
+        return Member(
+            id=f"{memberInput.cid}:{memberInput.uid}",
+            cid=memberInput.cid,
+            uid=memberInput.uid,
+            poc=True,
+        )
+
+    @strawberry.field
+    def userProfile(
+        self, info: strawberry.Info, userInput: UserInput | None = None
+    ) -> UserProfile | None:
+        if userInput is None:
+            return None
+        return _directory(info).users.get(userInput.uid)
+
+    @strawberry.field
+    def userMeta(
+        self, info: strawberry.Info, userInput: UserInput | None = None
+    ) -> UserMeta | None:
+        if userInput is None or userInput.uid not in _directory(info).users:
+            return None
+        return UserMeta(uid=userInput.uid, phone="9999999999")
+
+    @strawberry.field
+    def usersByRole(
+        self,
+        role: str,
+        info: strawberry.Info,
+        interCommunicationSecret: str | None = None,
+    ) -> List[UserProfile]:
+        directory = _directory(info)
+        return [directory.users[uid] for uid in directory.roles.get(role, [])]
+
+
+@strawberry.type
+class Mutation:
+    @strawberry.mutation
+    def sendMail(
+        self,
+        mailInput: MailInput,
+        info: strawberry.Info,
+        interCommunicationSecret: str | None = None,
+    ) -> bool:
+        _directory(info).mails.append(
+            {
+                "subject": mailInput.subject,
+                "toRecipients": mailInput.toRecipients or [],
+                "ccRecipients": mailInput.ccRecipients or [],
+            }
+        )
+        return True
+
+
+def create_app(
+    latency: float = FAKE_UPSTREAM_LATENCY,
+    jitter: float = FAKE_UPSTREAM_JITTER,
+    failure_rate: float = FAKE_UPSTREAM_FAILURE_RATE,
+    clubs: int = 20,
+    users: int = 200,
+    role_sizes: Dict[str, int] | None = None,
+) -> FastAPI:
+    """
+    Builds the fake upstream app.
+
+    The app's state holds the generated `directory` and `requests`, a
+    counter of requests served per path.
+
+    Args:
+        latency (float): seconds added to every request.
+                         Defaults to FAKE_UPSTREAM_LATENCY.
+        jitter (float): up to this many random seconds added on top of the
+                        latency. Defaults to FAKE_UPSTREAM_JITTER.
+        failure_rate (float): fraction of requests answered with a 503.
+                              Defaults to FAKE_UPSTREAM_FAILURE_RATE.
+        clubs (int): number of clubs. Defaults to 20.
+        users (int): number of users. Defaults to 200.
+        role_sizes (Dict[str, int] | None): number of users holding each
+                                            role. Defaults to
+                                            DEFAULT_ROLE_SIZES.
+
+    Returns:
+        (FastAPI): the app, serving every service on one host.
+    """
+    app = FastAPI(title="Fake upstream services")
+    app.state.directory = FakeDirectory(clubs, users, role_sizes)
+    app.state.requests = Counter()
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        app.state.requests[request.url.path] += 1
+        delay = latency + random.uniform(0, jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if random.random() < failure_rate:
+            return PlainTextResponse("Injected failure", status_code=503)
+        return await call_next(request)
+
+    @app.post("/bot-cookie")
+    async def bot_cookie(response: Response):
+        response.set_cookie(
+            "Authorization", "fake-bot-token", max_age=BOT_COOKIE_MAX_AGE
+        )
+        return {"ok": True}
+
+    @app.post("/delete-file")
+    async def delete_file(filename: str):
+        return PlainTextResponse(f"Deleted {filename}")
+
+    schema = strawberry.Schema(query=Query, mutation=Mutation)
+    app.include_router(GraphQLRouter(schema), prefix="/graphql")
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(), host="0.0.0.0", port=FAKE_UPSTREAM_PORT)
@@ -8,6 +8,7 @@ to run:
 from datetime import datetime, timedelta
 
 from db import eventsdb
+from utils import TIMEZONE, to_datetime
 
 fix = True
 
@@ -15,25 +16,26 @@ if __name__ == "__main__":
     events = eventsdb.find()
     for event in events:
         # Check if the difference between the start and the end time is 2 mins
-        start_time1 = datetime.fromisoformat(
-            event["datetimeperiod"][0].split("+")[0]
-        )
-        end_time1 = datetime.fromisoformat(
-            event["datetimeperiod"][1].split("+")[0]
-        )
-
-        start_time = start_time1.replace(tzinfo=None)
-        end_time = end_time1.replace(tzinfo=None)
+        # the times are dates, or strings if not migrated yet
+        start_time = to_datetime(event["datetimeperiod"][0])
+        end_time = to_datetime(event["datetimeperiod"][1])
 
         if (end_time - start_time) == timedelta(minutes=2):
             if fix:
                 # If so, set the end time to be 1 hour after the start time
                 end_time = start_time + timedelta(hours=2)
 
-                event["datetimeperiod"][0] = start_time.isoformat() + "Z"
-                event["datetimeperiod"][1] = end_time.isoformat() + "Z"
+                event["datetimeperiod"] = [start_time, end_time]
 
                 print(event["datetimeperiod"])
-                eventsdb.update_one({"_id": event["_id"]}, {"$set": event})
+                eventsdb.update_one(
+                    {"_id": event["_id"]},
+                    {
+                        "$set": {
+                            "datetimeperiod": event["datetimeperiod"],
+                            "updated_at": datetime.now(TIMEZONE),
+                        }
+                    },
+                )
 
             print(f"Fixed end time for event {event['code']}")
@@ -0,0 +1,72 @@
+"""
+script to store the start and end times of events created before they
+were stored as dates, which hold ISO 8601 strings instead. It only touches
+events that still have strings, so it can be stopped and run again. Once it
+has finished, EVENT_DATETIME_DUAL_READ can be turned off.
+to run:
+    docker-compose exec -it events /bin/bash
+    export PYTHONPATH=`pwd`
+    python3 scripts/migrate_event_datetimes.py
+"""
+
+import asyncio
+
+from pymongo import UpdateOne
+
+from db import eventsdb
+from utils import to_datetime
+
+BATCH_SIZE = 500
+
+
+async def migrate() -> None:
+    migrated = 0
+    failed = set()
+    while True:
+        events = (
+            await eventsdb.find(
+                {
+                    "datetimeperiod": {"$elemMatch": {"$type": "string"}},
+                    "_id": {"$nin": list(failed)},
+                },
+                {"datetimeperiod": 1},
+            )
+            .limit(BATCH_SIZE)
+            .to_list(length=None)
+        )
+        if not events:
+            break
+
+        updates = []
+        for event in events:
+            try:
+                datetimeperiod = [
+                    to_datetime(value) for value in event["datetimeperiod"]
+                ]
+            except Exception as e:
+                print(f"Skipping event {event['_id']}: {e}")
+                failed.add(event["_id"])
+                continue
+            updates.append(
+                UpdateOne(
+                    # skips events edited since they were read
+                    {
+                        "_id": event["_id"],
+                        "datetimeperiod": event["datetimeperiod"],
+                    },
+                    {"$set": {"datetimeperiod": datetimeperiod}},
+                )
+            )
+        if not updates:
+            continue
+
+        result = await eventsdb.bulk_write(updates, ordered=False)
+        migrated += result.modified_count
+        print(f"Migrated {migrated} events")
+
+    if failed:
+        print(f"Could not migrate {len(failed)} events")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,24 @@
+"""
+script to rebuild the room booking ledger that the clash warnings of the
+event mutations read, from the events. Run it once to fill the ledger with
+the events created before it existed, or whenever it may have drifted. The
+ledger is rewritten in place, so clash checks keep working while it runs,
+and it can be stopped and run again.
+to run:
+    docker-compose exec -it events /bin/bash
+    export PYTHONPATH=`pwd`
+    python3 scripts/rebuild_room_bookings.py
+"""
+
+import asyncio
+
+from room_bookings import reconcile_bookings
+
+
+async def rebuild() -> None:
+    written = await reconcile_bookings()
+    print(f"Wrote {written} room bookings")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -9,7 +9,7 @@ to run:
 import fiscalyear
 
 from db import eventsdb
-from utils import FISCAL_START_MONTH, get_club_code
+from utils import FISCAL_START_MONTH, get_club_code, to_datetime
 
 fiscalyear.START_MONTH = FISCAL_START_MONTH
 
@@ -25,8 +25,10 @@ if __name__ == "__main__":
         idx = 1
         club_code = get_club_code(event["clubid"])
 
-        year = fiscalyear.FiscalDateTime.fromisoformat(
-            event["datetimeperiod"][0].split("+")[0]
+        # a date, or a string if not migrated yet
+        start = to_datetime(event["datetimeperiod"][0])
+        year = fiscalyear.FiscalDateTime(
+            start.year, start.month, start.day
         ).fiscal_year
         year = str(year - 1)[-2:] + str(year)[-2:]
 
@@ -0,0 +1,132 @@
+"""
+An in-memory stand-in for the async MongoDB collections, matching the
+subset of the query language the modules under test use.
+"""
+
+import pytest
+
+MISSING = object()
+
+
+def _get(document, path):
+    value = document
+    for part in path.split("."):
+        if isinstance(value, list) and part.isdigit():
+            value = value[int(part)] if int(part) < len(value) else MISSING
+        elif isinstance(value, dict):
+            value = value.get(part, MISSING)
+        else:
+            return MISSING
+    return value
+
+
+def _equals(value, other):
+    if isinstance(value, list) and not isinstance(other, list):
+        return other in value
+    return value == other
+
+
+def _compare(value, operator, argument):
+    if operator == "$in":
+        return any(_equals(value, other) for other in argument)
+    if operator == "$nin":
+        return not any(_equals(value, other) for other in argument)
+    if operator == "$ne":
+        return not _equals(value, argument)
+    if operator == "$exists":
+        return (value is not MISSING) == argument
+    # values of different types never compare, as in MongoDB
+    if (
+        value is MISSING
+        or value is None
+        or isinstance(value, str) != isinstance(argument, str)
+    ):
+        return False
+    if operator == "$gte":
+        return value >= argument
+    if operator == "$gt":
+        return value > argument
+    if operator == "$lte":
+        return value <= argument
+    if operator == "$lt":
+        return value < argument
+    raise NotImplementedError(operator)
+
+
+def matches(document, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        else:
+            value = _get(document, key)
+            if isinstance(condition, dict) and all(
+                operator.startswith("$") for operator in condition
+            ):
+                if not all(
+                    _compare(value, operator, argument)
+                    for operator, argument in condition.items()
+                ):
+                    return False
+            elif not _equals(value, condition):
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.documents)
+
+    def __aiter__(self):
+        self.iterator = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, documents=()):
+        self.documents = [dict(document) for document in documents]
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(
+            [dict(d) for d in self.documents if matches(d, query or {})]
+        )
+
+    async def find_one(self, query=None, projection=None):
+        for document in self.documents:
+            if matches(document, query or {}):
+                return dict(document)
+        return None
+
+    async def distinct(self, key, query=None):
+        return list(
+            dict.fromkeys(
+                _get(document, key)
+                for document in self.documents
+                if matches(document, query or {})
+            )
+        )
+
+    def update(self, id, **fields):
+        for document in self.documents:
+            if document["_id"] == id:
+                document.update(fields)
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection
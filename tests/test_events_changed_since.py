@@ -0,0 +1,92 @@
+"""
+The ids of the events removed from a calendar feed must be limited to the
+events the viewer could have seen before they changed.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import utils
+
+since = datetime(2026, 10, 1, tzinfo=timezone.utc)
+before = since - timedelta(days=30)
+after = since + timedelta(minutes=5)
+
+
+def event(id, clubid, state, updated_at, audience=("ug1",)):
+    return {
+        "_id": id,
+        "clubid": clubid,
+        "collabclubs": [],
+        "audience": list(audience),
+        "status": {"state": state},
+        "updated_at": updated_at,
+    }
+
+
+@pytest.fixture
+def events(monkeypatch, collection):
+    eventsdb = collection(
+        [
+            event("own_approved", "clubA", "approved", after),
+            event("own_old", "clubA", "approved", before),
+            event("other_pending", "clubB", "pending_cc", after),
+            event("other_room", "clubB", "pending_room", after),
+            event("other_incomplete", "clubB", "incomplete", after),
+            event("other_deleted", "clubB", "deleted", after),
+            event("unlisted", "clubC", "deleted", after),
+        ]
+    )
+
+    async def get_club_index(cookies=None):
+        return utils.ClubIndex(
+            [
+                {"cid": cid, "code": cid, "name": cid}
+                for cid in ["clubA", "clubB"]
+            ]
+        )
+
+    monkeypatch.setattr(utils, "eventsdb", eventsdb)
+    monkeypatch.setattr(utils, "get_club_index", get_club_index)
+    return eventsdb
+
+
+def changes(user, clubid=None):
+    async def run():
+        searchspace, _ = await utils.calendar_searchspace(user, clubid)
+        return await utils.events_changed_since(searchspace, since)
+
+    events, removed, _ = asyncio.run(run())
+    return [e["_id"] for e in events], sorted(removed)
+
+
+def test_public_gets_no_ids_of_other_clubs_pending_edits(events):
+    changed, removed = changes(None)
+
+    assert changed == ["own_approved"]
+    assert removed == ["other_deleted"]
+
+
+def test_public_club_feed_is_limited_to_the_club(events):
+    changed, removed = changes(None, "clubA")
+
+    assert changed == ["own_approved"]
+    assert removed == []
+
+
+def test_slo_gets_ids_of_events_it_saw(events):
+    events.update("own_approved", audience=["internal"])
+    changed, removed = changes({"uid": "slo", "role": "slo"})
+
+    assert changed == ["own_approved", "other_room"]
+    assert removed == ["other_deleted"]
+
+
+def test_public_gets_ids_of_events_made_internal(events):
+    events.update("own_approved", audience=["internal"])
+    changed, removed = changes(None)
+
+    assert changed == []
+    assert removed == ["other_deleted", "own_approved"]
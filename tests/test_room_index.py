@@ -0,0 +1,170 @@
+"""
+The room index must give the same rooms and events as MongoDB, however its
+intervals are added, removed and synced.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import room_index
+from room_index import LONG_INTERVAL, RoomIndex, RoomIntervals
+
+t0 = datetime(2026, 10, 20, 10, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+
+def event(id, start, end, location, state="approved", **fields):
+    return {
+        "_id": id,
+        "status": {"state": state},
+        "location": location,
+        "datetimeperiod": [start, end],
+        **fields,
+    }
+
+
+@pytest.mark.parametrize(
+    "start, end, strict, overlaps",
+    [
+        (t0 - hour, t0, True, False),
+        (t0 - hour, t0, False, True),
+        (t0 + hour, t0 + 2 * hour, True, False),
+        (t0 + hour, t0 + 2 * hour, False, True),
+        (t0 + hour / 2, t0 + hour / 2, True, True),
+        (t0 - 2 * hour, t0 - hour, False, False),
+        (t0 + 2 * hour, t0 + 3 * hour, False, False),
+    ],
+)
+def test_strict_and_touching_overlap(start, end, strict, overlaps):
+    intervals = RoomIntervals()
+    intervals.add(t0, t0 + hour, "e1")
+
+    assert list(intervals.overlapping(start, end, strict)) == (
+        ["e1"] if overlaps else []
+    )
+
+
+def test_long_intervals_are_kept_apart():
+    intervals = RoomIntervals()
+    intervals.add(t0, t0 + hour, "short")
+    intervals.add(t0 - 10 * LONG_INTERVAL, t0 + 10 * LONG_INTERVAL, "long")
+
+    assert intervals.long_intervals == [
+        (t0 - 10 * LONG_INTERVAL, "long", t0 + 10 * LONG_INTERVAL)
+    ]
+    assert intervals.max_duration == hour
+    middle = t0 - 5 * LONG_INTERVAL
+    assert list(intervals.overlapping(middle, middle + hour, True)) == ["long"]
+    assert list(intervals.between(t0, t0 + hour, True)) == [
+        (t0 - 10 * LONG_INTERVAL, t0 + 10 * LONG_INTERVAL),
+        (t0, t0 + hour),
+    ]
+
+    intervals.remove(t0 - 10 * LONG_INTERVAL, t0 + 10 * LONG_INTERVAL, "long")
+    assert intervals.long_intervals == []
+    assert list(intervals.overlapping(middle, middle + hour, True)) == []
+
+
+def test_max_duration_is_recomputed_on_remove():
+    intervals = RoomIntervals()
+    intervals.add(t0, t0 + hour, "e1")
+    intervals.add(t0, t0 + 5 * hour, "e2")
+    intervals.add(t0 + hour, t0 + 3 * hour, "e3")
+    assert intervals.max_duration == 5 * hour
+
+    intervals.remove(t0, t0 + 5 * hour, "e2")
+    assert intervals.max_duration == 2 * hour
+
+    intervals.remove(t0, t0 + hour, "e1")
+    assert intervals.max_duration == 2 * hour
+
+    intervals.remove(t0 + hour, t0 + 3 * hour, "e3")
+    assert intervals.max_duration == timedelta(0)
+    assert intervals.intervals == [] and intervals.starts == []
+
+
+def test_apply_moves_and_removes_events():
+    index = RoomIndex()
+    index._apply("e1", event("e1", t0, t0 + hour, ["h101", "h102"]))
+    assert index.occupied_rooms(t0, t0 + hour) == {"h101", "h102"}
+
+    index._apply("e1", event("e1", t0 + hour, t0 + 2 * hour, ["h103"]))
+    assert index.occupied_rooms(t0, t0 + hour / 2) == set()
+    assert index.occupied_rooms(t0, t0 + 2 * hour) == {"h103"}
+    assert index.overlapping(["h103"], t0, t0 + hour, strict=True) == set()
+
+    index._apply(
+        "e1", event("e1", t0 + hour, t0 + 2 * hour, ["h103"], "deleted")
+    )
+    assert index.occupied_rooms(t0, t0 + 2 * hour) == set()
+
+    index._apply("e1", event("e1", t0, t0 + hour, ["h101"]))
+    index._apply("e1", None)
+    assert index.occupied_rooms(t0, t0 + hour) == set()
+    assert index.snapshot()["events"] == 0
+
+
+@pytest.fixture
+def events(monkeypatch, collection):
+    eventsdb = collection(
+        [
+            event("e1", t0, t0 + hour, ["h101"]),
+            event("e2", t0 + hour, t0 + 3 * hour, ["h102", "h103"]),
+            event("e3", t0, t0 + 40 * hour, ["h104"]),
+            event("e4", t0, t0 + hour, ["h105"], "pending_room"),
+            # stored before event times were dates
+            event(
+                "e5", "2026-10-20T12:00:00Z", "2026-10-20T13:00:00Z", ["h106"]
+            ),
+        ]
+    )
+    monkeypatch.setattr(room_index, "eventsdb", eventsdb)
+    return eventsdb
+
+
+def hours(days):
+    return [
+        (t0 + i * hour / 2, t0 + (i + 1) * hour / 2)
+        for i in range(-4, days * 48)
+    ]
+
+
+def test_build_is_consistent(events):
+    index = RoomIndex()
+    asyncio.run(index.build())
+
+    assert asyncio.run(index.check_consistency(hours(3))) == []
+    assert index.occupied_rooms(t0, t0 + hour) == {
+        "h101",
+        "h102",
+        "h103",
+        "h104",
+    }
+
+
+def test_sync_applies_writes_of_other_instances(events):
+    index = RoomIndex()
+    asyncio.run(index.build())
+
+    later = index.synced_at + timedelta(seconds=1)
+    events.update("e1", location=["h107"], datetimeperiod=[t0, t0 + 2 * hour])
+    events.update("e3", status={"state": "deleted"})
+    events.update("e4", status={"state": "approved"})
+    for id in ["e1", "e3", "e4"]:
+        events.update(id, updated_at=later)
+    # changed without updated_at, so only a rebuild picks it up
+    events.update("e2", location=["h108"])
+
+    assert asyncio.run(index.check_consistency(hours(3))) != []
+
+    asyncio.run(index.sync())
+    assert index.occupied_rooms(t0, t0 + hour / 2) == {"h105", "h107"}
+    assert index.occupied_rooms(t0 + 10 * hour, t0 + 11 * hour) == set()
+    # the unsynced change is the only difference left
+    assert asyncio.run(index.check_consistency([(t0 + hour, t0 + 2 * hour)]))
+    assert index.overlapping(["h102"], t0 + hour, t0 + 2 * hour) == {"e2"}
+
+    asyncio.run(index.build())
+    assert asyncio.run(index.check_consistency(hours(3))) == []
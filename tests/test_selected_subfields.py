@@ -0,0 +1,76 @@
+"""
+The projection of the events of a page must hold the event fields however
+the query selects them, also through fragments.
+"""
+
+from typing import List
+
+import pytest
+import strawberry
+
+from models import Event
+from utils import selected_subfields, selection_projection
+
+projections = []
+
+
+@strawberry.type
+class EventItem:
+    name: str
+    description: str
+
+
+@strawberry.type
+class Page:
+    events: List[EventItem]
+    nextCursor: str | None
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def page(self, info: strawberry.Info) -> Page:
+        projections.append(
+            selection_projection(
+                selected_subfields(
+                    info.selected_fields[0].selections, "events"
+                ),
+                Event,
+            )
+        )
+        return Page(events=[], nextCursor=None)
+
+
+schema = strawberry.Schema(query=Query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "{ page { events { name description } nextCursor } }",
+        """
+        { page { ...PageFields } }
+        fragment PageFields on Page { events { name description } }
+        """,
+        """
+        { page { events { ...EventFields } } }
+        fragment EventFields on EventItem { name description }
+        """,
+        "{ page { ... on Page { events { name ... { description } } } } }",
+        "{ page { events { name } ... on Page { events { description } } } }",
+    ],
+)
+def test_projection_through_fragments(query):
+    projections.clear()
+    result = schema.execute_sync(query)
+
+    assert result.errors is None
+    assert projections == [{"name": 1, "description": 1}]
+
+
+def test_projection_without_events():
+    projections.clear()
+    result = schema.execute_sync("{ page { nextCursor } }")
+
+    assert result.errors is None
+    assert projections == [{}]
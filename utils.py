@@ -1,22 +1,110 @@
+import asyncio
+import base64
 import html
+import json
 import os
 import re
-from datetime import datetime, timedelta
-from typing import List
+import time
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import AsyncIterator, Iterable, Iterator, List, Sequence
 from zoneinfo import ZoneInfo
 
 import fiscalyear
-from httpx import AsyncClient
+from httpx import URL, AsyncClient, Limits, Response, Timeout, TransportError
+from pydantic import BaseModel
+from strawberry.types.nodes import SelectedField
+from strawberry.utils.str_converters import to_camel_case
 
+from caching import LRUCache, TTLCache
 from db import eventsdb
+from mtypes import Event_State_Status
+from resilience import (
+    CircuitOpenError,
+    LatencyBudgetExceeded,
+    get_breaker,
+    remaining_budget,
+)
 
 inter_communication_secret = os.getenv("INTER_COMMUNICATION_SECRET")
 
+# configuration for the shared inter-service HTTP client (env-configurable)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "False").lower() in (
+    "true",
+    "1",
+    "t",
+)
+UPSTREAM_TIMEOUTS = {
+    upstream: float(os.getenv(f"{upstream.upper()}_TIMEOUT", HTTP_TIMEOUT))
+    for upstream in ("gateway", "auth", "files")
+}
+
 # configuration for pending reports (env-configurable)
 REPORT_DUE_DAYS = int(os.getenv("EVENT_REPORT_DUE_DAYS", "7"))
 NO_REPORT_CLUBS = os.getenv("NO_REPORT_CLUBS", "felicity").split(",")
 NO_REPORT_CLUBS = [club.strip() for club in NO_REPORT_CLUBS if club.strip()]
 
+# configuration for the club directory cache (env-configurable)
+CLUBS_CACHE_TTL = float(os.getenv("CLUBS_CACHE_TTL", "300"))
+CLUBS_CACHE_STALE_TTL = float(os.getenv("CLUBS_CACHE_STALE_TTL", "3600"))
+
+# configuration for the public events response cache (env-configurable)
+EVENTS_CACHE_TTL = float(os.getenv("EVENTS_CACHE_TTL", "30"))
+EVENTS_CACHE_SIZE = int(os.getenv("EVENTS_CACHE_SIZE", "256"))
+
+# configuration for batched gateway lookups (env-configurable)
+ROLE_EMAILS_CACHE_TTL = float(os.getenv("ROLE_EMAILS_CACHE_TTL", "600"))
+GATEWAY_FALLBACK_CONCURRENCY = int(
+    os.getenv("GATEWAY_FALLBACK_CONCURRENCY", "8")
+)
+
+# configuration for the cached bot cookie (env-configurable)
+BOT_COOKIE_TTL = float(os.getenv("BOT_COOKIE_TTL", "3600"))
+BOT_COOKIE_REFRESH_MARGIN = float(
+    os.getenv("BOT_COOKIE_REFRESH_MARGIN", "300")
+)
+BOT_COOKIE_RETRIES = int(os.getenv("BOT_COOKIE_RETRIES", "3"))
+BOT_COOKIE_RETRY_BACKOFF = float(os.getenv("BOT_COOKIE_RETRY_BACKOFF", "0.5"))
+
+# number of events fetched from MongoDB per round trip (env-configurable)
+EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "100"))
+
+# seconds before a sync token that eventsChangedSince looks back, to catch
+# writes still in flight when the token was made (env-configurable)
+EVENTS_SYNC_OVERLAP = float(os.getenv("EVENTS_SYNC_OVERLAP", "5"))
+
+# largest number of time slots roomAvailabilityGrid returns, and the
+# shortest slot it allows, in minutes (env-configurable)
+ROOM_GRID_MAX_SLOTS = int(os.getenv("ROOM_GRID_MAX_SLOTS", "2016"))
+ROOM_GRID_MIN_GRANULARITY = int(os.getenv("ROOM_GRID_MIN_GRANULARITY", "15"))
+
+# minutes between the start times suggestSlots considers, and the most
+# slots and days of bookings it searches (env-configurable)
+SUGGEST_SLOTS_STEP = int(os.getenv("SUGGEST_SLOTS_STEP", "15"))
+SUGGEST_SLOTS_MAX_COUNT = int(os.getenv("SUGGEST_SLOTS_MAX_COUNT", "20"))
+SUGGEST_SLOTS_MAX_DAYS = int(os.getenv("SUGGEST_SLOTS_MAX_DAYS", "90"))
+
+# also match event times still stored as strings, until every event is
+# migrated by scripts/migrate_event_datetimes.py (env-configurable)
+EVENT_DATETIME_DUAL_READ = os.getenv(
+    "EVENT_DATETIME_DUAL_READ", "True"
+).lower() in ("true", "1", "t")
+
+# also search the names of events without the name search fields, until
+# every event is backfilled by scripts/backfill_event_names.py
+# (env-configurable)
+EVENT_NAME_SEARCH_DUAL_READ = os.getenv(
+    "EVENT_NAME_SEARCH_DUAL_READ", "True"
+).lower() in ("true", "1", "t")
+
 # takes the time from IST timezone
 TIMEZONE = ZoneInfo("Asia/Kolkata")
 """IST timezone"""
@@ -27,6 +115,183 @@ FISCAL_START_MONTH = 4
 # fiscalyear config
 fiscalyear.START_MONTH = FISCAL_START_MONTH
 
+# in-process directory of all clubs, see get_club_index
+clubs_cache = TTLCache(CLUBS_CACHE_TTL, CLUBS_CACHE_STALE_TTL)
+
+# responses of the event listing queries, see invalidate_events_cache
+events_cache = LRUCache(EVENTS_CACHE_SIZE, EVENTS_CACHE_TTL)
+
+# role -> emails of its members, see get_role_emails
+role_emails_cache = TTLCache(ROLE_EMAILS_CACHE_TTL)
+
+# bot cookie shared by scheduled jobs, see get_bot_cookie
+_bot_cookie: dict | None = None
+_bot_cookie_expires_at = 0.0
+_bot_cookie_lock = asyncio.Lock()
+
+# shared connection-pooled client, managed by main.lifespan
+_http_client: AsyncClient | None = None
+
+
+def init_http_client(**kwargs) -> AsyncClient:
+    """
+    Creates the shared, connection-pooled HTTP client used for every
+    inter-service call. It is called from main.lifespan at startup.
+
+    The client never stores cookies set by upstream responses, so cookies
+    must be passed per call (see inter_service_post).
+
+    Args:
+        **kwargs: extra keyword arguments for httpx.AsyncClient, such as a
+                  custom transport.
+
+    Returns:
+        (httpx.AsyncClient): the shared client.
+    """
+    global _http_client
+
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("HTTP2_ENABLED is set but h2 is not installed, using HTTP/1")
+            http2 = False
+
+    _http_client = AsyncClient(
+        limits=Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        http2=http2,
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        **kwargs,
+    )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Closes the shared HTTP client and its pooled connections.
+    """
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> AsyncClient:
+    """
+    Returns the shared HTTP client, creating it if the lifespan has not
+    done so yet (scripts, scheduled jobs).
+
+    Returns:
+        (httpx.AsyncClient): the shared client.
+    """
+    if _http_client is None:
+        return init_http_client()
+    return _http_client
+
+
+async def inter_service_post(url: str, cookies=None, **kwargs) -> Response:
+    """
+    Sends a POST request to another service through the shared client.
+
+    The call goes through the upstream's circuit breaker, and its timeout is
+    capped by the upstream's configured timeout and by whatever is left of
+    the current request's latency budget.
+
+    Args:
+        url (str): url of the service endpoint
+        cookies (dict): cookies to send with this request only.
+                        Defaults to None.
+        **kwargs: extra keyword arguments for httpx.AsyncClient.post
+
+    Returns:
+        (httpx.Response): response of the request
+
+    Raises:
+        resilience.LatencyBudgetExceeded: The request's budget is used up.
+        resilience.CircuitOpenError: The upstream's breaker is open.
+    """
+    headers = kwargs.pop("headers", {})
+    if cookies:
+        headers["Cookie"] = "; ".join(
+            f"{key}={value}" for key, value in cookies.items()
+        )
+
+    upstream = URL(url).host
+    timeout = UPSTREAM_TIMEOUTS.get(upstream, HTTP_TIMEOUT)
+    remaining = remaining_budget()
+    if remaining is not None:
+        if remaining <= 0:
+            raise LatencyBudgetExceeded(
+                f"Latency budget used up before calling {upstream}"
+            )
+        timeout = min(timeout, remaining)
+
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{upstream} is unavailable")
+
+    try:
+        response = await get_http_client().post(
+            url,
+            headers=headers,
+            timeout=Timeout(
+                timeout, connect=min(HTTP_CONNECT_TIMEOUT, timeout)
+            ),
+            **kwargs,
+        )
+    except TransportError:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+async def get_members(keys, cookies=None) -> List[dict | None]:
+    """
+    This function makes a single query to the Members service resolved by
+    the member method, fetches info about many members.
+
+    Args:
+        keys (List[tuple[str, str]]): (club id, user id) pairs
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (List[dict | None]): member info for each key, None if not found
+    """
+
+    try:
+        results = await gateway_batch_query(
+            "Members",
+            "SimpleMemberInput!",
+            """
+                member__i: member(memberInput: $input__i) {
+                    _id
+                    cid
+                    poc
+                    uid
+                }
+            """,
+            [{"cid": cid, "uid": uid, "rid": None} for cid, uid in keys],
+            cookies=cookies,
+        )
+        return [result.get("member") for result in results]
+    except Exception:
+        return [None] * len(keys)
+
 
 async def get_member(cid, uid, cookies=None) -> dict | None:
     """
@@ -41,72 +306,67 @@ async def get_member(cid, uid, cookies=None) -> dict | None:
     Returns:
         (dict|None): response of the request
     """
+    return (await get_members([(cid, uid)], cookies))[0]
 
-    try:
-        query = """
-            query Member($memberInput: SimpleMemberInput!) {
-              member(memberInput: $memberInput) {
-                _id
-                cid
-                poc
-                uid
-              }
-            }
-        """
-        variables = {"memberInput": {"cid": cid, "uid": uid, "rid": None}}
-        async with AsyncClient(cookies=cookies) as client:
-            response = await client.post(
-                "http://gateway/graphql",
-                json={"query": query, "variables": variables},
-            )
-        return response.json()["data"]["member"]
-
-    except Exception:
-        return None
 
-
-async def get_user(uid, cookies=None) -> tuple[dict, dict] | None:
+async def get_users(uids, cookies=None) -> List[tuple[dict, dict] | None]:
     """
-    Function makes a query to the Users service resolved by the userProfile
-    method, fetches info about a user.
+    Function makes a single query to the Users service resolved by the
+    userProfile and userMeta methods, fetches info about many users.
 
     Args:
-        uid (str): user id
+        uids (List[str]): user ids
         cookies (dict): cookies. Defaults to None.
 
     Returns:
-        (tuple[dict, dict] | None): tuple containing userProfile and userMeta or None
-    """  # noqa: E501
+        (List[tuple[dict, dict] | None]): userProfile and userMeta for each
+                                          user, None if not found
+    """
 
     try:
-        query = """
-            query GetUserProfile($userInput: UserInput!) {
-                userProfile(userInput: $userInput) {
+        results = await gateway_batch_query(
+            "GetUserProfiles",
+            "UserInput!",
+            """
+                userProfile__i: userProfile(userInput: $input__i) {
                     firstName
                     lastName
                     email
                     rollno
                 }
-                userMeta(userInput: $userInput) {
+                userMeta__i: userMeta(userInput: $input__i) {
                     phone
                 }
-            }
-        """
-        variable = {"userInput": {"uid": uid}}
-        async with AsyncClient(cookies=cookies) as client:
-            response = await client.post(
-                "http://gateway/graphql",
-                json={"query": query, "variables": variable},
-            )
-
-        return response.json()["data"]["userProfile"], response.json()["data"][
-            "userMeta"
+            """,
+            [{"uid": uid} for uid in uids],
+            cookies=cookies,
+        )
+        return [
+            (result["userProfile"], result.get("userMeta"))
+            if result.get("userProfile") is not None
+            else None
+            for result in results
         ]
     except Exception:
-        return None
+        return [None] * len(uids)
 
 
-async def get_clubs(cookies=None) -> List[dict]:
+async def get_user(uid, cookies=None) -> tuple[dict, dict] | None:
+    """
+    Function makes a query to the Users service resolved by the userProfile
+    method, fetches info about a user.
+
+    Args:
+        uid (str): user id
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (tuple[dict, dict] | None): tuple containing userProfile and userMeta or None
+    """  # noqa: E501
+    return (await get_users([uid], cookies))[0]
+
+
+async def _fetch_clubs(cookies=None) -> List[dict]:
     """
     Function to call a query to the Clubs service resolved by the allClubs
     method, fetches info about all clubs.
@@ -117,25 +377,98 @@ async def get_clubs(cookies=None) -> List[dict]:
     Returns:
         (List[dict]): responce of the request
     """
+    query = """
+                query AllClubs {
+                    allClubs {
+                        cid
+                        name
+                        code
+                        email
+                    }
+                }
+            """
+    response = await inter_service_post(
+        "http://gateway/graphql", json={"query": query}, cookies=cookies
+    )
+    return response.json()["data"]["allClubs"]
+
+
+class ClubIndex:
+    """
+    Lookup tables over the club directory, built once per refresh so that
+    membership checks and lookups by cid take constant time.
+
+    Attributes:
+        clubs (List[dict]): the club directory, as returned by allClubs.
+        by_cid (dict[str, dict]): cid -> club record.
+        codes (dict[str, str]): cid -> club code.
+        names (dict[str, str]): cid -> club name.
+        cids (frozenset[str]): cids of all clubs.
+    """
+
+    def __init__(self, clubs: List[dict]) -> None:
+        self.clubs = clubs
+        self.by_cid = {club["cid"]: club for club in clubs}
+        self.codes = {club["cid"]: club["code"] for club in clubs}
+        self.names = {club["cid"]: club["name"] for club in clubs}
+        self.cids = frozenset(self.by_cid)
+
+
+async def _fetch_club_index(cookies=None) -> ClubIndex:
+    return ClubIndex(await _fetch_clubs(cookies))
+
+
+async def get_club_index(cookies=None) -> ClubIndex:
+    """
+    Returns the index of all clubs from the in-process club directory cache.
+
+    The directory is fetched from the Clubs service at most once per
+    CLUBS_CACHE_TTL seconds; for another CLUBS_CACHE_STALE_TTL seconds the
+    old index is served while it is refreshed in the background.
 
+    Args:
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (ClubIndex): index of all clubs, the last fetched one if it could
+                     not be refreshed, or empty if it was never fetched.
+    """
     try:
-        query = """
-                    query AllClubs {
-                        allClubs {
-                            cid
-                            name
-                            code
-                            email
-                        }
-                    }
-                """
-        async with AsyncClient(cookies=cookies) as client:
-            response = await client.post(
-                "http://gateway/graphql", json={"query": query}
-            )
-        return response.json()["data"]["allClubs"]
-    except Exception:
-        return []
+        return await clubs_cache.get(
+            "allClubs", lambda: _fetch_club_index(cookies)
+        )
+    except Exception as e:
+        # fall back to the last known good directory
+        print(f"Could not fetch the club directory: {e}")
+        return clubs_cache.peek("allClubs") or ClubIndex([])
+
+
+async def get_clubs(cookies=None) -> List[dict]:
+    """
+    Returns info about all clubs from the in-process club directory cache.
+
+    Args:
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (List[dict]): list of clubs, see get_club_index.
+    """
+    return (await get_club_index(cookies)).clubs
+
+
+def invalidate_clubs_cache() -> None:
+    """
+    Drops the cached club directory, the next lookup refetches it.
+    """
+    clubs_cache.invalidate()
+
+
+def invalidate_events_cache() -> None:
+    """
+    Drops the cached event listing responses, to be called after every
+    change to the events.
+    """
+    events_cache.invalidate()
 
 
 # method gets club code from club id
@@ -149,11 +482,40 @@ async def get_club_code(clubid: str) -> str | None:
     Returns:
         (str | None): club code or None if club not found
     """
-    allclubs = await get_clubs()
-    for club in allclubs:
-        if club["cid"] == clubid:
-            return club["code"]
-    return None
+    return (await get_club_index()).codes.get(clubid)
+
+
+async def get_clubs_details(clubids, cookies=None) -> List[dict]:
+    """
+    This method makes a single query to the clubs service resolved by the
+    club method, used to get many clubs' details from their clubids.
+
+    Args:
+        clubids (List[str]): club ids
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (List[dict]): details of each club, empty if not found
+    """
+
+    try:
+        results = await gateway_batch_query(
+            "Clubs",
+            "SimpleClubInput!",
+            """
+                club__i: club(clubInput: $input__i) {
+                    cid
+                    name
+                    email
+                    category
+                }
+            """,
+            [{"cid": clubid} for clubid in clubids],
+            cookies=cookies,
+        )
+        return [result.get("club") or {} for result in results]
+    except Exception:
+        return [{} for _ in clubids]
 
 
 async def get_club_details(
@@ -171,27 +533,7 @@ async def get_club_details(
     Returns:
         (List[dict]): response of the request
     """
-
-    try:
-        query = """
-                    query Club($clubInput: SimpleClubInput!) {
-                        club(clubInput: $clubInput) {
-                            cid
-                            name
-                            email
-                            category
-                        }
-                    }
-                """
-        variable = {"clubInput": {"cid": clubid}}
-        async with AsyncClient(cookies=cookies) as client:
-            response = await client.post(
-                "http://gateway/graphql",
-                json={"query": query, "variables": variable},
-            )
-        return response.json()["data"]["club"]
-    except Exception:
-        return {}
+    return (await get_clubs_details([clubid], cookies))[0]
 
 
 async def get_event_code(clubid, starttime) -> str:
@@ -224,10 +566,13 @@ async def get_event_code(clubid, starttime) -> str:
     club_events = await eventsdb.find(
         {
             "clubid": clubid,
-            "datetimeperiod": {
-                "$gte": start.isoformat(),
-                "$lte": end.isoformat(),
-            },
+            "$and": [
+                datetime_condition(
+                    "datetimeperiod",
+                    gte=to_datetime(start.isoformat()),
+                    lte=to_datetime(end.isoformat()),
+                )
+            ],
         }
     ).to_list(length=None)
 
@@ -272,10 +617,148 @@ def get_event_finances_link(id) -> str:
     return f"{host}/manage/finances/{id}"
 
 
+async def gateway_batch_query(
+    operation: str,
+    variable_type: str,
+    selection: str,
+    inputs: List[dict],
+    cookies=None,
+) -> List[dict]:
+    """
+    Resolves the same selection for many inputs in a single gateway request
+    by aliasing it once per input.
+
+    The selection is written for one input, with `__i` in place of the
+    alias suffix and `$input__i` as its variable, for example
+    `userProfile__i: userProfile(userInput: $input__i) { email }`.
+    If the gateway returns no data at all, the inputs are retried one by
+    one with at most GATEWAY_FALLBACK_CONCURRENCY requests in flight.
+
+    Args:
+        operation (str): name of the GraphQL operation
+        variable_type (str): GraphQL type of each input variable
+        selection (str): selection template for one input
+        inputs (List[dict]): one variable value per input
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (List[dict]): for each input, a dict from un-aliased field name to
+                      its value (None for fields that failed to resolve),
+                      empty for inputs whose retry failed.
+
+    Raises:
+        Exception: The gateway returned no data.
+    """
+    if not inputs:
+        return []
+
+    variable_definitions = ", ".join(
+        f"$input_{i}: {variable_type}" for i in range(len(inputs))
+    )
+    selections = "\n".join(
+        selection.replace("__i", f"_{i}") for i in range(len(inputs))
+    )
+    query = f"query {operation}({variable_definitions}) {{\n{selections}\n}}"
+    variables = {f"input_{i}": value for i, value in enumerate(inputs)}
+
+    response = await inter_service_post(
+        "http://gateway/graphql",
+        json={"query": query, "variables": variables},
+        cookies=cookies,
+    )
+    data = response.json().get("data")
+    if data is None and len(inputs) > 1:
+        # a single failing input can null the whole response, so retry
+        # every input on its own, a few at a time
+        semaphore = asyncio.Semaphore(GATEWAY_FALLBACK_CONCURRENCY)
+        return await asyncio.gather(
+            *(
+                _gateway_single_query(
+                    operation,
+                    variable_type,
+                    selection,
+                    value,
+                    cookies,
+                    semaphore,
+                )
+                for value in inputs
+            )
+        )
+    if data is None:
+        raise Exception("Gateway returned no data for batched query")
+
+    results: List[dict] = [{} for _ in inputs]
+    for alias, value in data.items():
+        field, _, index = alias.rpartition("_")
+        results[int(index)][field] = value
+    return results
+
+
+async def _gateway_single_query(
+    operation: str,
+    variable_type: str,
+    selection: str,
+    value: dict,
+    cookies,
+    semaphore: asyncio.Semaphore,
+) -> dict:
+    try:
+        async with semaphore:
+            results = await gateway_batch_query(
+                operation, variable_type, selection, [value], cookies
+            )
+        return results[0]
+    except Exception:
+        return {}
+
+
+async def _fetch_role_uids(role: str) -> List[str]:
+    query = """
+        query Query($role: String!, $interCommunicationSecret: String) {
+          usersByRole(role: $role, interCommunicationSecret: $interCommunicationSecret) {
+            uid
+          }
+        }
+    """  # noqa: E501
+    variables = {
+        "role": role,
+        "interCommunicationSecret": inter_communication_secret,
+    }
+    response = await inter_service_post(
+        "http://gateway/graphql",
+        json={"query": query, "variables": variables},
+    )
+    return [user["uid"] for user in response.json()["data"]["usersByRole"]]
+
+
+async def _fetch_role_emails(role: str) -> List[str]:
+    uids = await _fetch_role_uids(role)
+    profiles = await gateway_batch_query(
+        "UserProfiles",
+        "UserInput",
+        "userProfile__i: userProfile(userInput: $input__i) { email }",
+        [{"uid": uid} for uid in uids],
+    )
+    failed = sum("userProfile" not in profile for profile in profiles)
+    if failed:
+        # a partial list would be cached and silently skip recipients
+        raise Exception(f"Could not fetch the profiles of {failed} users")
+    return [
+        profile["userProfile"]["email"]
+        for profile in profiles
+        if profile.get("userProfile") and profile["userProfile"]["email"]
+    ]
+
+
 async def get_role_emails(role: str) -> List[str]:
     """
     Brings all the emails of members belonging to a role
 
+    The uids of the role are resolved to emails in one batched gateway
+    request (see gateway_batch_query), and the result is cached for
+    ROLE_EMAILS_CACHE_TTL seconds. Failed fetches are not cached; the last
+    known emails of the role are returned instead.
+
     Args:
         role: role of the user to be searched
 
@@ -284,43 +767,14 @@ async def get_role_emails(role: str) -> List[str]:
     """
 
     try:
-        query = """
-            query Query($role: String!, $interCommunicationSecret: String) {
-              usersByRole(role: $role, interCommunicationSecret: $interCommunicationSecret) {
-                uid
-              }
-            }
-        """  # noqa: E501
-        variables = {
-            "role": role,
-            "interCommunicationSecret": inter_communication_secret,
-        }
-        async with AsyncClient() as client:
-            response = await client.post(
-                "http://gateway/graphql",
-                json={"query": query, "variables": variables},
-            )
-            uids = [
-                user["uid"] for user in response.json()["data"]["usersByRole"]
-            ]
-            emails = []
-            for uid in uids:
-                query = """
-                    query UserProfile($userInput: UserInput) {
-                      userProfile(userInput: $userInput) {
-                        email
-                      }
-                    }
-                """
-                variables = {"userInput": {"uid": uid}}
-                resp = await client.post(
-                    "http://gateway/graphql",
-                    json={"query": query, "variables": variables},
-                )
-                emails.append(resp.json()["data"]["userProfile"]["email"])
-        return emails
-    except Exception:
-        return []
+        emails = await role_emails_cache.get(
+            role, lambda: _fetch_role_emails(role)
+        )
+    except Exception as e:
+        # fall back to the last known good emails
+        print(f"Could not fetch emails of role {role}: {e}")
+        emails = role_emails_cache.peek(role) or []
+    return list(emails)
 
 
 def subtract_months(dt, months):
@@ -336,6 +790,73 @@ def subtract_months(dt, months):
     return dt.replace(year=year, month=month, day=1)
 
 
+def to_datetime(value: datetime | str) -> datetime:
+    """
+    Converts a stored event time to an aware datetime.
+
+    Event times are stored as BSON dates. Events created before that hold
+    ISO 8601 strings in UTC instead, until they are migrated.
+
+    Args:
+        value (datetime | str): stored event time
+
+    Returns:
+        (datetime): the time, taken as UTC if it has no offset.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def datetime_condition(field: str, **operators: datetime) -> dict:
+    """
+    Builds a query condition comparing an event time field.
+
+    MongoDB only compares values of the same type, so while
+    EVENT_DATETIME_DUAL_READ is set the condition also matches the times
+    still stored as strings.
+
+    Args:
+        field (str): field holding the time, e.g. "datetimeperiod.1"
+        **operators (datetime): bound of each comparison operator, e.g.
+                                gte=start, lt=end
+
+    Returns:
+        (dict): the condition, to be combined with others using $and.
+    """
+    condition = {
+        field: {f"${operator}": value for operator, value in operators.items()}
+    }
+    if not EVENT_DATETIME_DUAL_READ:
+        return condition
+
+    legacy = {
+        field: {
+            f"${operator}": _legacy_datetime(value)
+            for operator, value in operators.items()
+        }
+    }
+    return {"$or": [condition, legacy]}
+
+
+def _legacy_datetime(value: datetime) -> str:
+    # format jsonable_encoder stored event times in
+    return (
+        to_datetime(value)
+        .astimezone(timezone.utc)
+        .strftime("%Y-%m-%dT%H:%M:%SZ")
+    )
+
+
+def _date_expression(expression) -> dict:
+    # aggregation expression of an event time as a date
+    if not EVENT_DATETIME_DUAL_READ:
+        return expression
+    return {"$toDate": expression}
+
+
 async def events_with_sorting(
     searchspace,
     name: str | None = None,
@@ -343,21 +864,27 @@ async def events_with_sorting(
     pagination=False,
     skip=0,
     limit: int | None = None,
-    timings: List[str] | None = None,
+    timings: Sequence[datetime] | None = None,
     pastEventsLimit: int | None = None,
+    projection: dict | None = None,
 ) -> List[dict]:
     """
     Provides a list of events based on the searchspace provided.
 
     Custom sorting of events based on
     datetimeperiod with
-    ongoing events first in ascending order of end time
+    ongoing events first in descending order of start time
     then
     upcoming events first in ascending order of start time
     and then
     past events in descending order of end time
     It also filters events based on name if name is provided and
-    pagination is True.
+    pagination is True, matching it anywhere in the normalized name (see
+    event_name_search_fields) and putting the best matches first.
+
+    The events are filtered, sorted and limited by MongoDB in a single
+    aggregation and read in batches of EVENTS_BATCH_SIZE, so a limited
+    call only transfers that many events.
 
     Args:
         searchspace (dict): search space for events
@@ -374,120 +901,759 @@ async def events_with_sorting(
                                 events are to be fetched. Defaults to None.
         pastEventsLimit (int | None): Time Limit for the past events to
                                       be fetched in months. Defaults to None.
+        projection (dict | None): fields of the events to fetch, all of them
+                                  if None. Must include datetimeperiod.
+                                  Defaults to None.
 
     Returns:
         (List[dict]): list of events
     """
-    current_datetime = datetime.now(TIMEZONE).strftime(
-        "%Y-%m-%dT%H:%M:%S+00:00"
-    )
+    current_datetime = datetime.now(TIMEZONE)
 
     if date_filter:
-        required_events_query = {
-            **searchspace,
-        }
-        events = (
-            await eventsdb.find(required_events_query)
+        return (
+            await eventsdb.find(searchspace, projection)
             .sort("datetimeperiod.0", -1)
+            .limit(limit or 0)
+            .batch_size(EVENTS_BATCH_SIZE)
             .to_list(length=None)
         )
-        return events[:limit] if limit else events
 
-    if name is not None and pagination:
-        searchspace["name"] = {"$regex": name, "$options": "i"}
+    conditions = _event_filter_conditions(
+        searchspace, name if pagination else None, timings, pastEventsLimit
+    )
+    if pagination and skip >= 0:
+        # only past events, latest first
+        conditions.append(
+            datetime_condition("datetimeperiod.1", lt=current_datetime)
+        )
+    elif pagination:
+        # only ongoing and upcoming events
+        conditions.append(
+            datetime_condition("datetimeperiod.1", gte=current_datetime)
+        )
 
-    if timings is not None:
-        timings_conditions = [
-            # Event starts within the timing period
+    pipeline: List[dict] = [{"$match": {"$and": conditions}}]
+    if projection is not None:
+        if name is not None and pagination:
+            # needed to rank the matches
+            projection = {**projection, "name_normalized": 1}
+        pipeline.append({"$project": projection})
+
+    start = _date_expression({"$arrayElemAt": ["$datetimeperiod", 0]})
+    end = _date_expression({"$arrayElemAt": ["$datetimeperiod", 1]})
+    if pagination and skip >= 0 and EVENT_DATETIME_DUAL_READ:
+        # sort string and date end times together
+        pipeline.append({"$addFields": {"_end": end}})
+        sort: dict = {"_end": -1}
+    elif pagination and skip >= 0:
+        sort = {"datetimeperiod.1": -1}
+    else:
+        sort = {
+            "_order": 1,
+            "_ascending": 1,
+            "_descending": -1,
+            "_id": 1,
+        }
+        pipeline += [
+            # 0: ongoing, 1: upcoming, 2: past
             {
-                "datetimeperiod.0": {
-                    "$gte": timings[0],
-                    "$lt": timings[1],
+                "$addFields": {
+                    "_order": {
+                        "$switch": {
+                            "branches": [
+                                {
+                                    "case": {"$gt": [start, current_datetime]},
+                                    "then": 1,
+                                },
+                                {
+                                    "case": {"$gte": [end, current_datetime]},
+                                    "then": 0,
+                                },
+                            ],
+                            "default": 2,
+                        }
+                    }
                 }
             },
-            # Event ends within the timing period
+            # ongoing events by start time descending, upcoming events by
+            # start time ascending and past events by end time descending
             {
-                "datetimeperiod.1": {
-                    "$gt": timings[0],
-                    "$lte": timings[1],
+                "$addFields": {
+                    "_ascending": {
+                        "$cond": [{"$eq": ["$_order", 1]}, start, None]
+                    },
+                    "_descending": {
+                        "$cond": [{"$eq": ["$_order", 0]}, start, end]
+                    },
                 }
             },
-            # Event spans the entire timing period
+        ]
+
+    if name is not None and pagination:
+        # best matches first, each group in the usual order
+        pipeline.append(
+            {"$addFields": {"_relevance": _event_name_relevance(name)}}
+        )
+        sort = {"_relevance": -1, **sort}
+
+    pipeline.append({"$sort": sort})
+    if pagination and skip >= 0:
+        pipeline.append({"$skip": skip})
+    if limit and not (pagination and skip < 0):
+        pipeline.append({"$limit": limit})
+    computed = {
+        field: 0 for field in sort if field.startswith("_") and field != "_id"
+    }
+    if computed:
+        # drop the computed sort keys
+        pipeline.append({"$project": computed})
+
+    cursor = await eventsdb.aggregate(pipeline, batchSize=EVENTS_BATCH_SIZE)
+    return await cursor.to_list(length=None)
+
+
+def _event_filter_conditions(
+    searchspace: dict,
+    name: str | None,
+    timings: Sequence[datetime] | None,
+    pastEventsLimit: int | None,
+) -> List[dict]:
+    # conditions to be combined with $and
+    conditions = [searchspace]
+
+    if name is not None:
+        conditions.append(_event_name_condition(name))
+
+    if timings is not None:
+        conditions.append(
             {
-                "datetimeperiod.0": {"$lte": timings[0]},
-                "datetimeperiod.1": {"$gte": timings[1]},
-            },
+                "$or": [
+                    # Event starts within the timing period
+                    datetime_condition(
+                        "datetimeperiod.0", gte=timings[0], lt=timings[1]
+                    ),
+                    # Event ends within the timing period
+                    datetime_condition(
+                        "datetimeperiod.1", gt=timings[0], lte=timings[1]
+                    ),
+                    # Event spans the entire timing period
+                    {
+                        "$and": [
+                            datetime_condition(
+                                "datetimeperiod.0", lte=timings[0]
+                            ),
+                            datetime_condition(
+                                "datetimeperiod.1", gte=timings[1]
+                            ),
+                        ]
+                    },
+                ]
+            }
+        )
+
+    if pastEventsLimit is not None:
+        limit_datetime = subtract_months(
+            datetime.now(TIMEZONE), pastEventsLimit
+        )
+        conditions.append(
+            datetime_condition("datetimeperiod.1", gte=limit_datetime)
+        )
+
+    return conditions
+
+
+def normalize_event_name(name: str) -> str:
+    """
+    Normalizes an event name for searching: accents are removed, case is
+    folded and whitespace is collapsed.
+
+    Args:
+        name (str): name of the event
+
+    Returns:
+        (str): the normalized name.
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return " ".join(name.casefold().split())
+
+
+def event_name_search_fields(name: str) -> dict:
+    """
+    Returns the search fields to store along with an event's name.
+
+    `name_normalized` serves name prefix matches, `name_word_suffixes` (the
+    rest of the normalized name from each word after the first) serves word
+    prefix matches and `name_trigrams` (every run of three characters of
+    the normalized name) serves substring matches, all through indexes.
+
+    Args:
+        name (str): name of the event
+
+    Returns:
+        (dict): the name_normalized, name_word_suffixes and name_trigrams
+                fields.
+    """
+    normalized = normalize_event_name(name)
+    words = normalized.split(" ")
+    return {
+        "name_normalized": normalized,
+        "name_word_suffixes": [
+            " ".join(words[i:]) for i in range(1, len(words))
+        ],
+        "name_trigrams": _trigrams(normalized),
+    }
+
+
+def _trigrams(text: str) -> List[str]:
+    return sorted({text[i : i + 3] for i in range(len(text) - 2)})
+
+
+def _event_name_condition(name: str) -> dict:
+    query = normalize_event_name(name)
+    if len(query) < 3:
+        # too short for trigrams, match the start of any word instead, with
+        # anchored regexes that are bounded ranges of the indexes
+        prefix = f"^{re.escape(query)}"
+        conditions = [
+            {"name_normalized": {"$regex": prefix}},
+            {"name_word_suffixes": {"$regex": prefix}},
         ]
+        pattern = rf"(^|\s){re.escape(query)}"
+    else:
+        # the trigrams narrow the candidates down through the index, and
+        # the regex drops those that have the trigrams in another order
+        conditions = [
+            {
+                "name_trigrams": {"$all": _trigrams(query)},
+                "name_normalized": {"$regex": re.escape(query)},
+            }
+        ]
+        pattern = re.escape(query)
 
-        searchspace = {
-            **searchspace,
-            "$or": timings_conditions,
+    if EVENT_NAME_SEARCH_DUAL_READ:
+        # events not backfilled yet are matched on their name, which the
+        # indexes do not serve
+        conditions.append(
+            {
+                "name_word_suffixes": {"$exists": False},
+                "name": {"$regex": pattern, "$options": "i"},
+            }
+        )
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def _event_name_relevance(name: str) -> dict:
+    # 3: exact match, 2: name starts with it, 1: a word starts with it,
+    # 0: anywhere else in the name
+    query = normalize_event_name(name)
+    normalized = "$name_normalized"
+    if EVENT_NAME_SEARCH_DUAL_READ:
+        normalized = {"$ifNull": [normalized, {"$toLower": "$name"}]}
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": [normalized, query]}, "then": 3},
+                {
+                    "case": {"$eq": [{"$indexOfCP": [normalized, query]}, 0]},
+                    "then": 2,
+                },
+                {
+                    "case": {
+                        "$gte": [
+                            {"$indexOfCP": [normalized, f" {query}"]},
+                            0,
+                        ]
+                    },
+                    "then": 1,
+                },
+            ],
+            "default": 0,
         }
+    }
+
 
-    ongoing_events_query = {
-        **searchspace,
-        "datetimeperiod.0": {"$lte": current_datetime},
-        "datetimeperiod.1": {"$gte": current_datetime},
+async def past_events_page(
+    searchspace,
+    limit: int,
+    after: str | None = None,
+    name: str | None = None,
+    timings: Sequence[datetime] | None = None,
+    pastEventsLimit: int | None = None,
+    projection: dict | None = None,
+) -> tuple[List[dict], str | None]:
+    """
+    Provides one page of past events, latest first, using keyset
+    pagination.
+
+    Instead of skipping the events of earlier pages, the query seeks past
+    the last event of the previous page on (end time, id), so every page
+    costs the same however deep it is, and pages do not shift when events
+    are added.
+
+    Args:
+        searchspace (dict): search space for events
+        limit (int): number of events in the page.
+        after (str | None): cursor returned with the previous page, None
+                            for the first page. Defaults to None.
+        name (str | None): name of the event. Defaults to None.
+        timings (otypes.timelot_type | None): The time period for which the
+                                events are to be fetched. Defaults to None.
+        pastEventsLimit (int | None): Time Limit for the past events to
+                                      be fetched in months. Defaults to None.
+        projection (dict | None): fields of the events to fetch, all of them
+                                  if None. Must include datetimeperiod.
+                                  Defaults to None.
+
+    Returns:
+        (tuple[List[dict], str | None]): the events of the page and the
+                                         cursor of the next page, None if
+                                         this is the last one.
+
+    Raises:
+        Exception: Invalid cursor.
+    """
+    current_datetime = datetime.now(TIMEZONE)
+
+    conditions = _event_filter_conditions(
+        searchspace, name, timings, pastEventsLimit
+    )
+    conditions.append(
+        datetime_condition("datetimeperiod.1", lt=current_datetime)
+    )
+    if after is not None:
+        end, id = _decode_event_cursor(after)
+        seek = [
+            {"datetimeperiod.1": {"$lt": end}},
+            {"datetimeperiod.1": end, "_id": {"$lt": id}},
+        ]
+        if isinstance(end, datetime) and EVENT_DATETIME_DUAL_READ:
+            # end times stored as strings sort after all the dates
+            seek.append({"datetimeperiod.1": {"$type": "string"}})
+        conditions.append({"$or": seek})
+
+    # one extra event tells whether there is a next page
+    events = (
+        await eventsdb.find({"$and": conditions}, projection)
+        .sort([("datetimeperiod.1", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .batch_size(EVENTS_BATCH_SIZE)
+        .to_list(length=None)
+    )
+    if len(events) <= limit:
+        return events, None
+
+    events = events[:limit]
+    return events, _encode_event_cursor(events[-1])
+
+
+def _encode_event_cursor(event: dict) -> str:
+    # the end time keeps its stored type, which decides its sort position
+    end = event["datetimeperiod"][1]
+    if isinstance(end, datetime):
+        position = ["date", end.isoformat(), event["_id"]]
+    else:
+        position = ["string", end, event["_id"]]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_event_cursor(cursor: str) -> tuple[datetime | str, str]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise Exception("Invalid cursor.")
+    if (
+        not isinstance(position, list)
+        or len(position) != 3
+        or not all(isinstance(value, str) for value in position)
+        or position[0] not in ("date", "string")
+    ):
+        raise Exception("Invalid cursor.")
+
+    kind, end, id = position
+    if kind == "date":
+        try:
+            end = to_datetime(end)
+        except ValueError:
+            raise Exception("Invalid cursor.")
+    return end, id
+
+
+async def events_changed_since(
+    searchspace,
+    since: datetime | None,
+    projection: dict | None = None,
+) -> tuple[List[dict], List[str], datetime]:
+    """
+    Provides the events changed since a point in time, using the
+    updated_at field kept by the event mutations.
+
+    Changes are looked for from EVENTS_SYNC_OVERLAP seconds before since,
+    so that writes still in flight when the previous sync ran are not
+    missed. The same change can hence be returned twice.
+
+    The ids of the events that left the searchspace are limited to those
+    the user could have seen before the change: events of the same clubs,
+    whatever their audience, in a state the user sees or deleted, as an
+    event only leaves the states a user sees by being deleted.
+
+    Args:
+        searchspace (dict): search space of the events the user can see
+        since (datetime | None): time of the previous sync, None to get
+                                 every event.
+        projection (dict | None): fields of the events to fetch, all of them
+                                  if None. Defaults to None.
+
+    Returns:
+        (tuple[List[dict], List[str], datetime]): the changed events in the
+                                                 searchspace, the ids of the
+                                                 changed events the user
+                                                 can no longer see and the
+                                                 time of this sync.
+    """
+    # taken before reading, so that later writes make it to the next sync
+    synced_at = datetime.now(timezone.utc)
+
+    if since is None:
+        events = (
+            await eventsdb.find(searchspace, projection)
+            .batch_size(EVENTS_BATCH_SIZE)
+            .to_list(length=None)
+        )
+        return events, [], synced_at
+
+    changed = {
+        "updated_at": {"$gte": since - timedelta(seconds=EVENTS_SYNC_OVERLAP)}
     }
-    upcoming_events_query = {
-        **searchspace,
-        "datetimeperiod.0": {"$gt": current_datetime},
+    events = (
+        await eventsdb.find({"$and": [searchspace, changed]}, projection)
+        .batch_size(EVENTS_BATCH_SIZE)
+        .to_list(length=None)
+    )
+    removed = await eventsdb.distinct(
+        "_id",
+        {
+            "$and": [
+                _removal_searchspace(searchspace),
+                changed,
+                {"_id": {"$nin": [e["_id"] for e in events]}},
+            ]
+        },
+    )
+    return events, removed, synced_at
+
+
+def _removal_searchspace(searchspace: dict) -> dict:
+    # the events the user could see before they were changed
+    searchspace = {
+        key: value for key, value in searchspace.items() if key != "audience"
     }
-    past_events_query = {
-        **searchspace,
-        "datetimeperiod.1": {"$lt": current_datetime},
+    states = searchspace.get("status.state")
+    if states is not None:
+        searchspace["status.state"] = {
+            "$in": [*states["$in"], Event_State_Status.deleted.value]
+        }
+    return searchspace
+
+
+def encode_sync_token(synced_at: datetime) -> str:
+    """
+    Encodes the time of a sync as an opaque token.
+
+    Args:
+        synced_at (datetime): time of the sync
+
+    Returns:
+        (str): the sync token.
+    """
+    return base64.urlsafe_b64encode(synced_at.isoformat().encode()).decode()
+
+
+def decode_sync_token(token: str) -> datetime:
+    """
+    Decodes a token made by encode_sync_token.
+
+    Args:
+        token (str): sync token
+
+    Returns:
+        (datetime): the time of the sync.
+
+    Raises:
+        Exception: Invalid sync token.
+    """
+    try:
+        return to_datetime(base64.urlsafe_b64decode(token.encode()).decode())
+    except ValueError:
+        raise Exception("Invalid sync token.")
+
+
+def selection_projection(
+    selections, model: type[BaseModel], required: Iterable[str] = ()
+) -> dict:
+    """
+    Builds a MongoDB projection fetching only the fields selected in a
+    GraphQL query, for a strawberry type generated from a pydantic model.
+
+    Only top level fields are projected, a selected object (e.g. status) is
+    fetched whole.
+
+    Args:
+        selections (list): selections of the field resolving to the type,
+                           e.g. info.selected_fields[0].selections
+        model (type[pydantic.BaseModel]): model the type is generated from
+        required (Iterable[str]): database fields to always fetch.
+                                  Defaults to none.
+
+    Returns:
+        (dict): the projection.
+    """
+    database_fields = {
+        field.alias or to_camel_case(name): field.alias or name
+        for name, field in model.model_fields.items()
     }
+    projection = {field: 1 for field in required}
+    for name in _selected_names(selections):
+        if name in database_fields:
+            projection[database_fields[name]] = 1
+    return projection
 
-    if pastEventsLimit is not None:
-        limit_datetime = subtract_months(
-            datetime.now(TIMEZONE), pastEventsLimit
-        )
-        limit_datetime = limit_datetime.strftime("%Y-%m-%dT%H:%M:%S+00:00")
-        past_events_query["datetimeperiod.1"]["$gte"] = limit_datetime
-
-    if pagination:
-        if skip < 0:
-            ongoing_events = (
-                await eventsdb.find(ongoing_events_query)
-                .sort("datetimeperiod.0", -1)
-                .to_list(length=None)
-            )
-            upcoming_events = (
-                await eventsdb.find(upcoming_events_query)
-                .sort("datetimeperiod.0", 1)
-                .to_list(length=None)
-            )
-            events = ongoing_events + upcoming_events
+
+def selected_subfields(selections, name: str) -> list:
+    """
+    Returns the selections made inside the field with the given name, e.g.
+    the event fields selected in the events field of a page, looking
+    through fragment spreads and inline fragments.
+
+    Args:
+        selections (list): selections to look in, e.g.
+                           info.selected_fields[0].selections
+        name (str): name of the field
+
+    Returns:
+        (list): the selections inside every selection of the field.
+    """
+    subfields = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            if selection.name == name:
+                subfields.extend(selection.selections)
         else:
-            past_events = (
-                await eventsdb.find(past_events_query)
-                .sort("datetimeperiod.1", -1)
-                .skip(skip)
-                .limit(limit or 0)
-                .to_list(length=None)
-            )
-            events = past_events
+            # fragments
+            subfields.extend(selected_subfields(selection.selections, name))
+    return subfields
+
+
+def _selected_names(selections) -> Iterator[str]:
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            yield selection.name
+        else:
+            # fragments
+            yield from _selected_names(selection.selections)
+
+
+async def calendar_searchspace(
+    user: dict | None, clubid: str | None = None, cookies=None
+) -> tuple[dict, bool]:
+    """
+    Builds the search space of the events shown in a user's calendar.
+
+    Public viewers see approved events that are not internal. The slc and
+    slo roles also see events pending budget or room approval, and clubs
+    additionally those pending cc approval or incomplete, except internal
+    ones. The cc and a club looking at its own calendar see every event.
+
+    Args:
+        user (dict | None): the user, None for public viewers
+        clubid (str | None): only events of this club and its
+                             collaborations if given. Defaults to None.
+        cookies (dict): cookies. Defaults to None.
+
+    Returns:
+        (tuple[dict, bool]): the search space and whether the user has only
+                             public access.
+    """
+    restrictAccess = True
+    restrictFullAccess = True
+    clubAccess = False
+
+    if user is not None:
+        if user["role"] in ["cc", "slc", "slo"]:
+            restrictAccess = False
+            if user["role"] in ["cc"]:
+                restrictFullAccess = False
+        elif user["role"] == "club":
+            clubAccess = True
+            restrictAccess = False
+            if user["uid"] == clubid:
+                restrictFullAccess = False
+
+    assert not (restrictAccess and not restrictFullAccess), (
+        "restrictAccess and not restrictFullAccess can not be True at the same time."  # noqa: E501
+    )
+
+    searchspace: dict = {}
+    if clubid is not None:
+        searchspace["$or"] = [
+            {"clubid": clubid},
+            {"collabclubs": {"$in": [clubid]}},
+        ]
     else:
-        ongoing_events = (
-            await eventsdb.find(ongoing_events_query)
-            .sort("datetimeperiod.0", -1)
-            .to_list(length=None)
+        club_index = await get_club_index(cookies)
+        searchspace["clubid"] = {"$in": list(club_index.cids)}
+
+    if restrictAccess:
+        searchspace["status.state"] = {
+            "$in": [Event_State_Status.approved.value]
+        }
+        searchspace["audience"] = {"$nin": ["internal"]}
+    elif restrictFullAccess:
+        statuses = [
+            Event_State_Status.approved.value,
+            Event_State_Status.pending_budget.value,
+            Event_State_Status.pending_room.value,
+        ]
+        if clubAccess:
+            searchspace["audience"] = {"$nin": ["internal"]}
+            statuses.append(Event_State_Status.pending_cc.value)
+            statuses.append(Event_State_Status.incomplete.value)
+        searchspace["status.state"] = {"$in": statuses}
+
+    return searchspace, restrictAccess
+
+
+def response_cache_role(user: dict | None, restrictAccess: bool) -> str | None:
+    """
+    Returns the class of users that are shown the same events as a user, so
+    that their responses can be shared through events_cache.
+
+    Args:
+        user (dict | None): the user, None for public viewers
+        restrictAccess (bool): whether the user has only public access
+
+    Returns:
+        (str | None): "public" or the user's role, None if the events shown
+                      depend on the user.
+    """
+    if restrictAccess:
+        return "public"
+    if user is not None and user["role"] in ["cc", "slc", "slo"]:
+        return user["role"]
+    return None
+
+
+async def events_in_window(
+    searchspace, start: datetime, end: datetime, projection=None
+) -> List[dict]:
+    """
+    Provides the events overlapping a time window, by start time.
+
+    Unlike events_with_sorting, the order does not depend on the current
+    time, so the same events always come in the same order.
+
+    Args:
+        searchspace (dict): search space for events
+        start (datetime): start of the window
+        end (datetime): end of the window, excluded
+        projection (dict | None): fields of the events to fetch, all of them
+                                  if None. Defaults to None.
+
+    Returns:
+        (List[dict]): the events, by start time.
+    """
+    return (
+        await eventsdb.find(
+            {
+                "$and": [
+                    searchspace,
+                    datetime_condition("datetimeperiod.0", lt=end),
+                    datetime_condition("datetimeperiod.1", gt=start),
+                ]
+            },
+            projection,
         )
-        upcoming_events = (
-            await eventsdb.find(upcoming_events_query)
-            .sort("datetimeperiod.0", 1)
-            .to_list(length=None)
+        .sort([("datetimeperiod.0", 1), ("_id", 1)])
+        .batch_size(EVENTS_BATCH_SIZE)
+        .to_list(length=None)
+    )
+
+
+async def stream_events(
+    searchspace, projection: dict | None = None, latest_first: bool = False
+) -> AsyncIterator[dict]:
+    """
+    Yields the events in the searchspace by start time, reading them from
+    MongoDB in batches of EVENTS_BATCH_SIZE, so that exports never hold
+    all the events in memory.
+
+    Args:
+        searchspace (dict): search space for events
+        projection (dict | None): fields of the events to fetch, all of them
+                                  if None. Defaults to None.
+        latest_first (bool): if True, the events starting last come first.
+                             Defaults to False.
+
+    Yields:
+        (dict): the next event.
+    """
+    direction = -1 if latest_first else 1
+    if EVENT_DATETIME_DUAL_READ:
+        # start times stored as strings sort apart from the dates, so sort
+        # on both as dates, as events_with_sorting does
+        start = _date_expression({"$arrayElemAt": ["$datetimeperiod", 0]})
+        cursor = await eventsdb.aggregate(
+            [
+                {"$match": searchspace},
+                {"$addFields": {"_start": start}},
+                {"$sort": {"_start": direction, "_id": direction}},
+                {"$project": projection or {"_start": 0}},
+            ],
+            batchSize=EVENTS_BATCH_SIZE,
+            allowDiskUse=True,
         )
-        past_events = (
-            await eventsdb.find(past_events_query)
-            .sort("datetimeperiod.1", -1)
-            .to_list(length=None)
+    else:
+        cursor = (
+            eventsdb.find(searchspace, projection)
+            .sort([("datetimeperiod.0", direction), ("_id", direction)])
+            .batch_size(EVENTS_BATCH_SIZE)
         )
-        events = ongoing_events + upcoming_events + past_events
-        if limit:
-            events = events[:limit]
+    async for event in cursor:
+        yield event
 
-    return events
+
+async def events_fingerprint(searchspace) -> tuple[int, datetime | None]:
+    """
+    Summarizes the events in the searchspace cheaply, to tell whether any
+    of them changed without fetching them.
+
+    Any event mutation changes the summary: it stamps updated_at, and an
+    event leaving the searchspace changes the count.
+
+    Args:
+        searchspace (dict): search space for events
+
+    Returns:
+        (tuple[int, datetime | None]): number of events and the latest
+                                       updated_at among them.
+    """
+    cursor = await eventsdb.aggregate(
+        [
+            {"$match": searchspace},
+            {
+                "$group": {
+                    "_id": None,
+                    "count": {"$sum": 1},
+                    "updated_at": {"$max": "$updated_at"},
+                }
+            },
+        ]
+    )
+    summary = await cursor.to_list(length=None)
+    if not summary:
+        return 0, None
+    return summary[0]["count"], summary[0]["updated_at"]
 
 
 def trim_public_events(event: dict) -> dict:
@@ -537,12 +1703,8 @@ async def get_pending_reports_count(clubid: str) -> int:
     Returns:
         (int): count of pending event reports
     """
-    report_check_lt = (
-        datetime.now(TIMEZONE) - timedelta(days=REPORT_DUE_DAYS)
-    ).strftime("%Y-%m-%dT%H:%M:%S+00:00")
-    report_check_gt = datetime(2026, 1, 6, tzinfo=TIMEZONE).strftime(
-        "%Y-%m-%dT%H:%M:%S+00:00"
-    )
+    report_check_lt = datetime.now(TIMEZONE) - timedelta(days=REPORT_DUE_DAYS)
+    report_check_gt = datetime(2026, 1, 6, tzinfo=TIMEZONE)
 
     if clubid in NO_REPORT_CLUBS:
         return 0
@@ -553,10 +1715,13 @@ async def get_pending_reports_count(clubid: str) -> int:
             "audience": {"$nin": ["internal"]},
             "collabclubs": {"$nin": NO_REPORT_CLUBS},
             "status.state": {"$in": ["approved"]},
-            "datetimeperiod.1": {
-                "$lt": report_check_lt,
-                "$gt": report_check_gt,
-            },
+            "$and": [
+                datetime_condition(
+                    "datetimeperiod.1",
+                    lt=report_check_lt,
+                    gt=report_check_gt,
+                )
+            ],
             "event_report_submitted": {"$ne": True},
         }
     )
@@ -600,14 +1765,13 @@ async def delete_file(filename) -> str:
     Returns:
         (str): response from the file service.
     """
-    async with AsyncClient() as client:
-        response = await client.post(
-            "http://files/delete-file",
-            params={
-                "filename": filename,
-                "inter_communication_secret": inter_communication_secret,
-            },
-        )
+    response = await inter_service_post(
+        "http://files/delete-file",
+        params={
+            "filename": filename,
+            "inter_communication_secret": inter_communication_secret,
+        },
+    )
 
     if response.status_code != 200:
         raise Exception(response.text)
@@ -615,22 +1779,69 @@ async def delete_file(filename) -> str:
     return response.text
 
 
+async def _fetch_bot_cookie() -> tuple[dict, float]:
+    response = await inter_service_post(
+        "http://auth/bot-cookie",
+        json={"secret": inter_communication_secret, "uid": "events"},
+    )
+
+    return_dict = {}
+    expires_at = time.time() + BOT_COOKIE_TTL
+    for cookie in response.cookies.jar:
+        return_dict[cookie.name] = cookie.value
+        if cookie.expires is not None:
+            expires_at = min(expires_at, cookie.expires)
+
+    if not return_dict:
+        raise Exception(f"No bot cookie received: {response.status_code}")
+
+    return return_dict, expires_at
+
+
 async def get_bot_cookie() -> dict:
     """
     Method to get the bot cookie.
 
+    The cookie is cached until BOT_COOKIE_REFRESH_MARGIN seconds before it
+    expires (or BOT_COOKIE_TTL seconds if the auth service sets no expiry).
+    Only one refresh runs at a time, callers arriving meanwhile reuse the
+    still valid cookie, and failed refreshes are retried with exponential
+    backoff.
+
     Returns:
         (dict): cookies.
-    """
-
-    async with AsyncClient() as client:
-        response = await client.post(
-            "http://auth/bot-cookie",
-            json={"secret": inter_communication_secret, "uid": "events"},
-        )
 
-    return_dict = {}
-    for key, value in response.cookies.items():
-        return_dict[key] = value
-
-    return return_dict
+    Raises:
+        Exception: No valid bot cookie could be fetched.
+    """
+    global _bot_cookie, _bot_cookie_expires_at
+
+    now = time.time()
+    valid = _bot_cookie is not None and now < _bot_cookie_expires_at
+    if valid and (
+        now < _bot_cookie_expires_at - BOT_COOKIE_REFRESH_MARGIN
+        or _bot_cookie_lock.locked()
+    ):
+        return dict(_bot_cookie)
+
+    async with _bot_cookie_lock:
+        # another caller may have refreshed it while we waited
+        now = time.time()
+        if (
+            _bot_cookie is not None
+            and now < _bot_cookie_expires_at - BOT_COOKIE_REFRESH_MARGIN
+        ):
+            return dict(_bot_cookie)
+
+        for attempt in range(BOT_COOKIE_RETRIES):
+            try:
+                _bot_cookie, _bot_cookie_expires_at = await _fetch_bot_cookie()
+                return dict(_bot_cookie)
+            except Exception:
+                if attempt == BOT_COOKIE_RETRIES - 1:
+                    break
+                await asyncio.sleep(BOT_COOKIE_RETRY_BACKOFF * 2**attempt)
+
+        if _bot_cookie is not None and time.time() < _bot_cookie_expires_at:
+            return dict(_bot_cookie)
+        raise Exception("Could not fetch the bot cookie")